@@ -23,6 +23,8 @@ DB_HOST = os.environ.get("DB_HOST", "db")
 DB_NAME = os.environ.get("DB_NAME", "hash_store")
 DB_USER = os.environ.get("DB_USER", "postgres")
 DB_PASS = get_db_password()
+# Rescale generation times to the median registered host (see hasher/host_registry.py)
+NORMALIZE_HOSTS = os.environ.get("NORMALIZE_HOSTS", "1") == "1"
 
 # --- 1. AHP Weight Calculation ---
 def calculate_ahp_weights(matrix, profile_name):
@@ -65,13 +67,45 @@ matrix_user_auth = np.array([
 def get_db_connection():
     return psycopg2.connect(host=DB_HOST, dbname=DB_NAME, user=DB_USER, password=DB_PASS)
 
+# Reference scores: the median over all registered hosts.
+HOST_REFERENCE_CTE = """
+    WITH host_reference AS (
+        SELECT
+            percentile_cont(0.5) WITHIN GROUP (ORDER BY sha256_mb_per_s) AS sha256_mb_per_s,
+            percentile_cont(0.5) WITHIN GROUP (ORDER BY memory_bandwidth_gb_per_s) AS memory_bandwidth_gb_per_s
+        FROM hosts
+    )
+"""
+
+# Each hash is scaled by the host that generated it; rows from before
+# hash_generations.host_id existed fall back to the host that completed the run.
+HOST_JOIN = """
+        LEFT JOIN hosts h ON h.id = COALESCE(hg.host_id, er.host_id)
+        CROSS JOIN host_reference hr
+"""
+
+def generation_time_sql():
+    """
+    Generation time as it would have been on the reference host. A host twice as
+    fast as the reference measured half the time, so durations are scaled by
+    host score / reference score: memory bandwidth for the memory-hard argon2 and
+    scrypt, SHA-256 throughput for the rest. Hashes without a host stay unscaled.
+    """
+    if not NORMALIZE_HOSTS:
+        return "hg.duration_ms"
+    return """hg.duration_ms * COALESCE(
+            CASE WHEN a.name IN ('argon2', 'scrypt')
+                 THEN h.memory_bandwidth_gb_per_s / hr.memory_bandwidth_gb_per_s
+                 ELSE h.sha256_mb_per_s / hr.sha256_mb_per_s
+            END, 1)"""
+
 def fetch_aggregated_data():
     """Fetches core benchmarking telemetry for ADS calculation."""
-    query = """
+    query = HOST_REFERENCE_CTE + f"""
         SELECT 
             a.name AS algorithm,
             ac.parameters_json AS configuration,
-            hg.duration_ms AS generation_time_ms,
+            {generation_time_sql()} AS generation_time_ms,
             hcr.duration_seconds AS cracking_time_s,
             hcr.hashes_per_second AS hashes_per_second,
             COALESCE(hcr.ram_usage_mb_max, 0) AS max_ram_mb,
@@ -81,6 +115,7 @@ def fetch_aggregated_data():
         JOIN experiment_runs er ON hg.experiment_run_id = er.id
         JOIN algorithm_configurations ac ON er.alg_config_id = ac.id
         JOIN algorithms a ON ac.algorithm_id = a.id
+        {HOST_JOIN}
         WHERE hcr.cracked_status = 'CRACKED'
     """
     with get_db_connection() as conn:
@@ -105,12 +140,12 @@ def fetch_password_data():
 
 def fetch_comparison_data():
     """Pulls environment-specific baseline vs OWASP comparisons."""
-    query = """
+    query = HOST_REFERENCE_CTE + f"""
         SELECT 
             c.name AS comparison_name,
             a.name AS algorithm,
             ac.parameters_json AS configuration,
-            AVG(hg.duration_ms) AS generation_time_ms,
+            AVG({generation_time_sql()}) AS generation_time_ms,
             AVG(hcr.duration_seconds) AS cracking_time_s
         FROM comparisons c
         JOIN comparison_algo_configs cac ON c.id = cac.comp_id
@@ -119,6 +154,7 @@ def fetch_comparison_data():
         JOIN experiment_runs er ON ac.id = er.alg_config_id
         JOIN hash_generations hg ON er.id = hg.experiment_run_id
         JOIN hash_cracking_results hcr ON hg.id = hcr.hash_generation_id
+        {HOST_JOIN}
         WHERE hcr.cracked_status = 'CRACKED'
         GROUP BY c.name, a.name, ac.parameters_json
     """
@@ -127,12 +163,12 @@ def fetch_comparison_data():
 
 def fetch_entropy_performance_data():
     """Pulls unaggregated hash cracking data mapped to password entropy."""
-    query = """
+    query = HOST_REFERENCE_CTE + f"""
         SELECT 
             p.password_len, 
             p.entropy, 
             a.name AS algorithm,
-            hg.duration_ms AS generation_time_ms,
+            {generation_time_sql()} AS generation_time_ms,
             hcr.duration_seconds AS cracking_time_s
         FROM passwords p
         JOIN hash_generations hg ON p.id = hg.password_id
@@ -140,6 +176,7 @@ def fetch_entropy_performance_data():
         JOIN experiment_runs er ON hg.experiment_run_id = er.id
         JOIN algorithm_configurations ac ON er.alg_config_id = ac.id
         JOIN algorithms a ON ac.algorithm_id = a.id
+        {HOST_JOIN}
         WHERE hcr.cracked_status = 'CRACKED'
     """
     with get_db_connection() as conn:
@@ -1,10 +1,20 @@
+import contextlib
+import fcntl
+import glob
+import json
 import os
 import subprocess
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
 import time
 import psutil
+import select
+import socket
 import threading
 
+from schema import ensure_cracker_schema
+
 # Safely import NVIDIA ML library for GPU telemetry
 try:
     import pynvml
@@ -30,11 +40,35 @@ DB_USER = os.environ.get("DB_USER", "postgres")
 DB_PASS = get_db_password()
 ATTACK_TYPE_ID = int(os.environ.get("ATTACK_TYPE_ID", 1))
 CRACK_SAMPLE_LIMIT = int(os.environ.get("CRACK_SAMPLE_LIMIT", 100))
+# Uncracked hashes of one experiment run attacked by a single hashcat session.
+# 1 keeps the classic one-hash-per-session timings; larger batches pay hashcat's
+# startup and device init once, at the price of sharing the guess rate between salts.
+CRACK_BATCH_SIZE = int(os.environ.get("CRACK_BATCH_SIZE", 1))
+# Claimed crack jobs return to the queue if their node stops renewing them for this long
+CRACK_LEASE_SECONDS = int(os.environ.get("CRACK_LEASE_SECONDS", 600))
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+# Idle nodes wake on hashes_ready notifications; this is only the fallback poll
+CRACK_IDLE_POLL_SECONDS = float(os.environ.get("CRACK_IDLE_POLL_SECONDS", 60))
 
 # --- File Paths for Hashcat v7+ ---
-WORDLIST_PATH = "/tmp/db_wordlist.txt"
-HASH_FILE_PATH = "/tmp/target_hash.txt"
-POTFILE_PATH = "/tmp/hashcat.potfile"
+# Per-run wordlists, shared by every cracker node that mounts the same directory
+WORDLIST_CACHE_DIR = os.environ.get("WORDLIST_CACHE_DIR", "/tmp/wordlists")
+# Superseded versions of a run's wordlist are kept until unused for this long. Handing a version out
+# and checkpointing a session on it both refresh its mtime, so running and restorable sessions keep it.
+WORDLIST_STALE_SECONDS = int(os.environ.get("WORDLIST_STALE_SECONDS", 3600))
+# Hash files, outfiles and restore points of hashcat sessions. Mount the same directory on every node
+# at the same path so a session interrupted on one node can be restored by whichever node reclaims it.
+CRACK_SESSION_DIR = os.environ.get("CRACK_SESSION_DIR", "/tmp/hashcat_sessions")
+# Time budget per session when the attack type's parameters_json has no "runtime"; 0 means unlimited
+CRACK_RUNTIME_SECONDS = int(os.environ.get("CRACK_RUNTIME_SECONDS", 0))
+# Mask and combinator jobs are split into this many --skip/--limit slices that any node can claim,
+# unless the attack type's parameters_json sets "slices"; 1 runs every job as a single session
+CRACK_SHARD_SLICES = int(os.environ.get("CRACK_SHARD_SLICES", 1))
+SHARDABLE_MODES = ("1", "3")
+# How often a node running a slice checks whether another slice has already cracked the hash
+CRACK_CANCEL_POLL_SECONDS = float(os.environ.get("CRACK_CANCEL_POLL_SECONDS", 2))
+# hashes_ready payload for new slices, which wake idle nodes of every attack type
+SLICES_READY = "slices"
 HASHCAT_BIN = "/opt/hashcat/hashcat"   # Forcing the custom-built v7 binary
 RULES_DIR = "/opt/hashcat/rules"       # Using the v7 rules folder
 
@@ -99,33 +133,381 @@ class HardwareMonitor:
         }
 
 
-def get_db_connection():
-    return psycopg2.connect(host=DB_HOST, dbname=DB_NAME, user=DB_USER, password=DB_PASS)
+# Statements every pooled connection prepares once, so the hot queries are planned once per session
+# instead of once per job. Run them with EXECUTE name(...).
+PREPARED_STATEMENTS = [
+    # $1 attack type
+    """
+    PREPARE claim_head (INT) AS
+        SELECT id, experiment_run_id
+        FROM crack_jobs
+        WHERE cracking_attack_type_id = $1
+          AND status <> 'done'
+          AND (status = 'pending' OR lease_expires_at < now())
+        ORDER BY id ASC
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    """,
+    # $1 attack type, $2 experiment run, $3 owner, $4 lease seconds, $5 batch size
+    """
+    PREPARE claim_batch (INT, BIGINT, TEXT, INT, INT) AS
+        WITH claimed AS (
+            UPDATE crack_jobs cj
+            SET status = 'running',
+                lease_owner = $3,
+                lease_expires_at = now() + make_interval(secs => $4),
+                attempts = cj.attempts + 1
+            WHERE cj.id IN (
+                SELECT id
+                FROM crack_jobs
+                WHERE cracking_attack_type_id = $1
+                  AND experiment_run_id = $2
+                  AND status <> 'done'
+                  AND (status = 'pending' OR lease_expires_at < now())
+                ORDER BY id ASC
+                LIMIT $5
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING cj.id, cj.hash_generation_id
+        )
+        SELECT claimed.id, hg.id, hg.generated_hash, p.password, a.name
+        FROM claimed
+        JOIN hash_generations hg ON hg.id = claimed.hash_generation_id
+        JOIN passwords p ON p.id = hg.password_id
+        JOIN experiment_runs er ON hg.experiment_run_id = er.id
+        JOIN algorithm_configurations ac ON er.alg_config_id = ac.id
+        JOIN algorithms a ON ac.algorithm_id = a.id
+        ORDER BY hg.id ASC
+    """,
+    # $1 job ids, $2 owner, $3 lease seconds
+    """
+    PREPARE renew_leases (BIGINT[], TEXT, INT) AS
+        UPDATE crack_jobs
+        SET lease_expires_at = now() + make_interval(secs => $3)
+        WHERE id = ANY($1) AND lease_owner = $2 AND status = 'running'
+    """,
+    # $1 owner, $2 lease seconds. Slices of the oldest sharded job come first, so idle nodes gang up on one hash.
+    """
+    PREPARE claim_slice (TEXT, INT) AS
+        WITH claimed AS (
+            UPDATE crack_job_slices s
+            SET status = 'running',
+                lease_owner = $1,
+                lease_expires_at = now() + make_interval(secs => $2),
+                attempts = s.attempts + 1,
+                started_at = COALESCE(s.started_at, now())
+            WHERE s.id = (
+                SELECT id
+                FROM crack_job_slices
+                WHERE status IN ('pending', 'running')
+                  AND (status = 'pending' OR lease_expires_at < now())
+                ORDER BY id ASC
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING s.id, s.crack_job_id, s.skip_candidates, s.limit_candidates
+        )
+        SELECT claimed.id, claimed.crack_job_id, claimed.skip_candidates, claimed.limit_candidates,
+               cj.cracking_attack_type_id, cat.parameters_json, cj.experiment_run_id, cj.shard_wordlist,
+               hg.id, hg.generated_hash, p.password, a.name
+        FROM claimed
+        JOIN crack_jobs cj ON cj.id = claimed.crack_job_id
+        JOIN cracking_attack_types cat ON cat.id = cj.cracking_attack_type_id
+        JOIN hash_generations hg ON hg.id = cj.hash_generation_id
+        JOIN passwords p ON p.id = hg.password_id
+        JOIN experiment_runs er ON hg.experiment_run_id = er.id
+        JOIN algorithm_configurations ac ON er.alg_config_id = ac.id
+        JOIN algorithms a ON ac.algorithm_id = a.id
+    """,
+    # $1 slice ids, $2 owner, $3 lease seconds
+    """
+    PREPARE renew_slice_leases (BIGINT[], TEXT, INT) AS
+        UPDATE crack_job_slices
+        SET lease_expires_at = now() + make_interval(secs => $3)
+        WHERE id = ANY($1) AND lease_owner = $2 AND status = 'running'
+    """,
+    # $1 slice id
+    """
+    PREPARE slice_status (BIGINT) AS
+        SELECT status, lease_owner FROM crack_job_slices WHERE id = $1
+    """,
+    # $1 job ids, $2 owner
+    """
+    PREPARE complete_jobs (BIGINT[], TEXT) AS
+        UPDATE crack_jobs
+        SET status = 'done', lease_owner = NULL, lease_expires_at = NULL
+        WHERE id = ANY($1) AND lease_owner = $2 AND status = 'running'
+    """,
+    """
+    PREPARE insert_result (BIGINT, INT, DOUBLE PRECISION, DOUBLE PRECISION, TEXT, TEXT,
+                           DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION,
+                           DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION, INT,
+                           BIGINT, BIGINT, BOOLEAN) AS
+        INSERT INTO hash_cracking_results (
+            hash_generation_id, cracking_attack_type_id, duration_seconds, 
+            hashes_per_second, cracked_status, cracked_password,
+            cpu_usage_percent_avg, cpu_usage_percent_max,
+            ram_usage_mb_avg, ram_usage_mb_max,
+            gpu_usage_percent_avg, gpu_usage_percent_max,
+            gpu_memory_mb_avg, gpu_memory_mb_max, batch_size,
+            keyspace_progress, keyspace_total, censored
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17, $18)
+    """,
+]
+
+
+class PreparedConnection(psycopg2.extensions.connection):
+    """A psycopg2 connection that remembers whether PREPARED_STATEMENTS have been prepared on it."""
+    prepared = False
+
+
+class Database:
+    """
+    Hands out long-lived pooled connections instead of connecting per job.
+
+    A connection that fails with an OperationalError or InterfaceError is closed and dropped from the
+    pool, so the next checkout reconnects. New connections prepare PREPARED_STATEMENTS on first use.
+    """
+    def __init__(self, maxconn=4):
+        self.pool = psycopg2.pool.ThreadedConnectionPool(
+            1, maxconn, host=DB_HOST, dbname=DB_NAME, user=DB_USER, password=DB_PASS,
+            connection_factory=PreparedConnection)
+
+    @contextlib.contextmanager
+    def connection(self):
+        conn = self.pool.getconn()
+        broken = False
+        try:
+            if not conn.prepared:
+                with conn.cursor() as cursor:
+                    for statement in PREPARED_STATEMENTS:
+                        cursor.execute(statement)
+                conn.commit()
+                conn.prepared = True
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            if not broken and not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            self.pool.putconn(conn, close=broken or bool(conn.closed))
+
+    def close(self):
+        self.pool.closeall()
+
+
+class NotificationListener:
+    """
+    LISTENs on the hashes_ready channel over a dedicated autocommit connection, outside the pool.
+
+    The crack_jobs enqueue trigger notifies with the attack type id when the hashes' transaction commits,
+    and sharding a job notifies with SLICES_READY, so an idle node blocks here instead of re-running the
+    claims every few seconds. Notifications that arrive while the node is busy stay buffered and end the
+    next wait at once.
+    """
+    def __init__(self):
+        self.conn = None
+        self._connect()
+
+    def _connect(self):
+        self.conn = psycopg2.connect(host=DB_HOST, dbname=DB_NAME, user=DB_USER, password=DB_PASS)
+        self.conn.autocommit = True
+        with self.conn.cursor() as cursor:
+            cursor.execute("LISTEN hashes_ready")
+
+    def wait(self, timeout):
+        """Blocks until this node's attack type has new jobs, new slices are queued or `timeout` seconds pass."""
+        deadline = time.monotonic() + timeout
+        try:
+            if self.conn is None or self.conn.closed:
+                self._connect()
+            self.conn.poll()
+            while not self._take():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not select.select([self.conn], [], [], remaining)[0]:
+                    return False
+                self.conn.poll()
+            return True
+        except psycopg2.Error as e:
+            # Sleep out this wait as a plain poll; the next wait reconnects.
+            print(f"Notification listener failed, falling back to polling: {e}")
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = None
+            time.sleep(max(deadline - time.monotonic(), 0))
+            return False
+
+    def _take(self):
+        notifies = list(self.conn.notifies)
+        self.conn.notifies.clear()
+        return any(notify.payload in (str(ATTACK_TYPE_ID), SLICES_READY) for notify in notifies)
+
 
+class LeaseKeeper:
+    """
+    Renews the leases of a claimed batch on its own connection every third of the lease period while Hashcat runs.
+    `statement` is the prepared renewal: renew_leases for crack jobs, renew_slice_leases for slices.
+    """
+    def __init__(self, db, job_ids, statement="renew_leases"):
+        self.db = db
+        self.job_ids = job_ids
+        self.statement = statement
+        self.stopped = threading.Event()
 
-def build_dynamic_wordlist(experiment_run_id):
-    """Streams a dynamically filtered wordlist containing ONLY the passwords used in this specific experiment run."""
-    conn = get_db_connection()
+    def start(self):
+        self.thread = threading.Thread(target=self._renew, daemon=True)
+        self.thread.start()
+
+    def _renew(self):
+        while not self.stopped.wait(CRACK_LEASE_SECONDS / 3):
+            try:
+                with self.db.connection() as conn:
+                    with conn.cursor() as cursor:
+                        cursor.execute(f"EXECUTE {self.statement}(%s, %s, %s)",
+                                       (self.job_ids, WORKER_ID, CRACK_LEASE_SECONDS))
+                    conn.commit()
+            except psycopg2.Error as e:
+                # The next renewal reconnects; the lease only lapses if renewals keep failing.
+                print(f"Lease renewal failed: {e}")
+
+    def stop(self):
+        self.stopped.set()
+        if hasattr(self, 'thread'):
+            self.thread.join()
+
+
+def backfill_crack_jobs(conn):
+    """
+    Publishes this node's sample limit and enqueues the hashes the hash_generations trigger has not seen,
+    e.g. rows committed before the queue existed. Results recorded before then count as done jobs.
+    """
     cursor = conn.cursor()
-    
+    cursor.execute("UPDATE cracking_attack_types SET sample_limit = %s WHERE id = %s",
+                   (CRACK_SAMPLE_LIMIT, ATTACK_TYPE_ID))
+
+    # Keep the enqueue trigger out while the counters are rebuilt.
+    cursor.execute("LOCK TABLE crack_job_quotas IN SHARE ROW EXCLUSIVE MODE")
+    cursor.execute("""
+        INSERT INTO crack_jobs (hash_generation_id, cracking_attack_type_id, experiment_run_id, status)
+        SELECT DISTINCT hcr.hash_generation_id, hcr.cracking_attack_type_id, hg.experiment_run_id, 'done'
+        FROM hash_cracking_results hcr
+        JOIN hash_generations hg ON hg.id = hcr.hash_generation_id
+        WHERE hcr.cracking_attack_type_id = %(attack_type)s
+        ON CONFLICT DO NOTHING
+    """, {"attack_type": ATTACK_TYPE_ID})
     cursor.execute("""
-        SELECT DISTINCT p.password 
-        FROM passwords p
-        JOIN hash_generations hg ON hg.password_id = p.id
-        WHERE hg.experiment_run_id = %s
+        WITH enqueued AS (
+            SELECT experiment_run_id, COUNT(*) AS jobs
+            FROM crack_jobs
+            WHERE cracking_attack_type_id = %(attack_type)s
+            GROUP BY experiment_run_id
+        ),
+        candidates AS (
+            SELECT hg.id, hg.experiment_run_id,
+                   ROW_NUMBER() OVER (PARTITION BY hg.experiment_run_id ORDER BY hg.id) AS position
+            FROM hash_generations hg
+            WHERE NOT EXISTS (SELECT 1 FROM crack_jobs cj
+                              WHERE cj.hash_generation_id = hg.id
+                                AND cj.cracking_attack_type_id = %(attack_type)s)
+        )
+        INSERT INTO crack_jobs (hash_generation_id, cracking_attack_type_id, experiment_run_id)
+        SELECT c.id, %(attack_type)s, c.experiment_run_id
+        FROM candidates c
+        LEFT JOIN enqueued e ON e.experiment_run_id = c.experiment_run_id
+        WHERE c.position + COALESCE(e.jobs, 0) <= %(limit)s
+        ORDER BY c.id
+        ON CONFLICT DO NOTHING
+    """, {"attack_type": ATTACK_TYPE_ID, "limit": CRACK_SAMPLE_LIMIT})
+    backfilled = cursor.rowcount
+    cursor.execute("""
+        INSERT INTO crack_job_quotas (experiment_run_id, cracking_attack_type_id, enqueued)
+        SELECT experiment_run_id, cracking_attack_type_id, COUNT(*)
+        FROM crack_jobs
+        WHERE cracking_attack_type_id = %(attack_type)s
+        GROUP BY experiment_run_id, cracking_attack_type_id
+        ON CONFLICT (experiment_run_id, cracking_attack_type_id) DO UPDATE SET enqueued = EXCLUDED.enqueued
+    """, {"attack_type": ATTACK_TYPE_ID})
+    conn.commit()
+    cursor.close()
+    print(f"Backfilled {backfilled} crack jobs for Attack Type {ATTACK_TYPE_ID}.")
+
+
+def build_dynamic_wordlist(conn, experiment_run_id):
+    """
+    Returns the path and size of a wordlist containing ONLY the passwords used in this specific experiment run.
+
+    The file is cached under WORDLIST_CACHE_DIR, keyed by the run id and a watermark of its
+    hash_generations rows (row count and highest id), so it is rebuilt only when new hashes land
+    for the run. One node builds it under an exclusive flock, streaming the passwords to disk through
+    a server-side cursor, and publishes it with an atomic rename; the others wait and reuse it.
+    The passwords are sorted, so every build of one watermark has the same contents in the same order.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT COUNT(*), COALESCE(MAX(id), 0)
+        FROM hash_generations
+        WHERE experiment_run_id = %s
     """, (experiment_run_id,))
-    
-    passwords = cursor.fetchall()
-    count = len(passwords)
-    
-    with open(WORDLIST_PATH, "w", encoding="utf-8") as f:
-        for row in passwords:
-            f.write(f"{row[0]}\n")
-            
+    row_count, max_id = cursor.fetchone()
     cursor.close()
-    conn.close()
-    
-    return count
+
+    os.makedirs(WORDLIST_CACHE_DIR, exist_ok=True)
+    wordlist_path = os.path.join(WORDLIST_CACHE_DIR, f"run_{experiment_run_id}_{row_count}_{max_id}.txt")
+    count_path = wordlist_path + ".count"
+
+    with open(os.path.join(WORDLIST_CACHE_DIR, f"run_{experiment_run_id}.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        if not os.path.exists(count_path):
+            temporary_path = f"{wordlist_path}.{os.getpid()}.tmp"
+            stream = conn.cursor(name=f"wordlist_{experiment_run_id}")
+            stream.itersize = 10000
+            stream.execute("""
+                SELECT DISTINCT p.password 
+                FROM passwords p
+                JOIN hash_generations hg ON hg.password_id = p.id
+                WHERE hg.experiment_run_id = %s
+                ORDER BY p.password
+            """, (experiment_run_id,))
+
+            count = 0
+            with open(temporary_path, "w", encoding="utf-8") as f:
+                for (password,) in stream:
+                    f.write(f"{password}\n")
+                    count += 1
+            stream.close()
+            conn.commit()
+
+            # The wordlist is published before its count file, which marks the entry complete.
+            os.replace(temporary_path, wordlist_path)
+            with open(f"{count_path}.{os.getpid()}.tmp", "w") as f:
+                f.write(str(count))
+            os.replace(f"{count_path}.{os.getpid()}.tmp", count_path)
+
+            for stale_path in glob.glob(os.path.join(WORDLIST_CACHE_DIR, f"run_{experiment_run_id}_*.txt")):
+                if stale_path != wordlist_path and time.time() - os.path.getmtime(stale_path) > WORDLIST_STALE_SECONDS:
+                    for path in (stale_path, stale_path + ".count"):
+                        if os.path.exists(path):
+                            os.remove(path)
+
+    with open(count_path, "r") as f:
+        count = int(f.read())
+
+    touch_wordlist(wordlist_path)
+    return wordlist_path, count
+
+
+def touch_wordlist(wordlist_path):
+    """Marks a cached wordlist as in use, so the stale cleanup in build_dynamic_wordlist keeps it."""
+    for path in (wordlist_path, wordlist_path + ".count"):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
 
 
 def get_hashcat_module(algo_name):
@@ -145,16 +527,14 @@ def get_hashcat_module(algo_name):
     return mapping.get(algo_lower)
 
 
-def build_hashcat_command(module_code, attack_params):
-    """Constructs the Hashcat subprocess command dynamically based on DB JSON parameters."""
+def attack_arguments(attack_params, wordlist_path):
+    """Returns the wordlist, rule and mask arguments of the attack mode in the DB JSON parameters."""
     mode = attack_params.get("mode", "0")
-    
-    # Base command explicitly calling the /opt/hashcat/hashcat binary
-    command = [HASHCAT_BIN, "-m", module_code, "-a", mode, HASH_FILE_PATH, "--self-test-disable"]
-    
+    command = []
+
     if mode == "0":
         # Straight Dictionary Attack
-        command.append(WORDLIST_PATH)
+        command.append(wordlist_path)
         
         # Check if a rule mutation is requested
         if "rule" in attack_params:
@@ -168,20 +548,541 @@ def build_hashcat_command(module_code, attack_params):
             
     elif mode == "1":
         # Combinator Attack
-        command.extend([WORDLIST_PATH, WORDLIST_PATH])
+        command.extend([wordlist_path, wordlist_path])
+
+    return command
+
+
+def build_hashcat_command(module_code, attack_params, wordlist_path, session, runtime_seconds):
+    """Constructs the Hashcat subprocess command dynamically based on DB JSON parameters."""
+    mode = attack_params.get("mode", "0")
+    
+    # Base command explicitly calling the /opt/hashcat/hashcat binary
+    command = [HASHCAT_BIN, "-m", module_code, "-a", mode, session["hash_file"], "--self-test-disable"]
+    command.extend(attack_arguments(attack_params, wordlist_path))
 
-    # Append standard operational flags
+    # Append standard operational flags. Cracks go to an outfile stamped with the
+    # absolute crack time (format 5), followed by the hash (1) and the plain (2).
     command.extend([
-        "--potfile-path", POTFILE_PATH,
+        "--potfile-disable",
+        "--outfile", session["outfile"], "--outfile-format", "5,1,2",
+        "--session", session["name"], "--restore-file-path", session["restore_file"], "--logfile-disable",
         "--status", "--status-timer=1", "--machine-readable"
     ])
+
+    # Hashcat aborts by itself once the time budget is spent (exit status 4)
+    if runtime_seconds:
+        command.append(f"--runtime={runtime_seconds}")
     
     return command
 
 
-def run_crack_job():
-    """Fetches a pending hash, generates a targeted wordlist, executes Hashcat, and records telemetry."""
-    conn = get_db_connection()
+def hashcat_keyspace(module_code, attack_params, wordlist_path):
+    """
+    Asks hashcat for the attack's keyspace, the range --skip and --limit address.
+
+    For masks this is the base keyspace hashcat iterates on the host, not the number of candidates.
+
+    Returns:
+        int: The keyspace, or None if hashcat could not compute it.
+    """
+    command = [HASHCAT_BIN, "-m", module_code, "-a", attack_params.get("mode", "0"), "--keyspace", "--quiet"]
+    command.extend(attack_arguments(attack_params, wordlist_path))
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    lines = result.stdout.strip().splitlines()
+    try:
+        return int(lines[-1])
+    except (IndexError, ValueError):
+        print(f"Hashcat could not compute the keyspace: {result.stdout.strip()}")
+        return None
+
+
+def claim_crack_batch(cursor):
+    """
+    Leases the oldest open crack job of this attack type plus up to CRACK_BATCH_SIZE - 1 more of the
+    same experiment run. Jobs that are pending, or running under an expired lease, can be claimed; rows
+    locked by other nodes are skipped. The sample limit was applied when the jobs were enqueued.
+
+    Returns:
+        tuple: (algorithm name, experiment run id, list of (crack_job_id, hash_generation_id, hash, password))
+               or None when there is no work.
+    """
+    cursor.execute("EXECUTE claim_head(%s)", (ATTACK_TYPE_ID,))
+    
+    head = cursor.fetchone()
+    if not head:
+        return None
+    _, experiment_run_id = head
+
+    cursor.execute("EXECUTE claim_batch(%s, %s, %s, %s, %s)",
+                   (ATTACK_TYPE_ID, experiment_run_id, WORKER_ID, CRACK_LEASE_SECONDS, CRACK_BATCH_SIZE))
+
+    rows = cursor.fetchall()
+    return rows[0][4], experiment_run_id, [row[:4] for row in rows]
+
+
+def complete_crack_jobs(cursor, job_ids):
+    """Marks the batch's jobs done in the results transaction; False if another node has taken any of them over."""
+    cursor.execute("EXECUTE complete_jobs(%s, %s)", (job_ids, WORKER_ID))
+    return cursor.rowcount == len(job_ids)
+
+
+def parse_status_line(line):
+    """
+    Parses a --machine-readable STATUS line such as
+    STATUS 3 SPEED 2301 1000 EXEC_RUNTIME 41.2 CURKU 0 PROGRESS 4096 6634204312890625 RECHASH 0 1 ...
+
+    SPEED is followed by one (hashes, milliseconds) pair per device and PROGRESS by the candidates
+    tried so far and the total keyspace.
+
+    Returns:
+        dict: status code, speed_hps summed over devices, progress_done and progress_total, when present.
+    """
+    tokens = line.strip().split('\t')
+    parsed = {}
+    i = 0
+    while i < len(tokens):
+        try:
+            if tokens[i] == "STATUS":
+                parsed["status"] = int(tokens[i + 1])
+                i += 2
+            elif tokens[i] == "SPEED":
+                speed_hps = 0.0
+                i += 1
+                while i + 1 < len(tokens) and tokens[i].replace('.', '', 1).isdigit():
+                    hashes, milliseconds = float(tokens[i]), float(tokens[i + 1])
+                    if milliseconds > 0:
+                        speed_hps += hashes * 1000 / milliseconds
+                    i += 2
+                parsed["speed_hps"] = speed_hps
+            elif tokens[i] == "PROGRESS":
+                parsed["progress_done"], parsed["progress_total"] = int(tokens[i + 1]), int(tokens[i + 2])
+                i += 3
+            else:
+                i += 1
+        except (IndexError, ValueError):
+            i += 1
+    return parsed
+
+
+def open_session(name, job_ids, wordlist_path):
+    """
+    Returns the hashcat session of a batch or slice, resuming an interrupted one when its restore point matches.
+
+    Batches are named after the attack type and their first job, slices after their id. A restore point
+    is reused only when the recorded job ids and wordlist still match; otherwise the session starts over.
+    The returned dict is saved next to the restore file as the session's state.
+    """
+    os.makedirs(CRACK_SESSION_DIR, exist_ok=True)
+    base = os.path.join(CRACK_SESSION_DIR, name)
+    session = {
+        "name": name,
+        "state_file": base + ".json",
+        "hash_file": base + ".hashes",
+        "outfile": base + ".outfile",
+        "restore_file": base + ".restore",
+        "job_ids": job_ids,
+        "wordlist_path": wordlist_path,
+        "elapsed_seconds": 0.0,
+        "first_started_at": time.time(),
+        "restored": False,
+    }
+
+    try:
+        with open(session["state_file"], "r") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        saved = None
+
+    if (saved and saved["job_ids"] == job_ids and os.path.exists(session["restore_file"])
+            and os.path.exists(saved["wordlist_path"])):
+        session.update(saved, restored=True)
+    else:
+        close_session(session)
+    return session
+
+
+def save_session(session):
+    touch_wordlist(session["wordlist_path"])
+    temporary_path = f"{session['state_file']}.{os.getpid()}.tmp"
+    with open(temporary_path, "w") as f:
+        json.dump(session, f)
+    os.replace(temporary_path, session["state_file"])
+
+
+def close_session(session):
+    """Removes a session's files once its results are recorded (or before starting it over)."""
+    for key in ("state_file", "hash_file", "outfile", "restore_file"):
+        if os.path.exists(session[key]):
+            os.remove(session[key])
+
+
+def decode_plain(plain):
+    """Undoes hashcat's $HEX[...] encoding of plains containing separators or non-printable bytes."""
+    if plain.startswith("$HEX[") and plain.endswith("]"):
+        return bytes.fromhex(plain[5:-1]).decode("utf-8", errors="replace")
+    return plain
+
+
+def read_outfile(outfile_path, jobs):
+    """
+    Matches the 'timestamp:hash:plain' lines of the outfile to the batch's jobs.
+
+    Hashes are matched on the hash text first; hashcat re-encodes some formats, so a line whose
+    hash is not recognised is matched to an uncracked job with the same plain instead.
+
+    Returns:
+        dict: hash_generation_id -> (crack timestamp, cracked password)
+    """
+    cracked = {}
+    if not os.path.exists(outfile_path):
+        return cracked
+
+    with open(outfile_path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            timestamp, _, rest = line.rstrip("\n").partition(":")
+            try:
+                timestamp = float(timestamp)
+            except ValueError:
+                continue
+
+            match = None
+            for hg_id, clean_hash, password in jobs:
+                if hg_id not in cracked and rest.startswith(clean_hash + ":"):
+                    match = (hg_id, decode_plain(rest[len(clean_hash) + 1:]))
+                    break
+            if match is None:
+                for hg_id, clean_hash, password in jobs:
+                    if hg_id not in cracked and rest.endswith(":" + password):
+                        match = (hg_id, password)
+                        break
+            if match is not None:
+                cracked[match[0]] = (timestamp, match[1])
+
+    return cracked
+
+
+def record_skipped_batch(cursor, jobs, cracked_status):
+    for hg_id, _, _ in jobs:
+        cursor.execute("""
+            INSERT INTO hash_cracking_results (
+                hash_generation_id, cracking_attack_type_id, duration_seconds, 
+                hashes_per_second, cracked_status, batch_size
+            ) VALUES (%s, %s, 0, 0, %s, %s)
+        """, (hg_id, ATTACK_TYPE_ID, cracked_status, len(jobs)))
+
+
+def commit_batch(conn, cursor, job_ids):
+    """Commits the batch's results with its jobs marked done, or discards them if the lease was lost."""
+    if complete_crack_jobs(cursor, job_ids):
+        conn.commit()
+        return True
+    conn.rollback()
+    print(f"Lease lost on crack jobs {job_ids}; another node has taken them over. Results discarded.")
+    return False
+
+
+def execute_hashcat(command, session, runtime_seconds, label, cancelled=None):
+    """
+    Runs a hashcat session under the hardware monitor and parses its machine-readable status.
+
+    The session's elapsed time is checkpointed on every STATUS line, so a restored session keeps counting
+    against the same budget. Hashcat is stopped once a restored session overruns its budget, or when
+    `cancelled`, polled every CRACK_CANCEL_POLL_SECONDS, returns True.
+
+    Returns:
+        dict: speed_hps, progress_done, progress_total, timed_out, cancelled, start_time, elapsed_before,
+              duration and the hardware metrics.
+    """
+    monitor = HardwareMonitor()
+    monitor.start()
+    start_time = time.time()
+    elapsed_before = session["elapsed_seconds"]
+    next_cancel_poll = start_time + CRACK_CANCEL_POLL_SECONDS
+    
+    speed_hps = 0.0
+    progress_done = progress_total = None
+    timed_out = was_cancelled = False
+    error_log = []
+    
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    
+        # Parse the machine-readable stdout
+        for line in process.stdout:
+            if line.startswith("STATUS"):
+                status = parse_status_line(line)
+                speed_hps = status.get("speed_hps", speed_hps)
+                progress_done = status.get("progress_done", progress_done)
+                progress_total = status.get("progress_total", progress_total)
+
+                # Checkpoint the elapsed time so a restored session keeps counting against the same budget
+                session["elapsed_seconds"] = elapsed_before + time.time() - start_time
+                save_session(session)
+
+                # --runtime restarts its clock on --restore, so a resumed session is stopped here
+                if runtime_seconds and session["elapsed_seconds"] > runtime_seconds + 5 and not timed_out:
+                    timed_out = True
+                    process.terminate()
+
+                if cancelled is not None and time.time() >= next_cancel_poll and not was_cancelled:
+                    next_cancel_poll = time.time() + CRACK_CANCEL_POLL_SECONDS
+                    if cancelled():
+                        was_cancelled = True
+                        process.terminate()
+            else:
+                if line.strip():
+                    error_log.append(line.strip())
+                    
+        process.wait()
+    finally:
+        # Stop Telemetry
+        monitor.stop()
+    
+    # If it failed to launch, dump the error log
+    if progress_total is None and not was_cancelled:
+        print(f"\n--- HASHCAT FATAL ERROR FOR {label} ---")
+        for err in error_log:
+            print(err)
+        print("-------------------------------------------\n")
+
+    return {
+        "speed_hps": speed_hps,
+        "progress_done": progress_done,
+        "progress_total": progress_total,
+        # Exit status 4: aborted by --runtime
+        "timed_out": timed_out or process.returncode == 4,
+        "cancelled": was_cancelled,
+        "start_time": start_time,
+        "elapsed_before": elapsed_before,
+        "duration": elapsed_before + time.time() - start_time,
+        "metrics": monitor.get_metrics(),
+    }
+
+
+def shard_crack_jobs(conn, cursor, job_ids, module_code, attack_params, wordlist_path, slices):
+    """
+    Splits the keyspace of each claimed job into up to `slices` --skip/--limit ranges and hands the jobs
+    over to them. The jobs leave the queue as 'sharded'; any cracker node then claims their slices in
+    run_crack_slice, and the last slice to finish records the job's result.
+
+    Returns:
+        bool: False if hashcat could not compute the keyspace, so the batch should run as one session.
+    """
+    keyspace = hashcat_keyspace(module_code, attack_params, wordlist_path)
+    if keyspace is None or keyspace < 2:
+        return False
+    slice_size = -(-keyspace // min(slices, keyspace))
+
+    cursor.execute("""
+        UPDATE crack_jobs
+        SET status = 'sharded', keyspace = %(keyspace)s, shard_wordlist = %(wordlist)s, sharded_at = now(),
+            lease_owner = NULL, lease_expires_at = NULL
+        WHERE id = ANY(%(ids)s) AND lease_owner = %(owner)s AND status = 'running'
+    """, {"keyspace": keyspace, "wordlist": wordlist_path, "ids": job_ids, "owner": WORKER_ID})
+    if cursor.rowcount != len(job_ids):
+        conn.rollback()
+        print(f"Lease lost on crack jobs {job_ids}; another node has taken them over.")
+        return True
+
+    cursor.execute("""
+        INSERT INTO crack_job_slices (crack_job_id, slice_index, skip_candidates, limit_candidates)
+        SELECT job_id, i, i * %(size)s, LEAST(%(size)s, %(keyspace)s - i * %(size)s)
+        FROM unnest(%(ids)s::BIGINT[]) AS job_id, generate_series(0, %(slices)s - 1) AS i
+        WHERE i * %(size)s < %(keyspace)s
+        ORDER BY job_id, i
+    """, {"size": slice_size, "keyspace": keyspace, "ids": job_ids, "slices": slices})
+    slice_count = cursor.rowcount
+    # Wakes idle nodes of every attack type once the slices are committed
+    cursor.execute("SELECT pg_notify('hashes_ready', %s)", (SLICES_READY,))
+    conn.commit()
+    print(f"Sharded crack jobs {job_ids} (keyspace {keyspace}) into {slice_count} slices of {slice_size}.")
+    return True
+
+
+def slice_cancelled(db, slice_id):
+    """
+    True once the slice no longer runs under this node: cancelled by a slice that cracked the hash,
+    dropped when its job was resharded, or taken over.
+    """
+    try:
+        with db.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("EXECUTE slice_status(%s)", (slice_id,))
+                row = cursor.fetchone()
+    except psycopg2.Error as e:
+        print(f"Slice status check failed: {e}")
+        return False
+    return row is None or row[0] != "running" or row[1] != WORKER_ID
+
+
+def reshard_crack_job(conn, cursor, crack_job_id):
+    """
+    Returns a sharded job to the queue because the wordlist its slice bounds index is gone. The job's
+    slices are dropped, which stops the nodes running them, and the next claim shards it again on the
+    current wordlist.
+    """
+    cursor.execute("SELECT cracking_attack_type_id FROM crack_jobs WHERE id = %s AND status = 'sharded' FOR UPDATE",
+                   (crack_job_id,))
+    row = cursor.fetchone()
+    if row is None:
+        conn.rollback()
+        return
+
+    cursor.execute("DELETE FROM crack_job_slices WHERE crack_job_id = %s", (crack_job_id,))
+    cursor.execute("""
+        UPDATE crack_jobs
+        SET status = 'pending', keyspace = NULL, shard_wordlist = NULL, sharded_at = NULL
+        WHERE id = %s
+    """, (crack_job_id,))
+    cursor.execute("SELECT pg_notify('hashes_ready', %s)", (str(row[0]),))
+    conn.commit()
+    print(f"Crack job {crack_job_id} returned to the queue to be sharded again.")
+
+
+def finish_slice(conn, cursor, slice_id, crack_job_id, cracked_password, cracked_at, run):
+    """
+    Records a finished slice; one that cracked the hash cancels the job's other slices. Once none of the
+    job's slices is pending or running, the job's result is recorded and the job marked done in the same
+    transaction. The result is timed from sharding to the first crack, across every node that took part,
+    and its speed adds up the slices' guess rates.
+
+    Returns:
+        bool: False if the slice was cancelled or taken over meanwhile; its results are then discarded.
+    """
+    # Serialises slices of the job finishing together, so exactly one of them sees that it was the last
+    cursor.execute("SELECT id FROM crack_jobs WHERE id = %s FOR UPDATE", (crack_job_id,))
+    cursor.execute("""
+        UPDATE crack_job_slices
+        SET status = 'done', lease_owner = NULL, lease_expires_at = NULL, finished_at = now(),
+            cracked_password = %(password)s, cracked_at = to_timestamp(%(cracked_at)s),
+            hashes_per_second = %(speed)s, keyspace_progress = %(progress_done)s,
+            keyspace_total = %(progress_total)s, timed_out = %(timed_out)s
+        WHERE id = %(id)s AND lease_owner = %(owner)s AND status = 'running'
+    """, {"password": cracked_password, "cracked_at": cracked_at, "speed": run["speed_hps"],
+          "progress_done": run["progress_done"], "progress_total": run["progress_total"],
+          "timed_out": run["timed_out"], "id": slice_id, "owner": WORKER_ID})
+    if cursor.rowcount != 1:
+        conn.rollback()
+        print(f"Slice {slice_id} was cancelled or taken over by another node. Results discarded.")
+        return False
+
+    if cracked_password is not None:
+        cursor.execute("""
+            UPDATE crack_job_slices
+            SET status = 'cancelled', lease_owner = NULL, lease_expires_at = NULL
+            WHERE crack_job_id = %s AND status IN ('pending', 'running')
+        """, (crack_job_id,))
+
+    cursor.execute("""
+        INSERT INTO hash_cracking_results (
+            hash_generation_id, cracking_attack_type_id, duration_seconds,
+            hashes_per_second, cracked_status, cracked_password, batch_size,
+            keyspace_progress, keyspace_total, censored
+        )
+        SELECT cj.hash_generation_id, cj.cracking_attack_type_id,
+               EXTRACT(EPOCH FROM COALESCE(MIN(s.cracked_at), MAX(s.finished_at)) - cj.sharded_at),
+               SUM(s.hashes_per_second),
+               CASE WHEN bool_or(s.cracked_password IS NOT NULL) THEN 'CRACKED'
+                    WHEN bool_or(s.timed_out) THEN 'TIMEOUT'
+                    ELSE 'FAILED' END,
+               MIN(s.cracked_password), 1,
+               SUM(s.keyspace_progress),
+               CASE WHEN bool_and(s.status = 'done') THEN SUM(s.keyspace_total) END,
+               NOT bool_or(s.cracked_password IS NOT NULL) AND COALESCE(bool_or(s.timed_out), FALSE)
+        FROM crack_jobs cj
+        JOIN crack_job_slices s ON s.crack_job_id = cj.id
+        WHERE cj.id = %s AND cj.status = 'sharded'
+        GROUP BY cj.id
+        HAVING NOT bool_or(s.status IN ('pending', 'running'))
+    """, (crack_job_id,))
+    if cursor.rowcount == 1:
+        cursor.execute("UPDATE crack_jobs SET status = 'done' WHERE id = %s", (crack_job_id,))
+        print(f"Crack job {crack_job_id} finished across its slices.")
+
+    conn.commit()
+    return True
+
+
+def run_crack_slice(db, conn):
+    """
+    Claims the next open slice of a sharded job, whatever its attack type, and runs hashcat over its
+    --skip/--limit range. The slice stops early once another slice of the job cracks the hash.
+
+    Returns:
+        bool: False when no slice is waiting.
+    """
+    cursor = conn.cursor()
+    cursor.execute("EXECUTE claim_slice(%s, %s)", (WORKER_ID, CRACK_LEASE_SECONDS))
+    row = cursor.fetchone()
+    conn.commit()
+
+    if not row:
+        cursor.close()
+        return False
+
+    (slice_id, crack_job_id, skip, limit, attack_type_id, attack_params, experiment_run_id, wordlist_path,
+     hg_id, target_hash, password, algo_name) = row
+    jobs = [(hg_id, target_hash.strip().strip('"').strip("'"), password)]
+    module_code = get_hashcat_module(algo_name)
+
+    # Combinator slice bounds index the wordlist the job was sharded on. Builds of one watermark are
+    # identical, so a missing file is rebuilt here if the run has not grown since; otherwise the
+    # bounds no longer match any wordlist and the job is sharded again.
+    if not os.path.exists(wordlist_path):
+        rebuilt_path, _ = build_dynamic_wordlist(conn, experiment_run_id)
+        if attack_params.get("mode") == "1" and os.path.basename(rebuilt_path) != os.path.basename(wordlist_path):
+            print(f"The sharded wordlist {wordlist_path} of crack job {crack_job_id} is gone and the run has new hashes.")
+            reshard_crack_job(conn, cursor, crack_job_id)
+            cursor.close()
+            return True
+        wordlist_path = rebuilt_path
+
+    session = open_session(f"slice{slice_id}", [slice_id], wordlist_path)
+    runtime_seconds = int(attack_params.get("runtime", CRACK_RUNTIME_SECONDS))
+
+    if session["restored"]:
+        command = [HASHCAT_BIN, "--session", session["name"], "--restore",
+                   "--restore-file-path", session["restore_file"]]
+        print(f"Restoring session {session['name']} after {session['elapsed_seconds']:.0f}s")
+    else:
+        with open(session["hash_file"], "w", encoding="utf-8") as f:
+            f.write(jobs[0][1] + "\n")
+        command = build_hashcat_command(module_code, attack_params, wordlist_path, session, runtime_seconds)
+        command.extend(["--skip", str(skip), "--limit", str(limit)])
+
+    print(f"Starting slice {slice_id} of crack job {crack_job_id} (ID {hg_id}, keyspace {skip}..{skip + limit}) | DB Algo: {algo_name} | Module: {module_code} | Mode: {attack_params.get('mode')} | Attack ID: {attack_type_id} | Budget: {runtime_seconds or 'none'}")
+
+    lease = LeaseKeeper(db, [slice_id], "renew_slice_leases")
+    lease.start()
+    try:
+        run = execute_hashcat(command, session, runtime_seconds, f"SLICE {slice_id}",
+                              cancelled=lambda: slice_cancelled(db, slice_id))
+    finally:
+        lease.stop()
+
+    if run["cancelled"]:
+        # A slice taken over by another node keeps its session files for that node's restore
+        cursor.execute("EXECUTE slice_status(%s)", (slice_id,))
+        status_row = cursor.fetchone()
+        if status_row is None or status_row[0] == "cancelled":
+            print(f"Slice {slice_id} cancelled: crack job {crack_job_id} was cracked by another slice or resharded.")
+            close_session(session)
+        conn.commit()
+        cursor.close()
+        return True
+
+    cracked_at, cracked_password = read_outfile(session["outfile"], jobs).get(hg_id, (None, None))
+    print(f"Slice result: {'CRACKED' if cracked_password is not None else 'TIMEOUT' if run['timed_out'] else 'FAILED'} in {run['duration']:.2f}s | Speed: {run['speed_hps']:.1f} H/s")
+
+    if finish_slice(conn, cursor, slice_id, crack_job_id, cracked_password, cracked_at, run):
+        close_session(session)
+    cursor.close()
+    return True
+
+
+def run_crack_job(db, conn):
+    """Claims a batch of pending hashes, generates a targeted wordlist, executes Hashcat once, and records telemetry per hash."""
     cursor = conn.cursor()
     
     # 1. Fetch the Attack Parameters
@@ -190,177 +1091,142 @@ def run_crack_job():
     if not attack_row:
         print(f"Critical Error: ATTACK_TYPE_ID {ATTACK_TYPE_ID} not found in database.")
         cursor.close()
-        conn.close()
         return False
         
     attack_params = attack_row[0]
     
-    # 2. Retrieve one uncracked hash, enforcing sample limits and isolating by ATTACK_TYPE_ID
-    cursor.execute("""
-        SELECT 
-            hg.id, 
-            hg.generated_hash, 
-            a.name AS algorithm_name,
-            er.id AS experiment_run_id
-        FROM hash_generations hg
-        JOIN experiment_runs er ON hg.experiment_run_id = er.id
-        JOIN algorithm_configurations ac ON er.alg_config_id = ac.id
-        JOIN algorithms a ON ac.algorithm_id = a.id
-        LEFT JOIN hash_cracking_results hcr ON hg.id = hcr.hash_generation_id 
-                                            AND hcr.cracking_attack_type_id = %(attack_type)s
-        WHERE hcr.id IS NULL
-          AND (
-              SELECT COUNT(hcr_count.id) 
-              FROM hash_cracking_results hcr_count 
-              JOIN hash_generations hg_count ON hcr_count.hash_generation_id = hg_count.id
-              WHERE hg_count.experiment_run_id = er.id 
-                AND hcr_count.cracking_attack_type_id = %(attack_type)s
-          ) < %(limit)s
-        ORDER BY hg.id ASC
-        LIMIT 1
-    """, {"attack_type": ATTACK_TYPE_ID, "limit": CRACK_SAMPLE_LIMIT})
-    
-    job = cursor.fetchone()
+    # 2. Lease a batch of queued hashes of one run for this ATTACK_TYPE_ID
+    batch = claim_crack_batch(cursor)
+    conn.commit()
     
-    if not job:
+    if not batch:
         cursor.close()
-        conn.close()
         return False
         
-    hg_id, target_hash, algo_name, experiment_run_id = job
+    algo_name, experiment_run_id, rows = batch
+    job_ids = [row[0] for row in rows]
+    jobs = [(hg_id, target_hash.strip().strip('"').strip("'"), password) for _, hg_id, target_hash, password in rows]
     module_code = get_hashcat_module(algo_name)
     
     if not module_code:
-        print(f"Error: Algorithm '{algo_name}' not mapped to a Hashcat module. Skipping.")
-        cursor.execute("""
-            INSERT INTO hash_cracking_results (
-                hash_generation_id, cracking_attack_type_id, duration_seconds, 
-                hashes_per_second, cracked_status
-            ) VALUES (%s, %s, 0, 0, 'UNSUPPORTED_ALGO')
-        """, (hg_id, ATTACK_TYPE_ID))
-        conn.commit()
+        print(f"Error: Algorithm '{algo_name}' not mapped to a Hashcat module. Skipping {len(jobs)} hashes.")
+        record_skipped_batch(cursor, jobs, 'UNSUPPORTED_ALGO')
+        commit_batch(conn, cursor, job_ids)
         cursor.close()
-        conn.close()
         return True
     
-    # 3. Prepare the environment
-    clean_hash = target_hash.strip().strip('"').strip("'")
-    with open(HASH_FILE_PATH, "w", encoding="utf-8") as f:
-        f.write(clean_hash + "\n")
-        
-    if os.path.exists(POTFILE_PATH):
-        os.remove(POTFILE_PATH)
-
-    # 4. Build the targeted wordlist
-    print(f"Generating dynamic wordlist for Run ID: {experiment_run_id}...")
-    wordlist_size = build_dynamic_wordlist(experiment_run_id)
-    print(f"Targeted wordlist created with {wordlist_size} guaranteed passwords.")
+    # 3. Build the targeted wordlist
+    print(f"Loading dynamic wordlist for Run ID: {experiment_run_id}...")
+    wordlist_path, wordlist_size = build_dynamic_wordlist(conn, experiment_run_id)
+    print(f"Targeted wordlist {wordlist_path} holds {wordlist_size} guaranteed passwords.")
     
     if wordlist_size == 0:
-        print(f"Skipping ID {hg_id}: No passwords found for Run ID '{experiment_run_id}'.")
-        cursor.execute("""
-            INSERT INTO hash_cracking_results (
-                hash_generation_id, cracking_attack_type_id, duration_seconds, 
-                hashes_per_second, cracked_status
-            ) VALUES (%s, %s, 0, 0, 'SKIPPED_EMPTY_WORDLIST')
-        """, (hg_id, ATTACK_TYPE_ID))
-        conn.commit()
+        print(f"Skipping {len(jobs)} hashes: No passwords found for Run ID '{experiment_run_id}'.")
+        record_skipped_batch(cursor, jobs, 'SKIPPED_EMPTY_WORDLIST')
+        commit_batch(conn, cursor, job_ids)
         cursor.close()
-        conn.close()
         return True
 
-    # 5. Construct the dynamic command
-    command = build_hashcat_command(module_code, attack_params)
+    # 4. Split mask and combinator jobs into keyspace slices for every node to claim
+    slices = int(attack_params.get("slices", CRACK_SHARD_SLICES))
+    if slices > 1 and attack_params.get("mode") in SHARDABLE_MODES:
+        if shard_crack_jobs(conn, cursor, job_ids, module_code, attack_params, wordlist_path, slices):
+            cursor.close()
+            return True
 
-    print(f"Starting ID {hg_id} | DB Algo: {algo_name} | Module: {module_code} | Mode: {attack_params.get('mode')} | Attack ID: {ATTACK_TYPE_ID}")
-    
-    # 6. Start Telemetry and Execution
-    monitor = HardwareMonitor()
-    monitor.start()
-    start_time = time.time()
-    
-    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-    
-    speed_hps = 0.0
-    error_log = []
-    
-    # Parse the machine-readable stdout
-    for line in process.stdout:
-        if line.startswith("STATUS"):
-            parts = line.split('\t')
-            if len(parts) > 5:
-                try:
-                    speed_hps = float(parts[4]) 
-                except ValueError:
-                    pass
-        else:
-            if line.strip():
-                error_log.append(line.strip())
-                    
-    process.wait()
-    duration = time.time() - start_time
-    
-    # If it failed to launch, dump the error log
-    if speed_hps == 0.0:
-        print(f"\n--- HASHCAT FATAL ERROR FOR ID {hg_id} ---")
-        for err in error_log:
-            print(err)
-        print("-------------------------------------------\n")
+    # 5. Prepare the session, resuming an interrupted one from its restore point
+    session = open_session(f"attack{ATTACK_TYPE_ID}_job{job_ids[0]}", job_ids, wordlist_path)
+    runtime_seconds = int(attack_params.get("runtime", CRACK_RUNTIME_SECONDS))
+    hg_ids = [hg_id for hg_id, _, _ in jobs]
+
+    # 6. Construct the dynamic command
+    if session["restored"]:
+        command = [HASHCAT_BIN, "--session", session["name"], "--restore",
+                   "--restore-file-path", session["restore_file"]]
+        print(f"Restoring session {session['name']} after {session['elapsed_seconds']:.0f}s")
+    else:
+        with open(session["hash_file"], "w", encoding="utf-8") as f:
+            for _, clean_hash, _ in jobs:
+                f.write(clean_hash + "\n")
+        command = build_hashcat_command(module_code, attack_params, wordlist_path, session, runtime_seconds)
 
-    # Stop Telemetry
-    monitor.stop()
-    metrics = monitor.get_metrics()
+    print(f"Starting IDs {hg_ids[0]}..{hg_ids[-1]} ({len(jobs)} hashes) | DB Algo: {algo_name} | Module: {module_code} | Mode: {attack_params.get('mode')} | Attack ID: {ATTACK_TYPE_ID} | Budget: {runtime_seconds or 'none'}")
     
-    # 7. Check Results
-    cracked_password = None
-    cracked_status = "FAILED"
+    # 7. Execute under telemetry while the leases are renewed
+    lease = LeaseKeeper(db, job_ids)
+    lease.start()
+    try:
+        run = execute_hashcat(command, session, runtime_seconds, f"IDS {hg_ids[0]}..{hg_ids[-1]}")
+    finally:
+        lease.stop()
+    start_time, elapsed_before, duration = run["start_time"], run["elapsed_before"], run["duration"]
+    speed_hps, progress_done, progress_total = run["speed_hps"], run["progress_done"], run["progress_total"]
+    timed_out, metrics = run["timed_out"], run["metrics"]
     
-    if os.path.exists(POTFILE_PATH):
-        with open(POTFILE_PATH, "r") as f:
-            pot_data = f.read().strip()
-            if pot_data:
-                cracked_password = pot_data.split(":")[-1]
-                cracked_status = "CRACKED"
+    # 8. Check Results. A cracked hash is timed from the session start to its outfile
+    # timestamp (whole seconds); cracks from before a restore are capped at the time
+    # elapsed up to the restore. The others ran for the whole session: hashes still
+    # uncracked when the budget ran out are right-censored TIMEOUTs.
+    cracked = read_outfile(session["outfile"], jobs)
+    uncracked_status = "TIMEOUT" if timed_out else "FAILED"
+    progress_label = f"{progress_done}/{progress_total}" if progress_total else "unknown"
+    print(f"Result: {len(cracked)}/{len(jobs)} CRACKED, others {uncracked_status}, in {duration:.2f}s | Speed: {speed_hps:.1f} H/s | Progress: {progress_label}")
 
-    print(f"Result: {cracked_status} in {duration:.2f}s | Speed: {speed_hps} H/s")
+    # 9. Save Telemetry to Database
+    for hg_id in hg_ids:
+        if hg_id in cracked:
+            cracked_at, cracked_password = cracked[hg_id]
+            if cracked_at >= start_time:
+                hash_duration = min(elapsed_before + cracked_at - start_time, duration)
+            else:
+                hash_duration = min(max(cracked_at - session["first_started_at"], 0.0), elapsed_before)
+            cracked_status, censored = "CRACKED", False
+        else:
+            hash_duration, cracked_password = duration, None
+            cracked_status, censored = uncracked_status, timed_out
 
-    # 8. Save Telemetry to Database
-    cursor.execute("""
-        INSERT INTO hash_cracking_results (
-            hash_generation_id, cracking_attack_type_id, duration_seconds, 
-            hashes_per_second, cracked_status, cracked_password,
-            cpu_usage_percent_avg, cpu_usage_percent_max,
-            ram_usage_mb_avg, ram_usage_mb_max,
-            gpu_usage_percent_avg, gpu_usage_percent_max,
-            gpu_memory_mb_avg, gpu_memory_mb_max
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-    """, (
-        hg_id, ATTACK_TYPE_ID, duration, speed_hps, cracked_status, cracked_password,
-        metrics['cpu_avg'], metrics['cpu_max'], 
-        metrics['ram_avg'], metrics['ram_max'],
-        metrics['gpu_avg'], metrics['gpu_max'],
-        metrics['gpu_mem_avg'], metrics['gpu_mem_max']
-    ))
+        cursor.execute("EXECUTE insert_result(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)", (
+            hg_id, ATTACK_TYPE_ID, hash_duration, speed_hps, cracked_status, cracked_password,
+            metrics['cpu_avg'], metrics['cpu_max'], 
+            metrics['ram_avg'], metrics['ram_max'],
+            metrics['gpu_avg'], metrics['gpu_max'],
+            metrics['gpu_mem_avg'], metrics['gpu_mem_max'], len(jobs),
+            progress_done, progress_total, censored
+        ))
     
-    conn.commit()
+    if commit_batch(conn, cursor, job_ids):
+        close_session(session)
     cursor.close()
-    conn.close()
     return True
 
 
 if __name__ == "__main__":
-    print(f"Initializing Cracker Service for Attack Type {ATTACK_TYPE_ID}...")
+    print(f"Initializing Cracker Service for Attack Type {ATTACK_TYPE_ID} (batches of {CRACK_BATCH_SIZE})...")
     
     # Wait briefly for the DB to be fully ready
     time.sleep(5) 
 
+    schema_conn = psycopg2.connect(host=DB_HOST, dbname=DB_NAME, user=DB_USER, password=DB_PASS)
+    ensure_cracker_schema(schema_conn)
+    backfill_crack_jobs(schema_conn)
+    schema_conn.close()
+
+    db = Database()
+    listener = NotificationListener()
+
     # Main Daemon Loop
     while True:
         try:
-            has_jobs = run_crack_job()
+            with db.connection() as conn:
+                # Slices of sharded jobs come first, whatever their attack type
+                has_jobs = run_crack_slice(db, conn) or run_crack_job(db, conn)
             if not has_jobs:
-                # Sleep if there are no hashes left to crack for this specific attack type
-                time.sleep(10)
+                # Wait for new hashes of this specific attack type, polling as a fallback
+                listener.wait(CRACK_IDLE_POLL_SECONDS)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            # The broken connection has been dropped from the pool; the next job reconnects.
+            print(f"Database connection lost, reconnecting: {e}")
+            time.sleep(1)
         except Exception as e:
             print(f"Error during cracking loop: {e}")
-            time.sleep(10)
\ No newline at end of file
+            time.sleep(10)
@@ -0,0 +1,146 @@
+import textwrap
+
+
+# Idempotent additions to startup_sql/setup_db.sql for the cracking tables.
+# The SQL file only runs when the database volume is first initialised, so
+# existing deployments pick these up when a cracker node starts.
+CRACKER_SCHEMA_STATEMENTS = [
+    """
+    ALTER TABLE hash_cracking_results
+    ADD COLUMN IF NOT EXISTS batch_size INT;
+    """,
+    """
+    ALTER TABLE hash_cracking_results
+    ADD COLUMN IF NOT EXISTS keyspace_progress BIGINT,
+    ADD COLUMN IF NOT EXISTS keyspace_total BIGINT,
+    ADD COLUMN IF NOT EXISTS censored BOOLEAN;
+    """,
+    """
+    ALTER TABLE cracking_attack_types
+    ADD COLUMN IF NOT EXISTS sample_limit INT DEFAULT 100;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS crack_jobs (
+        id BIGSERIAL PRIMARY KEY,
+        hash_generation_id BIGINT NOT NULL REFERENCES hash_generations(id),
+        cracking_attack_type_id INT NOT NULL REFERENCES cracking_attack_types(id),
+        experiment_run_id BIGINT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        lease_owner TEXT,
+        lease_expires_at TIMESTAMPTZ,
+        attempts INT NOT NULL DEFAULT 0,
+        enqueued_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        UNIQUE (hash_generation_id, cracking_attack_type_id)
+    );
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS crack_jobs_open_idx
+    ON crack_jobs (cracking_attack_type_id, id) WHERE status <> 'done';
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS crack_jobs_open_run_idx
+    ON crack_jobs (cracking_attack_type_id, experiment_run_id, id) WHERE status <> 'done';
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS crack_job_quotas (
+        experiment_run_id BIGINT NOT NULL,
+        cracking_attack_type_id INT NOT NULL REFERENCES cracking_attack_types(id),
+        enqueued INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (experiment_run_id, cracking_attack_type_id)
+    );
+    """,
+    """
+    CREATE OR REPLACE FUNCTION enqueue_crack_jobs() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        quota RECORD;
+        added INT;
+    BEGIN
+        INSERT INTO crack_job_quotas (experiment_run_id, cracking_attack_type_id)
+        SELECT DISTINCT n.experiment_run_id, cat.id
+        FROM new_rows n CROSS JOIN cracking_attack_types cat
+        ON CONFLICT DO NOTHING;
+
+        -- The counter rows serialise concurrent inserts into the same run.
+        FOR quota IN
+            SELECT q.experiment_run_id, q.cracking_attack_type_id, cat.sample_limit - q.enqueued AS remaining
+            FROM crack_job_quotas q
+            JOIN cracking_attack_types cat ON cat.id = q.cracking_attack_type_id
+            WHERE q.experiment_run_id IN (SELECT DISTINCT experiment_run_id FROM new_rows)
+            ORDER BY q.experiment_run_id, q.cracking_attack_type_id
+            FOR UPDATE OF q
+        LOOP
+            CONTINUE WHEN quota.remaining <= 0;
+
+            INSERT INTO crack_jobs (hash_generation_id, cracking_attack_type_id, experiment_run_id)
+            SELECT n.id, quota.cracking_attack_type_id, n.experiment_run_id
+            FROM new_rows n
+            WHERE n.experiment_run_id = quota.experiment_run_id
+            ORDER BY n.id
+            LIMIT quota.remaining
+            ON CONFLICT DO NOTHING;
+            GET DIAGNOSTICS added = ROW_COUNT;
+
+            UPDATE crack_job_quotas SET enqueued = enqueued + added
+            WHERE experiment_run_id = quota.experiment_run_id
+              AND cracking_attack_type_id = quota.cracking_attack_type_id;
+
+            -- Wakes idle cracker nodes of the attack type once the inserting transaction commits.
+            IF added > 0 THEN
+                PERFORM pg_notify('hashes_ready', quota.cracking_attack_type_id::TEXT);
+            END IF;
+        END LOOP;
+
+        RETURN NULL;
+    END
+    $$;
+    """,
+    """
+    ALTER TABLE crack_jobs
+    ADD COLUMN IF NOT EXISTS keyspace BIGINT,
+    ADD COLUMN IF NOT EXISTS shard_wordlist TEXT,
+    ADD COLUMN IF NOT EXISTS sharded_at TIMESTAMPTZ;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS crack_job_slices (
+        id BIGSERIAL PRIMARY KEY,
+        crack_job_id BIGINT NOT NULL REFERENCES crack_jobs(id),
+        slice_index INT NOT NULL,
+        skip_candidates BIGINT NOT NULL,
+        limit_candidates BIGINT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        lease_owner TEXT,
+        lease_expires_at TIMESTAMPTZ,
+        attempts INT NOT NULL DEFAULT 0,
+        started_at TIMESTAMPTZ,
+        finished_at TIMESTAMPTZ,
+        cracked_password TEXT,
+        cracked_at TIMESTAMPTZ,
+        hashes_per_second DOUBLE PRECISION,
+        keyspace_progress BIGINT,
+        keyspace_total BIGINT,
+        timed_out BOOLEAN,
+        UNIQUE (crack_job_id, slice_index)
+    );
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS crack_job_slices_open_idx
+    ON crack_job_slices (id) WHERE status IN ('pending', 'running');
+    """,
+    """
+    CREATE OR REPLACE TRIGGER hash_generations_enqueue_crack_jobs
+    AFTER INSERT ON hash_generations
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION enqueue_crack_jobs();
+    """,
+]
+
+
+def ensure_cracker_schema(conn):
+    """Applies the cracker's schema additions to an existing database (psycopg2 connection)."""
+    with conn.cursor() as cursor:
+        # Several cracker nodes start together; serialise the DDL between them.
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext('cracker_schema'))")
+        for statement in CRACKER_SCHEMA_STATEMENTS:
+            cursor.execute(textwrap.dedent(statement))
+    conn.commit()
@@ -23,17 +23,20 @@ attack_types = [
     },
     {
         "name": "Mask Brute-Force (8 char)",
-        "description": "Exhaustive brute force using a defined 8-character mixed mask. No wordlist required.",
+        "description": "Exhaustive brute force using a defined 8-character mixed mask. No wordlist required. Each hash's keyspace is split into 8 slices that any cracker node can claim; slices stop after one hour and are recorded as TIMEOUT.",
         "parameters_json": {
             "mode": "3",
-            "mask": "?a?a?a?a?a?a?a?a"
+            "mask": "?a?a?a?a?a?a?a?a",
+            "runtime": "3600",
+            "slices": "8"
         }
     },
     {
         "name": "Combinator Attack",
-        "description": "Combining two wordlists. The cracker will handle list generation/mounting.",
+        "description": "Combining two wordlists. The cracker will handle list generation/mounting. Each hash's keyspace is split into 4 slices that any cracker node can claim.",
         "parameters_json": {
-            "mode": "1"
+            "mode": "1",
+            "slices": "4"
         }
     }
 ]
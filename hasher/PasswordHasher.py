@@ -1,10 +1,37 @@
 import os
+import hmac
 import hashlib
+import functools
 import bcrypt
 import base64
 import argon2
 from argon2 import PasswordHasher as Argon2PasswordHasher
 
+# bcrypt uses its own base64 alphabet for the 22-character salt.
+BCRYPT_B64_TRANSLATION = bytes.maketrans(
+    b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/",
+    b"./ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789")
+BCRYPT_SALT_BYTES = 16
+
+
+@functools.lru_cache(maxsize=64)
+def _argon2_backend(m, t, p, dklen, salt_length):
+    """Returns a shared argon2-cffi hasher for one parameter set."""
+    return Argon2PasswordHasher(
+        memory_cost=m,
+        time_cost=t,
+        parallelism=p,
+        hash_len=dklen,
+        salt_len=salt_length,
+        type=argon2.Type.ID
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def _cached_password_hasher(algorithm, frozen_params):
+    return PasswordHasher(algorithm, **dict(frozen_params))
+
+
 class PasswordHasher:
     """
     A class to encapsulate various password hashing algorithms.
@@ -12,6 +39,9 @@ class PasswordHasher:
     This class provides a unified interface for different hashing algorithms,
     handling the specifics of salt generation, parameter passing, and ensuring
     Hashcat-compatible Modular Crypt Format (MCF) outputs.
+
+    Parameters are parsed and the backend resolved once, in the constructor,
+    so repeated generate_hash calls only pay for the hash itself.
     """
 
     def __init__(self, algorithm, **kwargs):
@@ -30,87 +60,148 @@ class PasswordHasher:
         if self.algorithm not in self.hasher_methods:
             raise ValueError(f"Unsupported algorithm: {self.algorithm}")
 
+        # Dictionary to map algorithm names to their verification methods.
+        self.verifier_methods = {
+            'pbkdf2_sha256': self._verify_pbkdf2,
+            'pbkdf2': self._verify_pbkdf2,
+            'bcrypt': self._verify_bcrypt,
+            'scrypt': self._verify_scrypt,
+            'argon2': self._verify_argon2
+        }
+
+        self._hasher_func = self.hasher_methods[self.algorithm]
+        self._verifier_func = self.verifier_methods[self.algorithm]
+        self._configure(**kwargs)
+
+    @classmethod
+    def cached(cls, algorithm, **kwargs):
+        """
+        Returns a shared PasswordHasher for this algorithm and parameter set.
+
+        Instances are kept in an LRU keyed by the frozen parameters, so pools
+        and services that see the same configuration reuse one object.
+        """
+        return _cached_password_hasher(algorithm.lower(), frozenset(kwargs.items()))
+
+    def _configure(self, **kwargs):
+        if self.algorithm in ('pbkdf2_sha256', 'pbkdf2'):
+            self.iterations = int(kwargs.get('iterations', 100000))
+            self.dklen = int(kwargs.get('dklen', 32))
+            self.hash_algo = kwargs.get('hash_algo', 'sha256')
+            self.salt_length = int(kwargs.get('salt_bytes', 16))
+        elif self.algorithm == 'bcrypt':
+            self.rounds = int(kwargs.get('rounds', 12))
+            self.salt_length = BCRYPT_SALT_BYTES
+        elif self.algorithm == 'scrypt':
+            self.N = int(kwargs.get('N', 16384))
+            self.r = int(kwargs.get('r', 8))
+            self.p = int(kwargs.get('p', 1))
+            self.dklen = int(kwargs.get('dklen', 32))
+            self.salt_length = int(kwargs.get('salt_bytes', 16))
+        elif self.algorithm == 'argon2':
+            m = int(kwargs.get('m', 65536))
+            t = int(kwargs.get('t', 2))
+            p = int(kwargs.get('p', 1))
+            dklen = int(kwargs.get('dklen', 32))
+            self.salt_length = int(kwargs.get('salt_bytes', 16))
+            self.argon2_hasher = _argon2_backend(m, t, p, dklen, self.salt_length)
+
     def generate_hash(self, password_plaintext):
-        hasher_func = self.hasher_methods[self.algorithm]
-        return hasher_func(password_plaintext, **self.params)
+        return self._hasher_func(password_plaintext)
+
+    def generate_hash_batch(self, passwords):
+        """
+        Hashes several passwords, drawing all of their salts from one os.urandom call.
+
+        Args:
+            passwords (list): The plaintext passwords.
+
+        Returns:
+            list: A (salt, hash) tuple per password, in input order.
+        """
+        salt_pool = self._generate_salt(length=self.salt_length * len(passwords))
+        return [
+            self._hasher_func(password_plaintext,
+                              salt_pool[i * self.salt_length:(i + 1) * self.salt_length])
+            for i, password_plaintext in enumerate(passwords)
+        ]
+
+    def verify(self, password_plaintext, stored_hash):
+        """
+        Checks a password against a hash produced by generate_hash.
+
+        The cost parameters are read from the stored hash, as a login server
+        would, so a hasher configured for one parameter set can verify hashes
+        made with another.
+
+        Returns:
+            bool: True if the password matches, False otherwise.
+
+        Raises:
+            ValueError: If the stored hash is not in the expected format.
+        """
+        return self._verifier_func(password_plaintext, stored_hash)
 
     def _generate_salt(self, length):
         return os.urandom(length)
 
-    def _hash_pbkdf2(self, password_plaintext, **kwargs):
-        iterations = int(kwargs.get('iterations', 100000))
-        dklen = int(kwargs.get('dklen', 32))
-        hash_algo = kwargs.get('hash_algo', 'sha256')
-        salt_length = int(kwargs.get('salt_bytes', 16))
-        
-        salt_bytes = self._generate_salt(length=salt_length)
+    def _hash_pbkdf2(self, password_plaintext, salt_bytes=None):
+        if salt_bytes is None:
+            salt_bytes = self._generate_salt(length=self.salt_length)
 
         derived_key = hashlib.pbkdf2_hmac(
-            hash_name=hash_algo,
+            hash_name=self.hash_algo,
             password=password_plaintext.encode('utf-8'),
             salt=salt_bytes,
-            iterations=iterations,
-            dklen=dklen
+            iterations=self.iterations,
+            dklen=self.dklen
         )
         
         # Format for Hashcat Module 10900 (sha256:iterations:base64_salt:base64_hash)
         b64_salt = base64.b64encode(salt_bytes).decode('utf-8')
         b64_hash = base64.b64encode(derived_key).decode('utf-8')
-        hashcat_ready_string = f"{hash_algo}:{iterations}:{b64_salt}:{b64_hash}"
+        hashcat_ready_string = f"{self.hash_algo}:{self.iterations}:{b64_salt}:{b64_hash}"
         
         return b64_salt, hashcat_ready_string
 
-    def _hash_bcrypt(self, password_plaintext, **kwargs):
-        rounds = int(kwargs.get('rounds', 12))
-        salt_bytes = bcrypt.gensalt(rounds=rounds)
+    def _hash_bcrypt(self, password_plaintext, salt_bytes=None):
+        if salt_bytes is None:
+            salt = bcrypt.gensalt(rounds=self.rounds)
+        else:
+            encoded_salt = base64.b64encode(salt_bytes).translate(BCRYPT_B64_TRANSLATION).rstrip(b'=')
+            salt = b"$2b$%02d$%s" % (self.rounds, encoded_salt)
 
         # Bcrypt natively returns a Hashcat-compatible MCF string
-        hashed = bcrypt.hashpw(password_plaintext.encode('utf-8'), salt_bytes)
+        hashed = bcrypt.hashpw(password_plaintext.encode('utf-8'), salt)
         
-        return salt_bytes.decode('utf-8'), hashed.decode('utf-8')
-
-    def _hash_scrypt(self, password_plaintext, **kwargs):
-        N = int(kwargs.get('N', 16384))
-        r = int(kwargs.get('r', 8))
-        p = int(kwargs.get('p', 1))
-        dklen = int(kwargs.get('dklen', 32))
-        salt_length = int(kwargs.get('salt_bytes', 16))
-        
-        salt_bytes = self._generate_salt(length=salt_length)
+        return salt.decode('utf-8'), hashed.decode('utf-8')
+
+    def _hash_scrypt(self, password_plaintext, salt_bytes=None):
+        if salt_bytes is None:
+            salt_bytes = self._generate_salt(length=self.salt_length)
 
         derived_key = hashlib.scrypt(
             password=password_plaintext.encode('utf-8'),
             salt=salt_bytes,
-            n=N, r=r, p=p,
-            dklen=dklen,
+            n=self.N, r=self.r, p=self.p,
+            dklen=self.dklen,
             maxmem=512 * 1024 * 1024
         )
         
         # Format for Hashcat Module 8900 (SCRYPT:N:r:p:base64_salt:base64_hash)
         b64_salt = base64.b64encode(salt_bytes).decode('utf-8')
         b64_hash = base64.b64encode(derived_key).decode('utf-8')
-        hashcat_ready_string = f"SCRYPT:{N}:{r}:{p}:{b64_salt}:{b64_hash}"
+        hashcat_ready_string = f"SCRYPT:{self.N}:{self.r}:{self.p}:{b64_salt}:{b64_hash}"
         
         return b64_salt, hashcat_ready_string
 
-    def _hash_argon2(self, password_plaintext, **kwargs):
-        m = int(kwargs.get('m', 65536))
-        t = int(kwargs.get('t', 2))
-        p = int(kwargs.get('p', 1))
-        dklen = int(kwargs.get('dklen', 32))
-        salt_length = int(kwargs.get('salt_bytes', 16))
-        
+    def _hash_argon2(self, password_plaintext, salt_bytes=None):
         # Let argon2-cffi handle its own salt generation and MCF formatting
-        ph = Argon2PasswordHasher(
-            memory_cost=m,
-            time_cost=t,
-            parallelism=p,
-            hash_len=dklen,
-            salt_len=salt_length,
-            type=argon2.Type.ID
-        )
-        
-        hashed_string = ph.hash(password_plaintext)
+        # unless a salt was drawn up front by generate_hash_batch.
+        if salt_bytes is None:
+            hashed_string = self.argon2_hasher.hash(password_plaintext)
+        else:
+            hashed_string = self.argon2_hasher.hash(password_plaintext, salt=salt_bytes)
         
         # Extract the base64 salt directly from the generated MCF string
         parts = hashed_string.split('$')
@@ -118,6 +209,51 @@ class PasswordHasher:
         
         return extracted_salt, hashed_string
 
+    def _verify_pbkdf2(self, password_plaintext, stored_hash):
+        try:
+            hash_algo, iterations, b64_salt, b64_hash = stored_hash.split(':')
+            expected_key = base64.b64decode(b64_hash)
+            salt_bytes = base64.b64decode(b64_salt)
+        except ValueError as e:
+            raise ValueError(f"Malformed PBKDF2 hash: {stored_hash}") from e
+
+        derived_key = hashlib.pbkdf2_hmac(
+            hash_name=hash_algo,
+            password=password_plaintext.encode('utf-8'),
+            salt=salt_bytes,
+            iterations=int(iterations),
+            dklen=len(expected_key)
+        )
+        return hmac.compare_digest(derived_key, expected_key)
+
+    def _verify_bcrypt(self, password_plaintext, stored_hash):
+        return bcrypt.checkpw(password_plaintext.encode('utf-8'), stored_hash.encode('utf-8'))
+
+    def _verify_scrypt(self, password_plaintext, stored_hash):
+        try:
+            _, N, r, p, b64_salt, b64_hash = stored_hash.split(':')
+            expected_key = base64.b64decode(b64_hash)
+            salt_bytes = base64.b64decode(b64_salt)
+        except ValueError as e:
+            raise ValueError(f"Malformed scrypt hash: {stored_hash}") from e
+
+        derived_key = hashlib.scrypt(
+            password=password_plaintext.encode('utf-8'),
+            salt=salt_bytes,
+            n=int(N), r=int(r), p=int(p),
+            dklen=len(expected_key),
+            maxmem=512 * 1024 * 1024
+        )
+        return hmac.compare_digest(derived_key, expected_key)
+
+    def _verify_argon2(self, password_plaintext, stored_hash):
+        try:
+            return self.argon2_hasher.verify(stored_hash, password_plaintext)
+        except argon2.exceptions.VerifyMismatchError:
+            return False
+        except argon2.exceptions.InvalidHashError as e:
+            raise ValueError(f"Malformed argon2 hash: {stored_hash}") from e
+
 
 # Example Usage:
 if __name__ == "__main__":
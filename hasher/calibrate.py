@@ -0,0 +1,170 @@
+import logging
+import os
+import sys
+
+import dotenv
+
+from registration import register_algorithm_configuration, register_comparison_runs
+from utils import create_db_connection, get_db_password, percentile
+from zygote import HashZygote
+
+# Finds, per algorithm, the most expensive parameters that still meet a latency
+# target (and optionally a per-hash memory budget) on this host, then registers
+# them as algorithm_configurations. Run inside a hasher container, e.g.
+#   docker compose run --rm -e CALIBRATE_TARGET_MS=250 hasher_bcrypt python calibrate.py
+
+dotenv.load_dotenv(dotenv_path='./data/.env')
+
+db_user = os.getenv('DB_USER')
+db_host = os.getenv('DB_HOST')
+db_port = os.getenv('DB_PORT')
+db_name = os.getenv('DB_NAME')
+calibrate_algorithms = os.getenv('CALIBRATE_ALGORITHMS', 'pbkdf2_sha256,bcrypt,scrypt,argon2').split(',')
+target_ms = float(os.getenv('CALIBRATE_TARGET_MS', '250'))
+target_percentile = float(os.getenv('CALIBRATE_PERCENTILE', '95'))
+max_memory_mb = float(os.getenv('CALIBRATE_MAX_MEMORY_MB', '0')) or None
+samples_per_probe = int(os.getenv('CALIBRATE_SAMPLES', '10'))
+# linear domains stop bisecting once the bracket is within this fraction of the result
+tolerance = float(os.getenv('CALIBRATE_TOLERANCE', '0.05'))
+comparison_name = os.getenv('CALIBRATE_COMPARISON', '')
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    handlers=[logging.StreamHandler(sys.stdout)])
+
+
+def argon2_memory_kib():
+    # argon2 memory is set directly from the budget; t is searched for latency.
+    return int(max_memory_mb * 1024) if max_memory_mb else 65536
+
+
+# The cost parameter searched for each algorithm. 'log' domains already double
+# the cost per step (bcrypt rounds, scrypt log2 N) and are probed one step at a
+# time; 'linear' domains are probed by doubling. Where the parameters fix the
+# memory a hash allocates ('memory_mb'), that is checked against the budget:
+# the measured RSS delta also counts allocator and process overhead, so a hash
+# configured to exactly the budget would never fit it.
+SEARCH_SPACES = {
+    'pbkdf2_sha256': {'low': 1000, 'high': 10_000_000, 'scale': 'linear',
+                      'parameters': lambda x: {'iterations': x}},
+    'bcrypt': {'low': 4, 'high': 31, 'scale': 'log',
+               'parameters': lambda x: {'rounds': x}},
+    'scrypt': {'low': 10, 'high': 24, 'scale': 'log',
+               'parameters': lambda x: {'N': 2 ** x, 'r': 8, 'p': 1},
+               'memory_mb': lambda x: 128 * 2 ** x * 8 / (1024 * 1024)},
+    'argon2': {'low': 1, 'high': 64, 'scale': 'linear',
+               'parameters': lambda x: {'m': argon2_memory_kib(), 't': x, 'p': 1},
+               'memory_mb': lambda x: argon2_memory_kib() / 1024},
+}
+
+
+def measure_configuration(algorithm, parameters, samples):
+    """
+    Hashes `samples` passwords in isolated zygote children.
+
+    Returns:
+        tuple: (latency at the target percentile in ms, worst memory delta in MB)
+    """
+    with HashZygote(algorithm, parameters) as zygote:
+        results = [zygote.measure({'password_plaintext': f'calibration-{i}'}) for i in range(samples)]
+    latency_ms = percentile([r['duration_ms'] for r in results], target_percentile)
+    memory_mb = max(r['memory_peak_delta_mb'] for r in results)
+    return latency_ms, memory_mb
+
+
+def calibrate(algorithm):
+    """
+    Searches an algorithm's cost parameter for the largest value whose measured
+    latency and memory stay within the targets.
+
+    The domain is probed upwards until a probe misses the target, then the
+    boundary is bisected. Every probe is a real measurement, and no probe runs
+    more than one doubling past the target.
+
+    Returns:
+        dict: The winning parameters with their measured latency and memory,
+              or None when even the cheapest setting misses the target.
+    """
+    space = SEARCH_SPACES[algorithm]
+    probes = {}
+
+    def fits(x):
+        if x not in probes:
+            parameters = space['parameters'](x)
+            try:
+                latency_ms, memory_mb = measure_configuration(algorithm, parameters, samples_per_probe)
+            except RuntimeError as e:
+                logging.warning(f"{algorithm} {parameters} could not be measured: {e}")
+                probes[x] = (False, None, None)
+                return False
+            budgeted_mb = space['memory_mb'](x) if 'memory_mb' in space else memory_mb
+            within = latency_ms <= target_ms and (max_memory_mb is None or budgeted_mb <= max_memory_mb)
+            logging.info(f"{algorithm} {parameters}: p{target_percentile:g} {latency_ms:.2f} ms, "
+                         f"{memory_mb:.2f} MB -> {'within' if within else 'over'} target")
+            probes[x] = (within, latency_ms, memory_mb)
+        return probes[x][0]
+
+    low, high = space['low'], space['high']
+    if not fits(low):
+        logging.warning(f"{algorithm}: the cheapest setting already misses the target.")
+        return None
+
+    # Probe upwards until a setting misses the target or the domain ends.
+    while low < high:
+        candidate = low + 1 if space['scale'] == 'log' else min(low * 2, high)
+        if not fits(candidate):
+            high = candidate
+            break
+        low = candidate
+    else:
+        high = low + 1
+
+    # Bisect between the last setting within the target and the first one over it.
+    while high - low > 1 and (space['scale'] == 'log' or high - low > low * tolerance):
+        middle = (low + high) // 2
+        if fits(middle):
+            low = middle
+        else:
+            high = middle
+
+    _, latency_ms, memory_mb = probes[low]
+    return {'parameters': space['parameters'](low), 'latency_ms': latency_ms, 'memory_mb': memory_mb}
+
+
+if __name__ == "__main__":
+
+    budget = f" and <= {max_memory_mb:g} MB per hash" if max_memory_mb else ""
+    logging.info(f"Calibrating {', '.join(calibrate_algorithms)} for p{target_percentile:g} <= {target_ms:g} ms{budget}")
+
+    winners = {}
+    for algorithm in calibrate_algorithms:
+        algorithm = algorithm.strip()
+        if algorithm not in SEARCH_SPACES:
+            logging.warning(f"No calibration search space for algorithm '{algorithm}'. Skipping.")
+            continue
+        result = calibrate(algorithm)
+        if result is not None:
+            winners[algorithm] = result
+            logging.info(f"Calibrated {algorithm}: {result['parameters']} "
+                         f"({result['latency_ms']:.2f} ms, {result['memory_mb']:.2f} MB)")
+
+    if not winners:
+        logging.warning("No configuration met the target. Nothing registered.")
+        sys.exit(1)
+
+    db_password = get_db_password()
+    conn = create_db_connection(db_user, db_password, db_host, db_port, db_name)
+
+    alg_config_ids = []
+    for algorithm, result in winners.items():
+        alg_config_id = register_algorithm_configuration(conn, algorithm, result['parameters'])
+        alg_config_ids.append(alg_config_id)
+        logging.info(f"Registered {algorithm} configuration id: {alg_config_id}")
+
+    if comparison_name:
+        description = f"Calibrated for p{target_percentile:g} <= {target_ms:g} ms{budget}"
+        run_ids = register_comparison_runs(conn, comparison_name, description, alg_config_ids)
+        logging.info(f"Registered experiment runs {run_ids} for comparison '{comparison_name}'")
+
+    conn.commit()
+    conn.close()
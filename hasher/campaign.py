@@ -0,0 +1,222 @@
+import itertools
+import json
+import logging
+import os
+import signal
+import statistics
+import sys
+
+import dotenv
+from sqlalchemy import text
+
+from claims import LeaseKeeper, LeaseLostError, claim_comparison_runs, complete_leased_run, release_lease, worker_id
+from pipeline import ResultWriter
+from registration import register_algorithm_configuration, register_comparison_runs
+from sampling import ensure_sample_pool, remaining_password_query
+from schema import ensure_hasher_schema
+from host_registry import register_host
+from timing import median_confidence_interval
+from utils import create_db_engine, get_db_password
+from zygote import HashZygote
+
+# Sweeps a parameter grid of one algorithm with adaptive sample sizes. Every
+# combination of CAMPAIGN_GRID is registered as an algorithm configuration and
+# a run of the comparison CAMPAIGN_NAME, which this runner claims at once and
+# hashes itself in interleaved rounds, like the scheduler. A configuration
+# stops sampling as soon as the confidence interval of its median duration_ms
+# is narrower than CAMPAIGN_CI_RELATIVE_WIDTH of the median, so cheap, stable
+# configurations finish after a few tens of hashes and the noisy ones keep
+# going up to CAMPAIGN_MAX_SAMPLES. For example
+#   docker compose --profile campaign run --rm -e CAMPAIGN_NAME=argon2-sweep \
+#       -e CAMPAIGN_ALGORITHM=argon2 -e CAMPAIGN_GRID='{"m": [19456, 65536], "t": [1, 2, 3], "p": [1]}' hasher_campaign
+
+dotenv.load_dotenv(dotenv_path='./data/.env')
+
+db_user = os.getenv('DB_USER')
+db_host = os.getenv('DB_HOST')
+db_port = os.getenv('DB_PORT')
+db_name = os.getenv('DB_NAME')
+campaign_name = os.getenv('CAMPAIGN_NAME', '')
+campaign_algorithm = os.getenv('CAMPAIGN_ALGORITHM', '')
+# JSON object of parameter name -> list of values; scalars are fixed parameters
+campaign_grid = os.getenv('CAMPAIGN_GRID', '{}')
+min_samples = int(os.getenv('CAMPAIGN_MIN_SAMPLES', '20'))
+max_samples = int(os.getenv('CAMPAIGN_MAX_SAMPLES', '1000'))
+ci_confidence = float(os.getenv('CAMPAIGN_CI_CONFIDENCE', '0.95'))
+ci_relative_width = float(os.getenv('CAMPAIGN_CI_RELATIVE_WIDTH', '0.05'))
+password_score_threshold = int(os.getenv('PASSWORD_SCORE_THRESHOLD', '0'))
+sample_pool_scan_rows = int(os.getenv('SAMPLE_POOL_SCAN_ROWS', '2000000'))
+# passwords each configuration hashes per turn of a round
+batch_size = int(os.getenv('CAMPAIGN_BATCH_SIZE', '10'))
+lease_seconds = int(os.getenv('LEASE_SECONDS', '300'))
+sink_batch_size = int(os.getenv('SINK_BATCH_SIZE', '1000'))
+sink_method = os.getenv('SINK_METHOD', 'copy')
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    handlers=[logging.StreamHandler(sys.stdout)])
+
+
+def expand_grid(grid):
+    """
+    Expands {"m": [19456, 65536], "t": [1, 2], "p": 1} into one parameters
+    dict per combination, in a stable order.
+    """
+    names = sorted(grid)
+    values = [grid[name] if isinstance(grid[name], list) else [grid[name]] for name in names]
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def stopping_decision(durations_ms, positions_done):
+    """
+    Applies the sequential stopping rule to one configuration.
+
+    Returns:
+        str: A remark describing why sampling stopped, or None to keep sampling.
+    """
+    n = len(durations_ms)
+    interval = median_confidence_interval(durations_ms, ci_confidence) if n >= min_samples else None
+    if interval is not None:
+        median = statistics.median(durations_ms)
+        relative_width = (interval[1] - interval[0]) / median if median > 0 else float('inf')
+        summary = (f"median {median:.3f} ms, {ci_confidence:.0%} CI [{interval[0]:.3f}, {interval[1]:.3f}] "
+                   f"({relative_width:.1%} of the median)")
+        if relative_width <= ci_relative_width:
+            return f"Campaign stopped after {n} hashes: {summary}"
+    else:
+        summary = "median confidence interval not yet defined"
+
+    if positions_done >= max_samples:
+        return f"Campaign reached CAMPAIGN_MAX_SAMPLES after {n} hashes: {summary}"
+    return None
+
+
+def register_campaign(conn, owner):
+    """
+    Registers the grid's configurations and runs and leases the runs in the
+    same transaction, so no chunk-claiming hasher can pick them up first.
+    Restarting a campaign registers runs only for configurations it does not
+    have yet, and resumes the unfinished ones.
+
+    Returns:
+        tuple: (comparison id, list of claimed runs)
+    """
+    grid = json.loads(campaign_grid)
+    alg_config_ids = [register_algorithm_configuration(conn, campaign_algorithm, parameters)
+                      for parameters in expand_grid(grid)]
+    registered = {row.alg_config_id for row in conn.execute(text("""
+        SELECT er.alg_config_id
+        FROM experiment_runs er
+        INNER JOIN comparisons c ON c.id = er.sample_seed
+        WHERE c.name = :name AND er.experiment_type = 'hash'
+        """), {"name": campaign_name})}
+    alg_config_ids = [i for i in alg_config_ids if i not in registered]
+    description = (f"{campaign_algorithm} grid {json.dumps(grid, sort_keys=True)}, median {ci_confidence:.0%} CI "
+                   f"within {ci_relative_width:.0%}, {min_samples}-{max_samples} hashes")
+    register_comparison_runs(conn, campaign_name, description, alg_config_ids)
+    comp_id = conn.execute(text("SELECT id FROM comparisons WHERE name = :name"), {"name": campaign_name}).scalar()
+    return comp_id, claim_comparison_runs(conn, owner, lease_seconds, comp_id)
+
+
+def committed_durations(conn, run_ids):
+    """Returns duration_ms of the hashes earlier attempts of the runs already committed."""
+    durations = {run_id: [] for run_id in run_ids}
+    for experiment_run_id, duration_ms in conn.execute(text("""
+            SELECT experiment_run_id, duration_ms FROM hash_generations
+            WHERE experiment_run_id = ANY(:ids)
+            """), {"ids": run_ids}):
+        durations[experiment_run_id].append(duration_ms)
+    conn.commit()
+    return durations
+
+
+if __name__ == "__main__":
+
+    # Turn SIGTERM into SystemExit so the buffered results are flushed and the leases released.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+    if not campaign_name or not campaign_algorithm:
+        logging.error("Set CAMPAIGN_NAME, CAMPAIGN_ALGORITHM and CAMPAIGN_GRID to describe the campaign.")
+        sys.exit(1)
+
+    db_password = get_db_password()
+    engine = create_db_engine(db_user, db_password, db_host, db_port, db_name)
+    connection_factory = engine.connect
+    conn = connection_factory()
+    ensure_hasher_schema(conn)
+
+    owner = worker_id()
+    comp_id, runs = register_campaign(conn, owner)
+    if not runs:
+        logging.warning(f"Campaign '{campaign_name}' has no registered hash runs left to claim.")
+        sys.exit(0)
+
+    host_id, hardware_info = register_host(conn)
+    hardware_info = json.dumps(hardware_info)
+
+    sample_seed = comp_id
+    ensure_sample_pool(conn, sample_seed, max_samples, sample_pool_scan_rows)
+    durations = committed_durations(conn, [run['exp_id'] for run in runs])
+    positions = {run['exp_id']: 0 for run in runs}
+    remarks = {}
+    logging.info(f"Campaign '{campaign_name}': sampling {len(runs)} {campaign_algorithm} configurations "
+                 f"until the median is known to within {ci_relative_width:.0%}")
+
+    zygotes = {run['exp_id']: HashZygote(run['algorithm'], run['parameters_json']).start() for run in runs}
+    leases = {run['exp_id']: LeaseKeeper(connection_factory, 'experiment_runs', run['exp_id'], owner, lease_seconds)
+              for run in runs}
+    for lease in leases.values():
+        lease.start()
+    writer = ResultWriter(connection_factory, batch_size=sink_batch_size, method=sink_method)
+    writer.start()
+
+    def close_run(run):
+        zygotes[run['exp_id']].close()
+        leases[run['exp_id']].stop()
+
+    try:
+        active = list(runs)
+        round_index = 0
+        while active:
+            ordered_runs = active if round_index % 2 == 0 else list(reversed(active))
+            for run in ordered_runs:
+                exp_id = run['exp_id']
+                leases[exp_id].check()
+                # Passwords a previous attempt already committed are skipped.
+                jobs = [{"experiment_run_id": exp_id, **row._asdict()}
+                        for row in conn.execute(remaining_password_query(sample_seed, password_score_threshold,
+                                                                         min(batch_size, max_samples - positions[exp_id]),
+                                                                         positions[exp_id], exp_id))]
+                conn.commit()
+                positions[exp_id] += batch_size
+                for results_json in zygotes[exp_id].imap_unordered(jobs):
+                    durations[exp_id].append(results_json['duration_ms'])
+                    results_json['host_id'] = host_id
+                    writer.put(results_json)
+
+                remark = stopping_decision(durations[exp_id], positions[exp_id])
+                if remark is not None:
+                    remarks[exp_id] = remark
+                    logging.info(f"Run {exp_id} {run['parameters_json']}: {remark}")
+                    zygotes[exp_id].close()
+                    active.remove(run)
+            round_index += 1
+    except BaseException:
+        writer.close()
+        for run in runs:
+            close_run(run)
+            release_lease(conn, 'experiment_runs', run['exp_id'], owner)
+        raise
+
+    writer.close()
+    for run in runs:
+        close_run(run)
+        try:
+            complete_leased_run(conn, run['exp_id'], owner, host_id, hardware_info, 'hash_generations',
+                                remark=remarks[run['exp_id']])
+            logging.info(f"Experiment run status updated to 'completed' for id: {run['exp_id']}")
+        except LeaseLostError as e:
+            logging.warning(f"{e}. Another worker has taken over the run.")
+
+    conn.close()
+    engine.dispose()
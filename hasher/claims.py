@@ -0,0 +1,345 @@
+import logging
+import os
+import socket
+import textwrap
+import threading
+
+from sqlalchemy import text
+
+
+# Work is handed out under leases. A registered 'hash' run is claimed once and
+# split into chunks, i.e. position ranges over its deterministic password
+# sample; any hasher on any node then claims chunks one at a time. 'verify'
+# runs are claimed whole. Claims use FOR UPDATE SKIP LOCKED, so concurrent
+# hashers never wait on or double-claim the same row, and a worker that dies
+# stops renewing its lease, which makes its work claimable again once the
+# lease expires. A restarted container keeps its hostname and usually its pid,
+# so it resumes the leases it held before without waiting for them to expire.
+
+class LeaseLostError(RuntimeError):
+    """Raised when another worker has taken over a lease this worker held."""
+
+
+def worker_id():
+    """Identifies this process as a lease owner, e.g. 'a1b2c3d4e5f6:42'."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# NULL :algorithms matches runs of every algorithm.
+ALGORITHM_FILTER = "(CAST(:algorithms AS TEXT[]) IS NULL OR a.name = ANY(CAST(:algorithms AS TEXT[])))"
+
+CLAIM_RUN_QUERY = text(textwrap.dedent(f"""
+    WITH claimed AS (
+        UPDATE experiment_runs er
+        SET status = 'running',
+            lease_owner = :owner,
+            lease_expires_at = now() + make_interval(secs => :lease_seconds)
+        WHERE er.id = (
+            SELECT er2.id
+            FROM experiment_runs er2
+            INNER JOIN algorithm_configurations ac ON ac.id = er2.alg_config_id
+            INNER JOIN algorithms a ON a.id = ac.algorithm_id
+            WHERE {ALGORITHM_FILTER}
+              AND (er2.status = 'registered'
+                   OR (er2.status = 'running' AND er2.experiment_type = 'verify'
+                       AND (er2.lease_expires_at < now() OR er2.lease_owner = :owner)))
+            ORDER BY er2.id
+            LIMIT 1
+            FOR UPDATE OF er2 SKIP LOCKED
+        )
+        RETURNING er.id, er.alg_config_id, er.experiment_type, er.source_run_id, er.sample_seed
+    )
+    SELECT claimed.id AS exp_id, claimed.experiment_type, claimed.source_run_id, claimed.sample_seed,
+           ac.parameters_json, a.name AS algorithm
+    FROM claimed
+    INNER JOIN algorithm_configurations ac ON ac.id = claimed.alg_config_id
+    INNER JOIN algorithms a ON a.id = ac.algorithm_id
+    """))
+
+CLAIM_CHUNK_QUERY = text(textwrap.dedent(f"""
+    WITH claimed AS (
+        UPDATE experiment_run_chunks c
+        SET status = 'running',
+            lease_owner = :owner,
+            lease_expires_at = now() + make_interval(secs => :lease_seconds),
+            attempts = c.attempts + 1
+        WHERE c.id = (
+            SELECT c2.id
+            FROM experiment_run_chunks c2
+            INNER JOIN experiment_runs er ON er.id = c2.experiment_run_id
+            INNER JOIN algorithm_configurations ac ON ac.id = er.alg_config_id
+            INNER JOIN algorithms a ON a.id = ac.algorithm_id
+            WHERE {ALGORITHM_FILTER}
+              AND er.status = 'running'
+              AND (c2.status = 'pending'
+                   OR (c2.status = 'running'
+                       AND (c2.lease_expires_at < now() OR c2.lease_owner = :owner)))
+            ORDER BY c2.experiment_run_id, c2.chunk_index
+            LIMIT 1
+            FOR UPDATE OF c2 SKIP LOCKED
+        )
+        RETURNING c.id, c.experiment_run_id, c.chunk_index, c.start_position, c.end_position,
+                  c.score_threshold, c.attempts, c.checkpoint_position
+    )
+    SELECT claimed.id AS chunk_id, claimed.experiment_run_id AS exp_id, claimed.chunk_index,
+           claimed.start_position, claimed.end_position, claimed.score_threshold, claimed.attempts,
+           claimed.checkpoint_position,
+           er.sample_seed, ac.parameters_json, a.name AS algorithm
+    FROM claimed
+    INNER JOIN experiment_runs er ON er.id = claimed.experiment_run_id
+    INNER JOIN algorithm_configurations ac ON ac.id = er.alg_config_id
+    INNER JOIN algorithms a ON a.id = ac.algorithm_id
+    """))
+
+
+def claim_experiment_run(conn, owner, lease_seconds, algorithms=None):
+    """
+    Leases the oldest registered run, or a 'verify' run whose lease expired
+    or that `owner` held before a restart.
+
+    The claim is left uncommitted so a 'hash' run can be split in the same
+    transaction; split_into_chunks commits it, other callers must commit.
+
+    Returns:
+        dict: The run (exp_id, experiment_type, source_run_id, sample_seed,
+              parameters_json, algorithm), or None if there is nothing to claim.
+    """
+    row = conn.execute(CLAIM_RUN_QUERY, {"owner": owner, "lease_seconds": lease_seconds,
+                                         "algorithms": algorithms}).fetchone()
+    return row._asdict() if row is not None else None
+
+
+def claim_chunk(conn, owner, lease_seconds, algorithms=None):
+    """
+    Leases the next pending chunk of a running 'hash' run, or one whose lease
+    expired or that `owner` held before a restart.
+
+    The claim is committed before returning. attempts > 1 means the chunk is
+    being resumed; checkpoint_position tells how far it got.
+
+    Returns:
+        dict: The chunk with its run's sample_seed, parameters_json and
+              algorithm, or None if there is nothing to claim.
+    """
+    row = conn.execute(CLAIM_CHUNK_QUERY, {"owner": owner, "lease_seconds": lease_seconds,
+                                           "algorithms": algorithms}).fetchone()
+    conn.commit()
+    return row._asdict() if row is not None else None
+
+
+def claim_comparison_runs(conn, owner, lease_seconds, comp_id):
+    """
+    Leases every 'hash' run of a comparison that is registered, or that is
+    running unchunked under an expired lease or one `owner` held before.
+
+    The interleaved scheduler hashes these runs itself, so they are never
+    split into chunks and chunk-claiming hashers leave them alone. The claim
+    is committed before returning.
+
+    Returns:
+        list: The runs, as dicts with exp_id, sample_seed, parameters_json and algorithm.
+    """
+    rows = conn.execute(text("""
+        WITH claimed AS (
+            UPDATE experiment_runs er
+            SET status = 'running',
+                lease_owner = :owner,
+                lease_expires_at = now() + make_interval(secs => :lease_seconds)
+            WHERE er.id IN (
+                SELECT er2.id
+                FROM experiment_runs er2
+                INNER JOIN comparison_algo_configs cac
+                    ON cac.algo_config_id = er2.alg_config_id AND cac.comp_id = :comp_id
+                WHERE er2.experiment_type = 'hash'
+                  AND er2.sample_seed = :comp_id
+                  AND (er2.status = 'registered'
+                       OR (er2.status = 'running'
+                           AND (er2.lease_expires_at < now() OR er2.lease_owner = :owner)
+                           AND NOT EXISTS (SELECT 1 FROM experiment_run_chunks c
+                                           WHERE c.experiment_run_id = er2.id)))
+                FOR UPDATE OF er2 SKIP LOCKED
+            )
+            RETURNING er.id, er.alg_config_id, er.sample_seed
+        )
+        SELECT claimed.id AS exp_id, claimed.sample_seed, ac.parameters_json, a.name AS algorithm
+        FROM claimed
+        INNER JOIN algorithm_configurations ac ON ac.id = claimed.alg_config_id
+        INNER JOIN algorithms a ON a.id = ac.algorithm_id
+        ORDER BY claimed.id
+        """), {"owner": owner, "lease_seconds": lease_seconds, "comp_id": comp_id}).fetchall()
+    conn.commit()
+    return [row._asdict() for row in rows]
+
+
+def split_into_chunks(conn, experiment_run_id, sample_size, chunk_size, score_threshold):
+    """
+    Splits positions [0, sample_size) of a run's password sample into chunks.
+
+    Call it in the transaction of the run's claim: a crash before the commit
+    leaves the run registered rather than running without chunks.
+    """
+    chunks = [{"experiment_run_id": experiment_run_id, "chunk_index": index, "start_position": start,
+               "end_position": min(start + chunk_size, sample_size), "score_threshold": score_threshold}
+              for index, start in enumerate(range(0, sample_size, chunk_size))]
+    conn.execute(text("""
+        INSERT INTO experiment_run_chunks(experiment_run_id, chunk_index, start_position, end_position,
+                                          score_threshold, checkpoint_position)
+        VALUES (:experiment_run_id, :chunk_index, :start_position, :end_position,
+                :score_threshold, :start_position)
+        """), chunks)
+    conn.commit()
+    return len(chunks)
+
+
+def advance_checkpoint(conn, chunk, owner, inserted):
+    """
+    Moves a chunk's checkpoint past `inserted` newly committed passwords.
+
+    Called from the result sink inside the flush transaction, so the
+    checkpoint and the rows it counts commit together. It doubles as a fence:
+    a worker that lost its lease cannot commit rows for the chunk.
+
+    Raises:
+        LeaseLostError: If the chunk's lease is no longer held by `owner`.
+    """
+    updated = conn.execute(text("""
+        UPDATE experiment_run_chunks
+        SET checkpoint_position = checkpoint_position + :inserted, checkpoint_at = now()
+        WHERE id = :id AND lease_owner = :owner AND status = 'running'
+        """), {"id": chunk['chunk_id'], "owner": owner, "inserted": inserted}).rowcount
+    if not updated:
+        raise LeaseLostError(f"Lease on chunk {chunk['chunk_index']} of experiment run id: {chunk['exp_id']} was lost")
+
+
+def complete_chunk(conn, chunk, owner, host_id, hardware_info):
+    """
+    Marks a chunk completed and, if it was the run's last, completes the run.
+
+    The run row is locked first, so when the last two chunks finish at the
+    same time the second finisher sees the first one's commit and exactly one
+    of them completes the run. Run start and end times are the earliest and
+    latest hash of any chunk; the run is attributed to the finishing host.
+
+    Returns:
+        bool: True if this call completed the run.
+
+    Raises:
+        LeaseLostError: If the chunk's lease is no longer held by `owner`.
+    """
+    conn.execute(text("SELECT id FROM experiment_runs WHERE id = :id FOR UPDATE"), {"id": chunk['exp_id']})
+    updated = conn.execute(text("""
+        UPDATE experiment_run_chunks
+        SET status = 'completed', lease_expires_at = NULL, completed_at = now()
+        WHERE id = :id AND lease_owner = :owner AND status = 'running'
+        """), {"id": chunk['chunk_id'], "owner": owner}).rowcount
+    if not updated:
+        conn.rollback()
+        raise LeaseLostError(f"Lease on chunk {chunk['chunk_index']} of experiment run id: {chunk['exp_id']} was lost")
+
+    completed = conn.execute(text("""
+        UPDATE experiment_runs er
+        SET status = 'completed',
+            lease_owner = NULL,
+            lease_expires_at = NULL,
+            start_time = (SELECT min(start_time_utc) FROM hash_generations WHERE experiment_run_id = er.id),
+            end_time = (SELECT max(end_time_utc) FROM hash_generations WHERE experiment_run_id = er.id),
+            host_id = :host_id,
+            hardware_info = CAST(:hardware_info AS JSONB)
+        WHERE er.id = :id
+          AND NOT EXISTS (SELECT 1 FROM experiment_run_chunks
+                          WHERE experiment_run_id = er.id AND status <> 'completed')
+        RETURNING er.id
+        """), {"id": chunk['exp_id'], "host_id": host_id, "hardware_info": hardware_info}).scalar()
+    conn.commit()
+    return completed is not None
+
+
+def complete_leased_run(conn, experiment_run_id, owner, host_id, hardware_info, results_table, remark=None):
+    """
+    Marks a run leased whole ('verify' runs, or 'hash' runs of the interleaved
+    scheduler and campaigns) completed with the span of its rows in
+    `results_table`. A `remark`, when given, replaces the run's remark.
+
+    Raises:
+        LeaseLostError: If the run's lease is no longer held by `owner`.
+    """
+    if results_table not in ('hash_generations', 'hash_verifications'):
+        raise ValueError(f"Unsupported results table: {results_table}")
+
+    updated = conn.execute(text(f"""
+        UPDATE experiment_runs er
+        SET status = 'completed',
+            lease_owner = NULL,
+            lease_expires_at = NULL,
+            start_time = (SELECT min(start_time_utc) FROM {results_table} WHERE experiment_run_id = er.id),
+            end_time = (SELECT max(end_time_utc) FROM {results_table} WHERE experiment_run_id = er.id),
+            host_id = :host_id,
+            hardware_info = CAST(:hardware_info AS JSONB),
+            remark = COALESCE(:remark, er.remark)
+        WHERE er.id = :id AND er.lease_owner = :owner AND er.status = 'running'
+        """), {"id": experiment_run_id, "owner": owner, "host_id": host_id,
+               "hardware_info": hardware_info, "remark": remark}).rowcount
+    conn.commit()
+    if not updated:
+        raise LeaseLostError(f"Lease on experiment run id: {experiment_run_id} was lost")
+
+
+def release_lease(conn, table, row_id, owner):
+    """Expires a lease this worker still holds so others can claim the work at once."""
+    conn.execute(text(f"""
+        UPDATE {table} SET lease_expires_at = now()
+        WHERE id = :id AND lease_owner = :owner AND status = 'running'
+        """), {"id": row_id, "owner": owner})
+    conn.commit()
+
+
+class LeaseKeeper(threading.Thread):
+    """
+    Renews a lease on its own connection every third of the lease period.
+
+    The hashing loop calls check() between passwords; once a renewal finds
+    the lease taken over, check() raises LeaseLostError so the worker stops
+    instead of duplicating another worker's output.
+    """
+
+    def __init__(self, connection_factory, table, row_id, owner, lease_seconds):
+        if table not in ('experiment_runs', 'experiment_run_chunks'):
+            raise ValueError(f"Unsupported lease table: {table}")
+
+        super().__init__(name='lease-keeper', daemon=True)
+        self.connection_factory = connection_factory
+        self.table = table
+        self.row_id = row_id
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stop_event = threading.Event()
+
+    def run(self):
+        conn = self.connection_factory()
+        try:
+            while not self._stop_event.wait(self.lease_seconds / 3):
+                renewed = conn.execute(text(f"""
+                    UPDATE {self.table}
+                    SET lease_expires_at = now() + make_interval(secs => :lease_seconds)
+                    WHERE id = :id AND lease_owner = :owner AND status = 'running'
+                    """), {"id": self.row_id, "owner": self.owner, "lease_seconds": self.lease_seconds}).rowcount
+                conn.commit()
+                if not renewed:
+                    logging.error(f"Lease on {self.table} id {self.row_id} was taken over")
+                    self.lost = True
+                    break
+        except Exception as e:
+            # A renewal that cannot reach the database may already have expired.
+            logging.error(f"Lease renewal failed for {self.table} id {self.row_id}: {e}")
+            self.lost = True
+        finally:
+            conn.close()
+
+    def check(self):
+        if self.lost:
+            raise LeaseLostError(f"Lease on {self.table} id {self.row_id} was lost")
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
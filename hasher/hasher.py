@@ -1,8 +1,10 @@
 import json
+import statistics
+import sys
 from datetime import datetime, timezone
 import resource
 from PasswordHasher import PasswordHasher
-from utils import pickle_object
+from timing import summarize_durations, timed_repetitions
 import dotenv
 import os
 
@@ -13,22 +15,41 @@ import os
 
 dotenv.load_dotenv(dotenv_path='./data/.env')
 algorithm = os.getenv('ALGORITHM')
+# untimed warmup hashes and timed repetitions per password
+timing_warmup = int(os.getenv('TIMING_WARMUP', '0'))
+timing_repetitions = int(os.getenv('TIMING_REPETITIONS', '1'))
 
 
+def measure_operation(operation, rusage_who=resource.RUSAGE_SELF, warmup=None, repetitions=None):
+    """
+    Runs an operation under the timing engine and records resource usage around it.
 
+    After `warmup` untimed calls the operation runs `repetitions` times.
+    duration_ms is the median repetition and the distribution is reported
+    alongside it; CPU times are per-call averages over the repetitions.
 
-if __name__ == "__main__":
-    
-    json_file = json.load(open(f"{algorithm}_parameters.json", "r"))
+    Args:
+        operation (callable): A zero-argument callable to measure.
+        rusage_who (int): The resource.getrusage target. RUSAGE_SELF for a
+            dedicated process, RUSAGE_THREAD when running on a worker thread.
+        warmup (int): Untimed calls first; defaults to TIMING_WARMUP.
+        repetitions (int): Timed calls; defaults to TIMING_REPETITIONS.
+
+    Returns:
+        tuple: (result of the first timed call, dict of measurement fields)
+    """
+    warmup = timing_warmup if warmup is None else warmup
+    repetitions = max(timing_repetitions if repetitions is None else repetitions, 1)
+
+    for _ in range(warmup):
+        operation()
 
-    # json_file = pickle_object('-', algorithm + '_parameters.pkl', mode='load')
     start_time_utc = datetime.now(timezone.utc)
-    resource_usage_start = resource.getrusage(resource.RUSAGE_SELF)
-    
-    hasher = PasswordHasher(algorithm=json_file['algorithm'], **json_file['parameters'])
-    salt, generated_hash = hasher.generate_hash(json_file['password_plaintext'])
+    resource_usage_start = resource.getrusage(rusage_who)
+
+    result, durations_ms, thread_cpu_ms = timed_repetitions(operation, repetitions=repetitions)
     end_time_utc = datetime.now(timezone.utc)
-    resource_usage_end = resource.getrusage(resource.RUSAGE_SELF)
+    resource_usage_end = resource.getrusage(rusage_who)
 
     memory_rss_mb_start = resource_usage_start.ru_maxrss / 1024
     cpu_user_time_ms_start = resource_usage_start.ru_utime * 1000
@@ -38,22 +59,72 @@ if __name__ == "__main__":
     cpu_system_time_ms_end = resource_usage_end.ru_stime * 1000
     memory_peak_mb_during_hash = resource_usage_end.ru_maxrss / 1024
 
-    cpu_system_time_ms = cpu_system_time_ms_end - cpu_system_time_ms_start
-    cpu_user_time_ms = cpu_user_time_ms_end - cpu_user_time_ms_start
-    duration_ms = (end_time_utc - start_time_utc).total_seconds() * 1000
+    cpu_system_time_ms = (cpu_system_time_ms_end - cpu_system_time_ms_start) / repetitions
+    cpu_user_time_ms = (cpu_user_time_ms_end - cpu_user_time_ms_start) / repetitions
+    duration_summary = summarize_durations(durations_ms)
 
-    results = json.load(open(f"{algorithm}_results.json", "r"))
-    # results = pickle_object('-', algorithm + '_results.pkl', mode='load')
-    results.update({
+    measurement = {
         "start_time_utc": start_time_utc.isoformat(),
         "end_time_utc": end_time_utc.isoformat(),
-        "duration_ms": duration_ms,
+        "duration_ms": duration_summary['duration_ms_median'],
         "cpu_user_time_ms": cpu_user_time_ms,
         "cpu_system_time_ms": cpu_system_time_ms,
         "memory_rss_mb_start": memory_rss_mb_start,
         "memory_peak_mb_during_hash": memory_peak_mb_during_hash,
-        "generated_hash": generated_hash,
-        "salt": salt
-    })
-    json.dump(results, open(f"{algorithm}_results.json", "w"))
-    # pickle_object(results, algorithm + '_results.pkl', mode='save')
\ No newline at end of file
+        "thread_cpu_time_ms": statistics.median(thread_cpu_ms),
+        "timing_warmup": warmup,
+        "timing_repetitions": repetitions,
+    }
+    measurement.update(duration_summary)
+    return result, measurement
+
+
+def measure_hash(hasher, password_plaintext, rusage_who=resource.RUSAGE_SELF,
+                 warmup=None, repetitions=None):
+    """
+    Hashes a single password and records timing and resource usage around it.
+
+    Args:
+        hasher (PasswordHasher): A configured PasswordHasher instance.
+        password_plaintext (str): The password to hash.
+
+    Returns:
+        dict: The measurement fields stored in the hash_generations table.
+    """
+    (salt, generated_hash), measurement = measure_operation(
+        lambda: hasher.generate_hash(password_plaintext),
+        rusage_who=rusage_who, warmup=warmup, repetitions=repetitions)
+    measurement.update({"generated_hash": generated_hash, "salt": salt})
+    return measurement
+
+
+def measure_verify(hasher, password_plaintext, stored_hash, rusage_who=resource.RUSAGE_SELF,
+                   warmup=None, repetitions=None):
+    """
+    Verifies a password against a stored hash and records timing and resource usage.
+
+    Args:
+        hasher (PasswordHasher): A PasswordHasher for the hash's algorithm.
+        password_plaintext (str): The candidate password.
+        stored_hash (str): The hash produced by generate_hash.
+
+    Returns:
+        dict: The measurement fields stored in the hash_verifications table.
+    """
+    verified, measurement = measure_operation(
+        lambda: hasher.verify(password_plaintext, stored_hash),
+        rusage_who=rusage_who, warmup=warmup, repetitions=repetitions)
+    measurement["verified"] = verified
+    return measurement
+
+
+if __name__ == "__main__":
+
+    # Parameters arrive on stdin and results leave on stdout so nothing on the
+    # timed path touches the shared /app directory.
+    json_file = json.load(sys.stdin)
+
+    hasher = PasswordHasher(algorithm=json_file['algorithm'], **json_file['parameters'])
+    measurement = measure_hash(hasher, json_file['password_plaintext'])
+
+    json.dump(measurement, sys.stdout)
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import os
+import platform
+import time
+
+import psutil
+from sqlalchemy import text
+
+from utils import collect_hardware_info
+
+# Each machine registers once in the hosts table with its hardware description
+# and two reference scores, so runs can point at a host id instead of carrying
+# their own copy of the hardware JSON, and the analyzer can rescale timings
+# measured on different machines. The slow parts (py-cpuinfo and the
+# micro-benchmarks) are cached in a file keyed by the host fingerprint, so
+# containers restarted on the same machine register in milliseconds.
+
+HOST_REGISTRY_CACHE = os.getenv('HOST_REGISTRY_CACHE', './data/host_fingerprint.json')
+
+
+def _cpu_model_name():
+    try:
+        with open('/proc/cpuinfo', 'r') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def _machine_id():
+    for path in ('/etc/machine-id', '/var/lib/dbus/machine-id'):
+        try:
+            with open(path, 'r') as f:
+                return f.read().strip()
+        except OSError:
+            continue
+    return ''
+
+
+def host_fingerprint():
+    """
+    Returns a SHA-256 over cheap, stable host properties: CPU model and count,
+    total memory, architecture and the machine id when the container can see one.
+    """
+    identity = {
+        "cpu_model": _cpu_model_name(),
+        "cpu_count": os.cpu_count(),
+        "total_ram_bytes": psutil.virtual_memory().total,
+        "machine": platform.machine(),
+        "machine_id": _machine_id(),
+    }
+    return hashlib.sha256(json.dumps(identity, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def sha256_mb_per_s(total_mb=64, block_kb=64, trials=3):
+    """Single-thread SHA-256 throughput in MB/s, best of `trials`."""
+    block = os.urandom(block_kb * 1024)
+    blocks = total_mb * 1024 // block_kb
+    best = float('inf')
+    for _ in range(trials):
+        digest = hashlib.sha256()
+        start = time.perf_counter()
+        for _ in range(blocks):
+            digest.update(block)
+        best = min(best, time.perf_counter() - start)
+    return total_mb / best
+
+
+def memory_bandwidth_gb_per_s(size_mb=128, trials=3):
+    """Single-thread memcpy bandwidth in GB/s over buffers far larger than cache, best of `trials`."""
+    source = bytearray(os.urandom(1024)) * (size_mb * 1024)
+    destination = bytearray(len(source))
+    best = float('inf')
+    for _ in range(trials):
+        start = time.perf_counter()
+        destination[:] = source
+        best = min(best, time.perf_counter() - start)
+    return size_mb / 1024 / best
+
+
+def _load_cache(fingerprint):
+    try:
+        with open(HOST_REGISTRY_CACHE, 'r') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return cached if cached.get('fingerprint') == fingerprint else None
+
+
+def _write_cache(entry):
+    directory = os.path.dirname(HOST_REGISTRY_CACHE) or '.'
+    os.makedirs(directory, exist_ok=True)
+    temporary_path = f"{HOST_REGISTRY_CACHE}.{os.getpid()}.tmp"
+    with open(temporary_path, 'w') as f:
+        json.dump(entry, f)
+    os.replace(temporary_path, HOST_REGISTRY_CACHE)
+
+
+def profile_host(fingerprint):
+    """Collects the hardware description and runs the reference benchmarks (a few seconds)."""
+    logging.info("Profiling this host: collecting CPU details and running reference benchmarks")
+    return {
+        "fingerprint": fingerprint,
+        "hardware_info": collect_hardware_info(),
+        "sha256_mb_per_s": sha256_mb_per_s(),
+        "memory_bandwidth_gb_per_s": memory_bandwidth_gb_per_s(),
+    }
+
+
+def register_host(conn):
+    """
+    Returns this machine's hosts row, registering it on first sight.
+
+    The cache file is consulted first, then the hosts table; the host is only
+    profiled when neither knows its fingerprint. Known hosts just get their
+    last_seen_at refreshed.
+
+    Returns:
+        tuple: (host_id, hardware_info dict)
+    """
+    fingerprint = host_fingerprint()
+    entry = _load_cache(fingerprint)
+
+    if entry is None:
+        row = conn.execute(text("""
+            SELECT hardware_info, sha256_mb_per_s, memory_bandwidth_gb_per_s
+            FROM hosts WHERE fingerprint = :fingerprint
+            """), {"fingerprint": fingerprint}).fetchone()
+        if row is not None:
+            entry = {"fingerprint": fingerprint, **row._asdict()}
+        else:
+            entry = profile_host(fingerprint)
+        _write_cache(entry)
+
+    host_id = conn.execute(text("""
+        INSERT INTO hosts(fingerprint, hostname, hardware_info, sha256_mb_per_s, memory_bandwidth_gb_per_s,
+                          registered_at, last_seen_at)
+        VALUES (:fingerprint, :hostname, CAST(:hardware_info AS JSONB), :sha256_mb_per_s,
+                :memory_bandwidth_gb_per_s, now(), now())
+        ON CONFLICT (fingerprint) DO UPDATE SET last_seen_at = now(), hostname = EXCLUDED.hostname
+        RETURNING id
+        """), {"fingerprint": fingerprint, "hostname": platform.node(),
+               "hardware_info": json.dumps(entry['hardware_info']),
+               "sha256_mb_per_s": entry['sha256_mb_per_s'],
+               "memory_bandwidth_gb_per_s": entry['memory_bandwidth_gb_per_s']}).scalar()
+    conn.commit()
+
+    logging.info(f"Registered as host id {host_id}: SHA-256 {entry['sha256_mb_per_s']:.0f} MB/s, "
+                 f"memory {entry['memory_bandwidth_gb_per_s']:.1f} GB/s")
+    return host_id, entry['hardware_info']
@@ -0,0 +1,240 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+import dotenv
+from sqlalchemy import text
+
+from PasswordHasher import PasswordHasher
+from sampling import ensure_sample_pool, sample_password_query
+from schema import ensure_hasher_schema
+from utils import create_db_connection, get_db_password, percentile
+
+# Drives the verify service (verify_service.py) open-loop: requests are sent at
+# their scheduled arrival times whether or not earlier ones have been answered,
+# so queueing shows up in the latencies instead of silently slowing the client.
+# Each algorithm configuration is swept over the offered rates and one row per
+# rate is written to verify_load_runs. Run inside a hasher container, e.g.
+#   docker compose --profile loadtest run --rm loadgen
+
+dotenv.load_dotenv(dotenv_path='./data/.env')
+
+db_user = os.getenv('DB_USER')
+db_host = os.getenv('DB_HOST')
+db_port = os.getenv('DB_PORT')
+db_name = os.getenv('DB_NAME')
+verify_host = os.getenv('VERIFY_HOST', 'localhost')
+verify_port = int(os.getenv('VERIFY_PORT', '7000'))
+loadgen_config_ids = [int(i) for i in os.getenv('LOADGEN_ALG_CONFIG_IDS', '').split(',') if i.strip()]
+# offered loads in requests per second
+loadgen_rates = [float(r) for r in os.getenv('LOADGEN_RATES', '5,10,20,40,80').split(',') if r.strip()]
+loadgen_duration_s = float(os.getenv('LOADGEN_DURATION_S', '20'))
+# 'poisson' spaces arrivals exponentially; 'bursty' sends LOADGEN_BURST_SIZE
+# arrivals at once with bursts spaced exponentially at the same mean rate
+arrival_process = os.getenv('LOADGEN_ARRIVALS', 'poisson')
+burst_size = int(os.getenv('LOADGEN_BURST_SIZE', '10'))
+loadgen_passwords = int(os.getenv('LOADGEN_PASSWORDS', '200'))
+loadgen_seed = int(os.getenv('LOADGEN_SEED', '0'))
+# requests unanswered this long after their arrival time count as errors
+request_timeout_s = float(os.getenv('LOADGEN_REQUEST_TIMEOUT_S', '30'))
+password_score_threshold = int(os.getenv('PASSWORD_SCORE_THRESHOLD', '0'))
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    handlers=[logging.StreamHandler(sys.stdout)])
+
+
+def arrival_offsets(rate, duration_s, rng):
+    """Returns the send times, in seconds from the start, of one load level."""
+    offsets = []
+    t = 0.0
+    if arrival_process == 'bursty':
+        while True:
+            t += rng.expovariate(rate / burst_size)
+            if t >= duration_s:
+                return offsets
+            offsets.extend([t] * burst_size)
+    elif arrival_process == 'poisson':
+        while True:
+            t += rng.expovariate(rate)
+            if t >= duration_s:
+                return offsets
+            offsets.append(t)
+    raise ValueError(f"Unsupported arrival process: {arrival_process}")
+
+
+async def run_load(credentials, rate, duration_s, rng):
+    """
+    Offers `rate` requests per second to the verify service for `duration_s`.
+
+    Latency is taken from each request's scheduled arrival time, not from when
+    it was actually written, so a client that falls behind cannot hide delay.
+    Requests unanswered after LOADGEN_REQUEST_TIMEOUT_S, or still waiting when
+    the service closes the connection, count as errors.
+
+    Returns:
+        dict: Request counts and latency percentiles of the level.
+    """
+    reader, writer = await asyncio.open_connection(verify_host, verify_port)
+    loop = asyncio.get_running_loop()
+    waiting = {}
+    latencies_ms = []
+    counts = {"completed": 0, "rejected": 0, "errors": 0, "mismatches": 0}
+
+    async def read_responses():
+        try:
+            while line := await reader.readline():
+                response = json.loads(line)
+                future = waiting.pop(response.get('id'), None)
+                if future is not None:
+                    future.set_result((response, loop.time()))
+        finally:
+            for future in waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("verify service closed the connection"))
+
+    async def track(request_id, scheduled, future):
+        try:
+            response, received = await asyncio.wait_for(future, scheduled + request_timeout_s - loop.time())
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            waiting.pop(request_id, None)
+            logging.warning(f"Request {request_id} got no response: {e!r}")
+            counts['errors'] += 1
+            return
+        if response.get('error') == 'overloaded':
+            counts['rejected'] += 1
+        elif 'error' in response:
+            counts['errors'] += 1
+        else:
+            counts['completed'] += 1
+            latencies_ms.append((received - scheduled) * 1000)
+            if not response['verified']:
+                counts['mismatches'] += 1
+
+    reader_task = asyncio.create_task(read_responses())
+    offsets = arrival_offsets(rate, duration_s, rng)
+    trackers = []
+    start = loop.time()
+
+    for request_id, (offset, credential) in enumerate(zip(offsets, itertools.cycle(credentials))):
+        scheduled = start + offset
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        algorithm, password_plaintext, stored_hash = credential
+        future = loop.create_future()
+        if reader_task.done():
+            future.set_exception(ConnectionError("verify service closed the connection"))
+        else:
+            waiting[request_id] = future
+        trackers.append(asyncio.create_task(track(request_id, scheduled, future)))
+        try:
+            writer.write((json.dumps({"id": request_id, "algorithm": algorithm,
+                                      "password": password_plaintext, "hash": stored_hash}) + '\n').encode('utf-8'))
+        except ConnectionError as e:
+            if waiting.pop(request_id, None) is not None:
+                future.set_exception(e)
+
+    try:
+        await writer.drain()
+    except ConnectionError:
+        pass
+    await asyncio.gather(*trackers)
+    wall_time_s = loop.time() - start
+
+    writer.close()
+    reader_task.cancel()
+
+    return dict(counts,
+                requests=len(offsets),
+                throughput_rps=counts['completed'] / wall_time_s,
+                latency_p50_ms=percentile(latencies_ms, 50),
+                latency_p95_ms=percentile(latencies_ms, 95),
+                latency_p99_ms=percentile(latencies_ms, 99),
+                latency_max_ms=max(latencies_ms) if latencies_ms else None)
+
+
+async def service_info():
+    reader, writer = await asyncio.open_connection(verify_host, verify_port)
+    writer.write(b'{"op": "info"}\n')
+    info = json.loads(await reader.readline())
+    writer.close()
+    return info
+
+
+def load_credentials(conn, algorithm, parameters):
+    """Hashes a sample of the passwords table with the configuration under test."""
+    ensure_sample_pool(conn, loadgen_seed, loadgen_passwords, int(os.getenv('SAMPLE_POOL_SCAN_ROWS', '2000000')))
+    rows = conn.execute(sample_password_query(loadgen_seed, password_score_threshold, loadgen_passwords)).fetchall()
+    conn.commit()
+
+    passwords = [row.password_plaintext for row in rows]
+    hasher = PasswordHasher.cached(algorithm, **parameters)
+    return [(algorithm, password_plaintext, stored_hash)
+            for password_plaintext, (_, stored_hash) in zip(passwords, hasher.generate_hash_batch(passwords))]
+
+
+if __name__ == "__main__":
+
+    db_password = get_db_password()
+    conn = create_db_connection(db_user, db_password, db_host, db_port, db_name)
+    ensure_hasher_schema(conn)
+
+    configs = conn.execute(text("""
+        SELECT ac.id, a.name, ac.parameters_json
+        FROM algorithm_configurations ac
+        INNER JOIN algorithms a ON a.id = ac.algorithm_id
+        WHERE ac.id = ANY(:ids)
+        ORDER BY ac.id
+        """), {"ids": loadgen_config_ids}).fetchall()
+    conn.commit()
+
+    if not configs:
+        logging.warning("Set LOADGEN_ALG_CONFIG_IDS to the algorithm configurations to load. Nothing to do.")
+        sys.exit(1)
+
+    info = asyncio.run(service_info())
+    logging.info(f"Verify service at {verify_host}:{verify_port}: {info['workers']} workers, "
+                 f"max {info['max_pending']} pending")
+
+    rng = random.Random(loadgen_seed)
+    for alg_config_id, algorithm, parameters in configs:
+        credentials = load_credentials(conn, algorithm, parameters)
+        if not credentials:
+            logging.warning(f"No passwords above score {password_score_threshold} to load configuration {alg_config_id}.")
+            continue
+
+        for rate in loadgen_rates:
+            started_at = time.time()
+            level = asyncio.run(run_load(credentials, rate, loadgen_duration_s, rng))
+            completed_at = time.time()
+
+            logging.info(f"Configuration {alg_config_id} at {rate:g} req/s ({arrival_process}): "
+                         f"{level['throughput_rps']:.1f} req/s served, {level['rejected']} rejected, "
+                         f"p50 {level['latency_p50_ms'] or 0:.1f} ms, p99 {level['latency_p99_ms'] or 0:.1f} ms")
+            if level['mismatches']:
+                logging.warning(f"Configuration {alg_config_id}: {level['mismatches']} correct passwords did not verify")
+
+            conn.execute(text("""
+                INSERT INTO verify_load_runs(alg_config_id, arrival_process, burst_size, offered_rps, duration_s,
+                                             service_workers, service_max_pending, requests, completed, rejected,
+                                             errors, throughput_rps, latency_p50_ms, latency_p95_ms,
+                                             latency_p99_ms, latency_max_ms, start_time_utc, end_time_utc)
+                VALUES (:alg_config_id, :arrival_process, :burst_size, :offered_rps, :duration_s,
+                        :service_workers, :service_max_pending, :requests, :completed, :rejected,
+                        :errors, :throughput_rps, :latency_p50_ms, :latency_p95_ms,
+                        :latency_p99_ms, :latency_max_ms, to_timestamp(:started_at), to_timestamp(:completed_at))
+                """), dict(level, alg_config_id=alg_config_id, arrival_process=arrival_process,
+                           burst_size=burst_size if arrival_process == 'bursty' else 1,
+                           offered_rps=rate, duration_s=loadgen_duration_s,
+                           service_workers=info['workers'], service_max_pending=info['max_pending'],
+                           started_at=started_at, completed_at=completed_at))
+            conn.commit()
+
+    conn.close()
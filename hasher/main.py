@@ -1,14 +1,27 @@
 import subprocess
+import resource
 from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
 import json
 import sys
-import cpuinfo
-import psutil
 
-from utils import create_db_connection, get_db_password, db_query_generator, pickle_object
+from utils import create_db_engine, get_db_password
+from host_registry import register_host
+from worker_pool import HashWorkerPool
+from zygote import HashZygote
+from schema import ensure_hasher_schema
+from pipeline import PasswordPrefetcher, ResultWriter
+from result_sink import HASH_VERIFICATION_COLUMNS
+from PasswordHasher import PasswordHasher
+from hasher import measure_verify
+from sampling import ensure_sample_pool, remaining_password_query
+from notifications import RUNS_REGISTERED, NotificationListener
+from claims import (LeaseKeeper, LeaseLostError, advance_checkpoint, claim_chunk, claim_experiment_run,
+                    complete_chunk, complete_leased_run, release_lease, split_into_chunks, worker_id)
 import dotenv
 import os
 import time
+import signal
 import logging
 
 
@@ -22,219 +35,371 @@ db_user = os.getenv('DB_USER')
 db_host = os.getenv('DB_HOST')
 db_port = os.getenv('DB_PORT')
 db_name = os.getenv('DB_NAME')
-algorithm = os.getenv('ALGORITHM')
+# one algorithm, or a comma-separated list; a daemon without one takes runs of every algorithm
+algorithm = os.getenv('ALGORITHM', '')
+claim_algorithms = [a.strip() for a in algorithm.split(',') if a.strip()] or None
+# 'single' works until no claimable work is left and exits; 'daemon' keeps
+# claiming runs back to back and only exits on SIGTERM or SIGINT
+hasher_mode = os.getenv('HASHER_MODE', 'single')
+# idle hashers wake on runs_registered notifications; this is only the fallback poll
+idle_poll_seconds = float(os.getenv('IDLE_POLL_SECONDS', '60'))
 sample_limit = int(os.getenv('SAMPLE_LIMIT', '100000'))
 password_score_threshold = int(os.getenv('PASSWORD_SCORE_THRESHOLD', '0'))
-
-logging.basicConfig(level=logging.INFO, 
+# runs without their own sample_seed draw from this seed's sample pool
+default_sample_seed = int(os.getenv('SAMPLE_SEED', '0'))
+sample_pool_per_stratum = int(os.getenv('SAMPLE_POOL_PER_STRATUM', '0')) or sample_limit
+sample_pool_scan_rows = int(os.getenv('SAMPLE_POOL_SCAN_ROWS', '2000000'))
+# 'subprocess' starts a fresh interpreter per password, 'pool' keeps long-lived hashing workers,
+# 'zygote' forks one isolated child per password from a pre-warmed process
+execution_mode = os.getenv('EXECUTION_MODE', 'subprocess')
+pool_workers = int(os.getenv('POOL_WORKERS', '0')) or None
+pool_backend = os.getenv('POOL_BACKEND', 'process')
+# results are buffered and written with COPY ('copy') or multi-row inserts ('executemany')
+sink_batch_size = int(os.getenv('SINK_BATCH_SIZE', '1000'))
+sink_method = os.getenv('SINK_METHOD', 'copy')
+# number of passwords the prefetch thread reads ahead of the hashing loop
+prefetch_depth = int(os.getenv('PREFETCH_DEPTH', '64'))
+# 'hash' runs are split into chunks of this many passwords that any hasher may claim
+chunk_size = int(os.getenv('CHUNK_SIZE', '1000'))
+# claimed work is reclaimable by other hashers once its lease is this old without renewal
+lease_seconds = int(os.getenv('LEASE_SECONDS', '300'))
+
+logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s',
                     handlers=[
-                        logging.FileHandler(f"experiment_run_{algorithm}.log"),
+                        logging.FileHandler(f"experiment_run_{algorithm.replace(',', '_') or 'all'}.log"),
                         logging.StreamHandler(sys.stdout)
                     ])
 
 
 db_password = get_db_password()
 
+
+# The prefetcher, result writer and lease keeper of every run borrow their
+# connections from this pool instead of opening new ones.
+engine = create_db_engine(db_user, db_password, db_host, db_port, db_name)
+
+
+def connection_factory():
+    return engine.connect()
+
+
 # create a database connection
 print("Establishing database connection...")
-conn = create_db_connection(db_user, db_password, db_host, db_port, db_name)
-
-algo_retrive_query = text(f"""
-                        SELECT er.id exp_id, ac.parameters_json
-                        FROM public.experiment_runs AS er
-                        INNER JOIN public.algorithm_configurations AS ac
-                        ON er.alg_config_id = ac.id
-                        INNER JOIN public.algorithms AS a
-                        ON ac.algorithm_id = a.id
-                        WHERE er.status = 'registered' AND a.name = '{algorithm}' 
-                        LIMIT 1
-                        """)
-
-algo_info = conn.execute(algo_retrive_query).fetchone()
-while algo_info is None:
-    print(f"No registered experiment run found for algorithm '{algorithm}'. waiting.")
-    time.sleep(10)
-    algo_info = conn.execute(algo_retrive_query).fetchone()
-    
-algo_info = algo_info._asdict()
-experiment_run_id = algo_info['exp_id']
-parameters_json = algo_info['parameters_json']
-
-
-
-password_retrieve_query = text(f"""
-                SELECT id, password
-                FROM passwords
-                WHERE score > {password_score_threshold} 
-                ORDER BY RANDOM()
+conn = connection_factory()
+ensure_hasher_schema(conn)
+
+# Replays the hashes of a completed 'hash' run for a 'verify' experiment run.
+stored_hash_retrieve_query = text("""
+                SELECT hg.id AS hash_generation_id, hg.generated_hash, p.password AS password_plaintext
+                FROM hash_generations hg
+                INNER JOIN passwords p ON p.id = hg.password_id
+                WHERE hg.experiment_run_id = :source_run_id
+                ORDER BY hg.id
                 LIMIT :limit
                      """)
 
 
-insert_query = text(f"""
-                            INSERT INTO public.hash_generations(
-                            experiment_run_id, 
-                            password_id, 
-                            generated_hash, 
-                            salt, 
-                            start_time_utc, 
-                            end_time_utc, 
-                            duration_ms, 
-                            cpu_user_time_ms, 
-                            cpu_system_time_ms, 
-                            memory_rss_mb_start, 
-                            memory_peak_mb_during_hash)
-                            VALUES (
-                            :experiment_run_id,
-                            :password_id,
-                            :generated_hash,
-                            :salt,
-                            :start_time_utc,
-                            :end_time_utc,
-                            :duration_ms,
-                            :cpu_user_time_ms,
-                            :cpu_system_time_ms,
-                            :memory_rss_mb_start,
-                            :memory_peak_mb_during_hash
-                                );
-                            """)
-
+def claim_work(owner):
+    """
+    Claims the next piece of work for this hasher's algorithms: a chunk of a
+    running 'hash' run, else a registered run. A newly claimed 'hash' run is
+    split into chunks and its first free chunk is claimed.
 
+    Returns:
+        tuple: ('chunk', chunk) or ('verify', run), or None if there is no work.
+    """
+    while True:
+        chunk = claim_chunk(conn, owner, lease_seconds, claim_algorithms)
+        if chunk is not None:
+            return 'chunk', chunk
 
+        run = claim_experiment_run(conn, owner, lease_seconds, claim_algorithms)
+        if run is None:
+            conn.commit()
+            return None
 
+        if run['experiment_type'] == 'verify':
+            conn.commit()
+            return 'verify', run
+
+        chunks = split_into_chunks(conn, run['exp_id'], sample_limit, chunk_size, password_score_threshold)
+        logging.info(f"Split experiment run id: {run['exp_id']} into {chunks} chunks of up to {chunk_size} passwords")
+
+
+def incorrect_password(password_plaintext):
+    """Returns a same-length wrong guess: the password with its last character changed."""
+    if not password_plaintext:
+        return 'x'
+    return password_plaintext[:-1] + chr(ord(password_plaintext[-1]) ^ 1)
+
+
+# The pool or zygote of the run being hashed, kept across its chunks.
+hashing_backend = {'exp_id': None, 'pool': None}
+
+
+def hashing_pool(chunk):
+    """
+    Returns the pool or zygote hashing the chunk's run, starting one when the
+    run changes. Called before the chunk's lease, prefetch and writer threads
+    start, so the zygote is forked while this hasher is single-threaded.
+    """
+    if hashing_backend['exp_id'] != chunk['exp_id']:
+        close_hashing_pool()
+        if execution_mode == 'pool':
+            pool = HashWorkerPool(chunk['algorithm'], chunk['parameters_json'], workers=pool_workers,
+                                  backend=pool_backend).start()
+            logging.info(f"Started {pool.workers} persistent {pool_backend} hashing workers for experiment run id: {chunk['exp_id']}")
+        elif execution_mode == 'zygote':
+            pool = HashZygote(chunk['algorithm'], chunk['parameters_json']).start()
+            logging.info(f"Started pre-warmed hashing zygote for experiment run id: {chunk['exp_id']}")
+        else:
+            pool = None
+        hashing_backend.update(exp_id=chunk['exp_id'], pool=pool)
+    return hashing_backend['pool']
+
+
+def close_hashing_pool():
+    if hashing_backend['pool'] is not None:
+        hashing_backend['pool'].close()
+    hashing_backend.update(exp_id=None, pool=None)
+
+
+def run_hash_chunk(chunk, lease, owner, host_id):
+    """
+    Hashes positions [start_position, end_position) of a 'hash' run's password sample.
+
+    Only passwords without a committed hash are read, so a resumed chunk
+    carries on where its last flush left off. Each flush also moves the
+    chunk's checkpoint in the same transaction.
+
+    Runs with the same sample seed hash exactly the same passwords, so the
+    configurations of one comparison can be compared password by password.
+    """
+    experiment_run_id = chunk['exp_id']
+    parameters = chunk['parameters_json']
+    sample_seed = chunk['sample_seed'] if chunk['sample_seed'] is not None else default_sample_seed
+    chunk_length = chunk['end_position'] - chunk['start_position']
+    count = 1
 
-if __name__ == "__main__":
+    parameters_json = {'algorithm': chunk['algorithm'], 'parameters': parameters}
 
-    logging.info(f"--------------------Working on experiment run id: {experiment_run_id} for algorithm: {algorithm}---------------")
-    parameters_json = dict()
+    ensure_sample_pool(conn, sample_seed, sample_pool_per_stratum, sample_pool_scan_rows)
+    password_query = remaining_password_query(sample_seed, chunk['score_threshold'], chunk_length,
+                                              chunk['start_position'], experiment_run_id)
 
-    parameters_json['algorithm'] = algorithm
+    if chunk['attempts'] > 1:
+        logging.info(f"Resuming chunk {chunk['chunk_index']} of experiment run id: {experiment_run_id} from "
+                     f"position {chunk['checkpoint_position']} of {chunk['start_position']}-{chunk['end_position']}")
 
-    parameters_json['parameters'] = algo_info['parameters_json']
+    # The prefetch and writer threads own their connections, so the hashing
+    # loop below only pops a password, hashes it and pushes the result.
+    prefetcher = PasswordPrefetcher(connection_factory, password_query, experiment_run_id, depth=prefetch_depth)
+    prefetcher.start()
 
-    exp_run_status_update_query = text("""
-                UPDATE 
-                    experiment_runs
-                SET  
-                    status = :status
-                WHERE
-                    id = :id
-                """)
-    conn.execute(exp_run_status_update_query, {'status' : 'running', 'id': experiment_run_id})
-    conn.commit()
-    
-    logging.info(f"Experiment run status updated to 'running' for id: {experiment_run_id}")
-    
-    run_start_time = 0
-    password_retrieve_query = password_retrieve_query.bindparams(limit=sample_limit)
+    def run_hasher_subprocess(jobs):
+        for job in jobs:
+            password_id = job['password_id']
+            parameters_json['password_plaintext'] = job['password_plaintext']
 
-    count = 1
+            logging.info(f"Processing password id: {password_id} for experiment run id: {experiment_run_id}")
 
-    
-    for row in db_query_generator(conn, password_retrieve_query):
-        logging.info(f"-----------------------Processing password {count} of up to {sample_limit} for experiment run id: {experiment_run_id}-------------------------------")
-        row = row._asdict()
-        password_id = row['id']
-        password_plaintext = row['password']
+            results_json = {"experiment_run_id": experiment_run_id, "password_id": password_id }
 
+            logging.info(f"Invoking hasher.py for password id: {password_id} for experiment run id: {experiment_run_id}")
 
-        parameters_json['password_plaintext'] = password_plaintext
+            completed = subprocess.run(["python3", "hasher.py"], input=json.dumps(parameters_json),
+                                       stdout=subprocess.PIPE, stderr=sys.stderr, text=True, check=True)
 
-        json.dump(parameters_json, open(f"{algorithm}_parameters.json", "w"))
+            results_json.update(json.loads(completed.stdout))
 
-        logging.info(f"Processing password id: {password_id} for experiment run id: {experiment_run_id}")
+            logging.info(f"Hasher.py completed for password id: {password_id} for experiment run id: {experiment_run_id}")
+            yield results_json
 
-        # pickle_object(parameters_json, algorithm + '_parameters.pkl', mode='save')
+    pool = hashing_pool(chunk)
+    results_iterator = pool.imap_unordered(prefetcher) if pool is not None else run_hasher_subprocess(prefetcher)
 
-        results_json = {"experiment_run_id": experiment_run_id, "password_id": password_id }
+    writer = ResultWriter(connection_factory, batch_size=sink_batch_size, method=sink_method,
+                          on_flush=lambda writer_conn, inserted: advance_checkpoint(writer_conn, chunk, owner, inserted))
+    writer.start()
 
-        json.dump(results_json, open(f"{algorithm}_results.json", "w"))
-        # pickle_object(results_json, algorithm + '_results.pkl', mode='save')
+    completed = False
+    try:
+        for results_json in results_iterator:
+            lease.check()
+            logging.info(f"-----------------------Processing password {count} of up to {chunk_length} in chunk {chunk['chunk_index']} of experiment run id: {experiment_run_id}-------------------------------")
+            password_id = results_json['password_id']
+            results_json['host_id'] = host_id
 
-        logging.info(f"Invoking hasher.py for password id: {password_id} for experiment run id: {experiment_run_id}")
+            writer.put(results_json)
 
-        subprocess.run(["python3", "hasher.py"], stderr=sys.stderr, stdout=sys.stdout, check=True)
+            logging.info(f"Results queued for password id: {password_id} for experiment run id: {experiment_run_id} - to be committed with the next batch\n")
+            count += 1
+        completed = True
+    finally:
+        prefetcher.close()
+        writer.close()
+        # Results still in flight would leak into the next chunk, so a failed chunk drops the pool.
+        if not completed:
+            close_hashing_pool()
 
-        results_json = json.load(open(f"{algorithm}_results.json", 'r'))
-        # results_json = pickle_object('-', algorithm + '_results.pkl', mode='load')
 
-        logging.info(f"Hasher.py completed for password id: {password_id} for experiment run id: {experiment_run_id}")
+def run_verify_experiment(run, lease):
+    """
+    Replays the stored hashes of the run's source run through PasswordHasher.verify,
+    once with the correct password and once with a wrong one, and records the
+    login latency of each check in hash_verifications.
+    """
+    experiment_run_id = run['exp_id']
+    source_run_id = run['source_run_id']
+    count = 1
 
-        if run_start_time == 0 :
-            run_start_time = results_json['start_time_utc']
-        
-        run_end_time = results_json['end_time_utc']
+    # A run reclaimed after its lease expired starts over.
+    conn.execute(text("DELETE FROM hash_verifications WHERE experiment_run_id = :id"), {"id": experiment_run_id})
+    conn.commit()
 
-        logging.info(f"Inserting results into database for password id: {password_id} for experiment run id: {experiment_run_id}")
+    hasher = PasswordHasher.cached(run['algorithm'], **run['parameters_json'])
+
+    prefetcher = PasswordPrefetcher(connection_factory,
+                                    stored_hash_retrieve_query.bindparams(source_run_id=source_run_id, limit=sample_limit),
+                                    experiment_run_id, depth=prefetch_depth)
+    prefetcher.start()
+
+    writer = ResultWriter(connection_factory, batch_size=sink_batch_size, method=sink_method,
+                          table='hash_verifications', columns=HASH_VERIFICATION_COLUMNS, not_null_columns=())
+    writer.start()
+
+    try:
+        for job in prefetcher:
+            lease.check()
+            logging.info(f"-----------------------Verifying hash {count} of up to {sample_limit} from experiment run id: {source_run_id}-------------------------------")
+            for password_correct, candidate in ((True, job['password_plaintext']),
+                                                (False, incorrect_password(job['password_plaintext']))):
+                # The prefetch and writer threads share this process, so only count this thread's CPU.
+                results_json = measure_verify(hasher, candidate, job['generated_hash'],
+                                              rusage_who=resource.RUSAGE_THREAD)
+                if results_json['verified'] != password_correct:
+                    logging.warning(f"Unexpected verify result {results_json['verified']} for hash generation id: "
+                                    f"{job['hash_generation_id']} (correct password: {password_correct})")
+
+                results_json.update({"experiment_run_id": experiment_run_id,
+                                     "hash_generation_id": job['hash_generation_id'],
+                                     "password_correct": password_correct})
+
+                writer.put(results_json)
+            count += 1
+    finally:
+        prefetcher.close()
+        writer.close()
+
+
+def release_work(table, row_id, owner):
+    """Releases a lease on a fresh connection, since the shared one may be what failed."""
+    try:
+        with connection_factory() as release_conn:
+            release_lease(release_conn, table, row_id, owner)
+    except Exception as e:
+        logging.warning(f"Could not release the lease on {table} id: {row_id}: {e}. "
+                        f"It expires after {lease_seconds}s.")
+
+
+def process_work(kind, work, owner, host_id, hardware_info):
+    """
+    Runs one claimed chunk or 'verify' run under a renewed lease. If the
+    hasher fails or is stopped, the lease is released so another hasher can
+    pick the work up at once.
+    """
+    if kind == 'chunk':
+        table, row_id = 'experiment_run_chunks', work['chunk_id']
+        hashing_pool(work)
+    else:
+        table, row_id = 'experiment_runs', work['exp_id']
+
+    lease = LeaseKeeper(connection_factory, table, row_id, owner, lease_seconds)
+    lease.start()
+    try:
+        if kind == 'chunk':
+            run_hash_chunk(work, lease, owner, host_id)
+        else:
+            run_verify_experiment(work, lease)
+        lease.stop()
+        lease.check()
+
+        if kind == 'chunk':
+            logging.info(f"Chunk {work['chunk_index']} of experiment run id: {work['exp_id']} processed.")
+            if complete_chunk(conn, work, owner, host_id, hardware_info):
+                logging.info(f"Experiment run status updated to 'completed' for id: {work['exp_id']}")
+        else:
+            complete_leased_run(conn, work['exp_id'], owner, host_id, hardware_info, 'hash_verifications')
+            logging.info(f"Experiment run status updated to 'completed' for id: {work['exp_id']}")
+    except BaseException:
+        lease.stop()
+        release_work(table, row_id, owner)
+        raise
 
-        insert_query_dict = {
-            'experiment_run_id' : results_json['experiment_run_id'],
-            'password_id' : results_json['password_id'],
-            'generated_hash' : results_json['generated_hash'],
-            'salt' : results_json['salt'],
-            'start_time_utc' : results_json['start_time_utc'],
-            'end_time_utc' : results_json['end_time_utc'],
-            'duration_ms' : results_json['duration_ms'],
-            'cpu_user_time_ms' : results_json['cpu_user_time_ms'],
-            'cpu_system_time_ms' : results_json['cpu_system_time_ms'],
-            'memory_rss_mb_start' : results_json['memory_rss_mb_start'],
-            'memory_peak_mb_during_hash' : results_json['memory_peak_mb_during_hash']
-        }
 
-        logging.info(f"Inserting results into database for password id: {password_id} for experiment run id: {experiment_run_id}")
-        
-        conn.execute(insert_query, insert_query_dict)
+if __name__ == "__main__":
 
-        if count % 1000 == 0:
-            conn.commit()
-            logging.info(f"Committed batch of 1000 records.")
-
-        logging.info(f"Results inserted into database for password id: {password_id} for experiment run id: {experiment_run_id} - to be committed later\n")
-        count += 1
-
-    logging.info(f"All passwords processed for experiment run id: {experiment_run_id}. Updating experiment run table.")
-
-    cpu_info = cpuinfo.get_cpu_info()
-    memory = psutil.virtual_memory()
-
-    hadware_info_dict = { 
-        "cpu" : {
-            "cpu_brand": cpu_info['brand_raw'],
-            "cpu_vendor_id": cpu_info['vendor_id_raw'],
-            "cpu_architecture": cpu_info['arch'],
-            "cpu_cores": cpu_info['count'],
-            "cpu_l2_cache_size": cpu_info['l2_cache_size'],
-            "cpu_l3_cache_size": cpu_info['l3_cache_size'],
-            "cpu_model": cpu_info['model'],
-            "cpu_base_frequency": cpu_info['hz_advertised_friendly']
-                },
-        "memory" : {
-            "total_ram_gb": f"{memory.total / (1024**3):.2f} GB",}
-        }
-
-    exp_run_update_query = text("""
-                    UPDATE 
-                        experiment_runs
-                    SET 
-                        start_time = :start_time, 
-                        end_time = :end_time, 
-                        status = :status, 
-                        hardware_info = CAST(:hardware_info AS JSONB)
-                    WHERE
-                        id = :id
-                    """)
-    
-    
-
-    placeholder_dict = {
-        'start_time' : run_start_time, 
-        'end_time' : run_end_time,
-        'status' : 'completed',
-        'hardware_info' : json.dumps(hadware_info_dict),
-        'id' : experiment_run_id
-    }
-    
-    conn.execute(exp_run_update_query, placeholder_dict)
-    conn.commit()
-    logging.info(f"Experiment run status updated to 'completed' for id: {experiment_run_id}")
\ No newline at end of file
+    # Turn SIGTERM and SIGINT into SystemExit so the buffered results are
+    # flushed and the current lease released on the way out.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    signal.signal(signal.SIGINT, lambda signum, frame: sys.exit(128 + signum))
+
+    owner = worker_id()
+    host_id, hardware_info = register_host(conn)
+    hardware_info = json.dumps(hardware_info)
+    listener = NotificationListener(engine, [RUNS_REGISTERED])
+    processed = 0
+    algorithms_label = ', '.join(claim_algorithms) if claim_algorithms else 'any algorithm'
+
+    logging.info(f"Hasher {owner} started in {hasher_mode} mode for {algorithms_label}")
+
+    # In single mode, work through chunks and runs until none are left, then
+    # exit and let the container restart wait for the next registration.
+    while True:
+        try:
+            claimed = claim_work(owner)
+        except OperationalError as e:
+            if hasher_mode != 'daemon':
+                raise
+            logging.error(f"Lost the database connection while claiming work: {e}. Reconnecting.")
+            conn.invalidate()
+            conn.close()
+            time.sleep(min(idle_poll_seconds, 10))
+            conn = connection_factory()
+            continue
+
+        if claimed is None:
+            if processed and hasher_mode != 'daemon':
+                break
+            print(f"No registered experiment run found for {algorithms_label}. waiting.")
+            close_hashing_pool()
+            listener.wait(idle_poll_seconds, claim_algorithms)
+            continue
+
+        kind, work = claimed
+        logging.info(f"--------------------Working on {kind} of experiment run id: {work['exp_id']} for algorithm: {work['algorithm']} as {owner}---------------")
+        try:
+            process_work(kind, work, owner, host_id, hardware_info)
+        except LeaseLostError as e:
+            logging.warning(f"{e}. Another hasher has taken over the work.")
+        except Exception as e:
+            # A daemon only stops on a signal; the failed work's lease is already released.
+            if hasher_mode != 'daemon':
+                raise
+            logging.exception(f"Failed {kind} of experiment run id: {work['exp_id']}: {e}. Moving on.")
+            close_hashing_pool()
+            if isinstance(e, OperationalError):
+                conn.invalidate()
+            else:
+                try:
+                    conn.rollback()
+                except Exception:
+                    conn.invalidate()
+            if conn.invalidated:
+                conn.close()
+                conn = connection_factory()
+            time.sleep(min(idle_poll_seconds, 10))
+        processed += 1
+
+    close_hashing_pool()
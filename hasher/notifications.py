@@ -0,0 +1,79 @@
+import logging
+import select
+import time
+
+# Notified by triggers on experiment_runs and experiment_run_chunks (see
+# schema.py), with the algorithm name of the new run or chunk as the payload.
+RUNS_REGISTERED = 'runs_registered'
+
+
+class NotificationListener:
+    """
+    LISTENs on Postgres channels over a dedicated autocommit connection.
+
+    Idle workers block in wait() until a notification arrives or the
+    fallback poll interval passes, instead of re-querying on a timer. The
+    LISTEN is issued when the listener is created, so notifications sent
+    while the worker is busy are buffered and end the next wait() at once.
+    """
+
+    def __init__(self, engine, channels):
+        self.engine = engine
+        self.channels = channels
+        self._raw = None
+        self._connect()
+
+    def _connect(self):
+        # Detached from the pool: the session keeps its LISTENs and autocommit for good.
+        self._raw = self.engine.raw_connection()
+        self._raw.detach()
+        dbapi_connection = self._raw.dbapi_connection
+        dbapi_connection.autocommit = True
+        with dbapi_connection.cursor() as cursor:
+            for channel in self.channels:
+                cursor.execute(f"LISTEN {channel}")
+
+    def wait(self, timeout, payloads=None):
+        """
+        Blocks for up to `timeout` seconds until a notification arrives.
+
+        Args:
+            timeout (float): The fallback poll interval in seconds.
+            payloads (list): If given, only notifications with one of these
+                payloads end the wait early.
+
+        Returns:
+            bool: True if a matching notification arrived, False on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        try:
+            if self._raw is None:
+                self._connect()
+            dbapi_connection = self._raw.dbapi_connection
+            dbapi_connection.poll()
+            while not self._take(dbapi_connection, payloads):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not select.select([dbapi_connection], [], [], remaining)[0]:
+                    return False
+                dbapi_connection.poll()
+            return True
+        except Exception as e:
+            # Sleep out this wait as a plain poll; the next wait() reconnects.
+            logging.warning(f"Notification listener failed: {e}. Falling back to polling.")
+            self.close()
+            time.sleep(max(deadline - time.monotonic(), 0))
+            return False
+
+    @staticmethod
+    def _take(dbapi_connection, payloads):
+        notifies = list(dbapi_connection.notifies)
+        dbapi_connection.notifies.clear()
+        return any(payloads is None or notify.payload in payloads for notify in notifies)
+
+    def close(self):
+        if self._raw is not None:
+            try:
+                self._raw.close()
+            except Exception:
+                pass
+            self._raw = None
@@ -0,0 +1,126 @@
+import logging
+import queue
+import threading
+
+from result_sink import HashGenerationSink
+from utils import db_query_generator
+
+
+_END_OF_STREAM = object()
+
+
+class PasswordPrefetcher(threading.Thread):
+    """
+    Reads the run's passwords on a dedicated connection into a bounded queue.
+
+    Iterating the prefetcher yields one job dict per row, keyed by the query's
+    column labels (e.g. password_id, password_plaintext) plus the run id, so
+    the measuring thread only ever pops an already-fetched password. close()
+    stops a prefetcher whose consumer gave up early, releasing its connection.
+    """
+
+    def __init__(self, connection_factory, query, experiment_run_id, depth=64):
+        super().__init__(name='password-prefetcher', daemon=True)
+        self.connection_factory = connection_factory
+        self.query = query
+        self.experiment_run_id = experiment_run_id
+        self.jobs = queue.Queue(maxsize=depth)
+        self.error = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        conn = self.connection_factory()
+        try:
+            for row in db_query_generator(conn, self.query):
+                job = {"experiment_run_id": self.experiment_run_id}
+                job.update(row._asdict())
+                if not self._put(job):
+                    break
+        except Exception as e:
+            logging.error(f"Password prefetch failed for experiment run id: {self.experiment_run_id}: {e}")
+            self.error = e
+        finally:
+            conn.close()
+            self._put(_END_OF_STREAM)
+
+    def _put(self, item):
+        """Queues an item unless the prefetcher is stopped first; returns whether it was queued."""
+        while not self._stop_event.is_set():
+            try:
+                self.jobs.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def close(self):
+        """Stops reading, discards the queued passwords and waits for the connection to be released."""
+        self._stop_event.set()
+        while self.is_alive():
+            try:
+                self.jobs.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self.join()
+
+    def __iter__(self):
+        while True:
+            job = self.jobs.get()
+            if job is _END_OF_STREAM:
+                break
+            yield job
+        if self.error is not None:
+            raise self.error
+
+
+class ResultWriter(threading.Thread):
+    """
+    Drains results into a HashGenerationSink on a dedicated connection.
+    Extra keyword arguments (table, columns, ...) are passed to the sink.
+
+    put() never waits on the database, so insert latency stays out of the
+    measuring thread. close() flushes the remaining rows and re-raises any
+    error the writer hit.
+    """
+
+    def __init__(self, connection_factory, batch_size=1000, method='copy', depth=4096, **sink_options):
+        super().__init__(name='result-writer', daemon=True)
+        self.connection_factory = connection_factory
+        self.batch_size = batch_size
+        self.method = method
+        self.sink_options = sink_options
+        self.results = queue.Queue(maxsize=depth)
+        self.error = None
+
+    def run(self):
+        conn = self.connection_factory()
+        ended = False
+        try:
+            with HashGenerationSink(conn, batch_size=self.batch_size, method=self.method,
+                                    **self.sink_options) as sink:
+                while not ended:
+                    results_json = self.results.get()
+                    if results_json is _END_OF_STREAM:
+                        ended = True
+                    else:
+                        sink.add(results_json)
+        except Exception as e:
+            logging.error(f"Result writer failed: {e}")
+            self.error = e
+            # Keep draining so the measuring thread is never blocked on a full queue. If the
+            # final flush failed, close() has already sent the end of the stream.
+            while not ended:
+                ended = self.results.get() is _END_OF_STREAM
+        finally:
+            conn.close()
+
+    def put(self, results_json):
+        if self.error is not None:
+            raise self.error
+        self.results.put(results_json)
+
+    def close(self):
+        self.results.put(_END_OF_STREAM)
+        self.join()
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,77 @@
+import json
+from sqlalchemy import text
+
+
+def register_algorithm_configuration(conn, algorithm, parameters):
+    """
+    Inserts (or finds) an algorithm_configurations row, as the webapp form does.
+
+    Args:
+        conn: A SQLAlchemy connection object.
+        algorithm (str): The algorithms.name value, e.g. 'argon2'.
+        parameters (dict): The configuration parameters. Values are stored as
+            strings to match configurations entered through the webapp.
+
+    Returns:
+        int: The algorithm_configurations id.
+    """
+    parameters_json = json.dumps({key: str(value) for key, value in parameters.items()})
+
+    algorithm_id = conn.execute(text("SELECT id FROM algorithms WHERE name = :name"),
+                                {"name": algorithm}).scalar()
+    if algorithm_id is None:
+        raise ValueError(f"Algorithm '{algorithm}' is not loaded in the algorithms table")
+
+    # algorithm_configurations has no unique key on the parameters, so look
+    # the configuration up before inserting it.
+    alg_config_id = conn.execute(text("""
+        SELECT id FROM algorithm_configurations
+        WHERE algorithm_id = :algorithm_id AND parameters_json = CAST(:parameters_json AS JSONB)
+        LIMIT 1
+        """), {"algorithm_id": algorithm_id, "parameters_json": parameters_json}).scalar()
+
+    if alg_config_id is None:
+        alg_config_id = conn.execute(text("""
+            INSERT INTO algorithm_configurations(algorithm_id, parameters_json)
+            VALUES (:algorithm_id, CAST(:parameters_json AS JSONB))
+            RETURNING id
+            """), {"algorithm_id": algorithm_id, "parameters_json": parameters_json}).scalar()
+
+    return alg_config_id
+
+
+def register_comparison_runs(conn, name, description, alg_config_ids):
+    """
+    Links configurations to a comparison and registers an experiment run for each.
+    The runs are seeded with the comparison id so they hash the same passwords.
+
+    Args:
+        conn: A SQLAlchemy connection object.
+        name (str): The comparison name; an existing comparison is reused.
+        description (str): The comparison description.
+        alg_config_ids (list): The algorithm_configurations ids to register.
+
+    Returns:
+        list: The ids of the registered experiment runs.
+    """
+    comp_id = conn.execute(text(
+        "INSERT INTO comparisons(name, description) VALUES (:n, :d) "
+        "ON CONFLICT(name) DO UPDATE SET description = EXCLUDED.description RETURNING id"
+    ), {"n": name, "d": description}).scalar()
+
+    run_ids = []
+    for alg_config_id in alg_config_ids:
+        conn.execute(text("""
+            INSERT INTO comparison_algo_configs(comp_id, algo_config_id)
+            VALUES (:comp_id, :alg_config_id)
+            ON CONFLICT DO NOTHING
+            """), {"comp_id": comp_id, "alg_config_id": alg_config_id})
+
+        run_ids.append(conn.execute(text("""
+            INSERT INTO experiment_runs(alg_config_id, status, description, sample_seed)
+            VALUES (:alg_config_id, 'registered', :desc, :sample_seed)
+            RETURNING id
+            """), {"alg_config_id": alg_config_id, "desc": f"Registered for comparison {name}",
+                   "sample_seed": comp_id}).scalar())
+
+    return run_ids
@@ -0,0 +1,162 @@
+import csv
+import io
+import logging
+
+from sqlalchemy import text
+
+
+HASH_GENERATION_COLUMNS = (
+    'experiment_run_id',
+    'password_id',
+    'generated_hash',
+    'salt',
+    'start_time_utc',
+    'end_time_utc',
+    'duration_ms',
+    'cpu_user_time_ms',
+    'cpu_system_time_ms',
+    'memory_rss_mb_start',
+    'memory_peak_mb_during_hash',
+    'memory_peak_delta_mb',
+    'duration_ms_min',
+    'duration_ms_median',
+    'duration_ms_p95',
+    'duration_ms_stddev',
+    'thread_cpu_time_ms',
+    'timing_warmup',
+    'timing_repetitions',
+    'host_id',
+)
+
+HASH_VERIFICATION_COLUMNS = (
+    'experiment_run_id',
+    'hash_generation_id',
+    'password_correct',
+    'verified',
+    'start_time_utc',
+    'end_time_utc',
+    'duration_ms',
+    'cpu_user_time_ms',
+    'cpu_system_time_ms',
+    'duration_ms_min',
+    'duration_ms_median',
+    'duration_ms_p95',
+    'duration_ms_stddev',
+    'thread_cpu_time_ms',
+    'timing_warmup',
+    'timing_repetitions',
+)
+
+
+class HashGenerationSink:
+    """
+    Buffers result rows and writes them in bulk, to hash_generations by default.
+
+    Rows are flushed every `batch_size` additions with PostgreSQL
+    COPY FROM STDIN ('copy') or a multi-row executemany ('executemany'),
+    and each flush is committed. Call close() (or use the sink as a context
+    manager) so the final partial batch is written on exit.
+
+    Inserts are idempotent: rows that collide with a unique key, e.g. a
+    password a resumed chunk already hashed, are skipped. Both methods load
+    the batch into a temporary staging table and merge it with
+    INSERT ... ON CONFLICT DO NOTHING, since COPY itself cannot skip conflicts.
+    `on_flush(conn, inserted)` runs inside each flush's transaction, so
+    progress recorded there commits atomically with the rows.
+    """
+
+    def __init__(self, conn, batch_size=1000, method='copy', table='hash_generations',
+                 columns=HASH_GENERATION_COLUMNS, not_null_columns=('generated_hash', 'salt'), on_flush=None):
+        if method not in ('copy', 'executemany'):
+            raise ValueError(f"Unsupported sink method: {method}")
+
+        self.conn = conn
+        self.batch_size = batch_size
+        self.method = method
+        self.table = table
+        self.columns = columns
+        self.not_null_columns = not_null_columns
+        self.on_flush = on_flush
+        self.rows = []
+        self.rows_written = 0
+        self._staging_table = None
+
+    def add(self, results_json):
+        self.rows.append({column: results_json.get(column) for column in self.columns})
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+
+        if self.method == 'copy':
+            inserted = self._copy_rows()
+        else:
+            inserted = self._insert_rows()
+        if self.on_flush is not None:
+            self.on_flush(self.conn, inserted)
+        self.conn.commit()
+
+        self.rows_written += inserted
+        skipped = len(self.rows) - inserted
+        logging.info(f"Committed batch of {inserted} records ({self.rows_written} total"
+                     f"{f', {skipped} already present' if skipped else ''}).")
+        self.rows = []
+
+    def _copy_rows(self):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in self.rows:
+            writer.writerow(row[column] for column in self.columns)
+        buffer.seek(0)
+
+        # Begin on the SQLAlchemy connection so conn.commit() covers the raw COPY.
+        if not self.conn.in_transaction():
+            self.conn.begin()
+        columns = ', '.join(self.columns)
+        staging_table = self._ensure_staging_table()
+        # An empty unquoted CSV field is NULL; keep empty strings in text columns.
+        options = 'FORMAT csv'
+        if self.not_null_columns:
+            options += f", FORCE_NOT_NULL ({', '.join(self.not_null_columns)})"
+        with self.conn.connection.dbapi_connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {staging_table} ({columns}) FROM STDIN WITH ({options})", buffer)
+        return self._merge_staged_rows()
+
+    def _insert_rows(self):
+        columns = ', '.join(self.columns)
+        placeholders = ', '.join(f':{column}' for column in self.columns)
+        staging_table = self._ensure_staging_table()
+        self.conn.execute(text(f"INSERT INTO {staging_table} ({columns}) VALUES ({placeholders})"),
+                          self.rows)
+        return self._merge_staged_rows()
+
+    def _ensure_staging_table(self):
+        # Temporary tables live as long as the session, which outlives a pooled
+        # checkout, so IF NOT EXISTS; ON COMMIT DELETE ROWS empties it per flush.
+        if self._staging_table is None:
+            self._staging_table = f"{self.table}_staging"
+            self.conn.execute(text(f"""
+                CREATE TEMP TABLE IF NOT EXISTS {self._staging_table} ON COMMIT DELETE ROWS AS
+                SELECT {', '.join(self.columns)} FROM public.{self.table} WITH NO DATA
+                """))
+        return self._staging_table
+
+    def _merge_staged_rows(self):
+        """Moves the staged batch into the target table and returns how many rows were new."""
+        columns = ', '.join(self.columns)
+        return self.conn.execute(text(f"""
+            INSERT INTO public.{self.table} ({columns})
+            SELECT {columns} FROM {self._staging_table}
+            ON CONFLICT DO NOTHING
+            """)).rowcount
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
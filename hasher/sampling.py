@@ -0,0 +1,118 @@
+import logging
+import textwrap
+from sqlalchemy import text
+
+
+# Passwords are stratified by zxcvbn score, a 4-character length bucket and
+# source. Each stratum is ranked by a seeded hash of the password id, so the
+# same seed always yields the same ordered sample and every run that shares a
+# seed (e.g. all configurations of one comparison) hashes the same passwords.
+BUILD_POOL_QUERY = textwrap.dedent("""
+    INSERT INTO password_sample_pools
+        (seed, password_id, score, password_len, source, stratum_rank, sample_key)
+    SELECT seed, id, score, password_len, source, stratum_rank, sample_key
+    FROM (
+        SELECT
+            CAST(:seed AS INT) AS seed,
+            p.id, p.score, p.password_len, p.source,
+            hashtextextended(p.id::text, :seed) AS sample_key,
+            row_number() OVER (
+                PARTITION BY floor(p.score), width_bucket(p.password_len, 0, 24, 6), p.source
+                ORDER BY hashtextextended(p.id::text, :seed), p.id
+            ) AS stratum_rank
+        FROM passwords p {tablesample}
+    ) ranked
+    WHERE stratum_rank <= :per_stratum
+    ON CONFLICT (seed, password_id) DO NOTHING
+    """)
+
+SAMPLE_SQL_TEMPLATE = textwrap.dedent("""
+    SELECT sp.password_id, p.password AS password_plaintext{sort_keys}
+    FROM password_sample_pools sp
+    INNER JOIN passwords p ON p.id = sp.password_id
+    WHERE sp.seed = :seed AND sp.score > :score_threshold
+    ORDER BY sp.stratum_rank, sp.sample_key, sp.password_id
+    LIMIT :limit OFFSET :offset
+    """)
+
+SAMPLE_QUERY = text(SAMPLE_SQL_TEMPLATE.format(sort_keys=""))
+
+# The positions are taken over the full sample first, so skipping the
+# passwords a run already hashed never shifts a chunk's range. The subquery's
+# order does not survive the anti-join, so the sample keys are sorted on again.
+REMAINING_SAMPLE_QUERY = text(textwrap.dedent(f"""
+    SELECT s.password_id, s.password_plaintext
+    FROM ({SAMPLE_SQL_TEMPLATE.format(sort_keys=", sp.stratum_rank, sp.sample_key")}) s
+    WHERE NOT EXISTS (SELECT 1 FROM hash_generations hg
+                      WHERE hg.experiment_run_id = :experiment_run_id AND hg.password_id = s.password_id)
+    ORDER BY s.stratum_rank, s.sample_key, s.password_id
+    """))
+
+
+def ensure_sample_pool(conn, seed, per_stratum, scan_rows):
+    """
+    Materializes the sample pool for a seed if it is missing or too small.
+
+    The first run with a seed pays for one pass over passwords; every later
+    run reads its sample straight from the pool. When passwords holds more
+    than `scan_rows` rows, the pass reads a repeatable TABLESAMPLE SYSTEM of
+    about that many rows instead of the whole table.
+
+    Args:
+        conn: A SQLAlchemy connection object.
+        seed (int): The sample seed.
+        per_stratum (int): How many passwords to keep per stratum.
+        scan_rows (int): The approximate number of rows to scan.
+    """
+    # Hashers started together for one comparison share a seed; build it once.
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('password_sample_pool'), :seed)"),
+                 {"seed": seed})
+
+    built_per_stratum = conn.execute(text(
+        "SELECT per_stratum FROM password_sample_pool_builds WHERE seed = :seed"
+    ), {"seed": seed}).scalar()
+    if built_per_stratum is not None and built_per_stratum >= per_stratum:
+        conn.commit()
+        return
+
+    # Ranks only depend on the seed, so a larger pool extends a smaller one.
+    estimated_rows = conn.execute(text(
+        "SELECT reltuples FROM pg_class WHERE oid = 'public.passwords'::regclass"
+    )).scalar() or 0
+    if estimated_rows > scan_rows:
+        sample_percent = 100.0 * scan_rows / estimated_rows
+        tablesample = f"TABLESAMPLE SYSTEM ({sample_percent:.6f}) REPEATABLE ({int(seed)})"
+    else:
+        tablesample = ""
+
+    logging.info(f"Building password sample pool for seed {seed} ({per_stratum} per stratum"
+                 f"{', ' + tablesample if tablesample else ''})")
+    conn.execute(text(BUILD_POOL_QUERY.format(tablesample=tablesample)),
+                 {"seed": seed, "per_stratum": per_stratum})
+    conn.execute(text("""
+        INSERT INTO password_sample_pool_builds(seed, per_stratum, built_at)
+        VALUES (:seed, :per_stratum, now())
+        ON CONFLICT (seed) DO UPDATE SET per_stratum = EXCLUDED.per_stratum, built_at = EXCLUDED.built_at
+        """), {"seed": seed, "per_stratum": per_stratum})
+    conn.commit()
+
+
+def sample_password_query(seed, score_threshold, limit, offset=0):
+    """
+    Returns the query for a run's password sample, or for positions
+    [offset, offset + limit) of it.
+
+    Rows are ordered by rank within their stratum, so any prefix of the sample
+    is spread evenly over the strata above the score threshold. The order is
+    total, so position ranges of the same sample never overlap.
+    """
+    return SAMPLE_QUERY.bindparams(seed=seed, score_threshold=score_threshold, limit=limit, offset=offset)
+
+
+def remaining_password_query(seed, score_threshold, limit, offset, experiment_run_id):
+    """
+    Returns the passwords of sample positions [offset, offset + limit) that
+    have no hash in `experiment_run_id` yet, in sample order.
+    """
+    return REMAINING_SAMPLE_QUERY.bindparams(seed=seed, score_threshold=score_threshold, limit=limit,
+                                             offset=offset, experiment_run_id=experiment_run_id)
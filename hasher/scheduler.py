@@ -0,0 +1,180 @@
+import json
+import logging
+import os
+import signal
+import sys
+
+import dotenv
+from sqlalchemy import text
+
+from claims import LeaseKeeper, LeaseLostError, claim_comparison_runs, complete_leased_run, release_lease, worker_id
+from pipeline import ResultWriter
+from sampling import ensure_sample_pool, remaining_password_query
+from schema import ensure_hasher_schema
+from host_registry import register_host
+from utils import create_db_engine, get_db_password
+from zygote import HashZygote
+
+# Hashes all configurations of one comparison on this host, interleaved: each
+# round hashes the next batch of the shared password sample with every
+# configuration in turn, and every other round reverses the order (A B C,
+# C B A, ...) so slow drift such as heating or frequency scaling lands evenly
+# on all of them. Hashes run one at a time in forked zygote children pinned to
+# SCHEDULER_CPUS, while the scheduler and its database threads stay on
+# SCHEDULER_CONTROL_CPUS. Stop the per-algorithm hashers first, e.g.
+#   docker compose stop hasher_bcrypt hasher_argon2 hasher_scrypt hasher_pbkdf2
+#   docker compose --profile interleaved run --rm -e SCHEDULER_COMPARISON=3 hasher_scheduler
+
+dotenv.load_dotenv(dotenv_path='./data/.env')
+
+db_user = os.getenv('DB_USER')
+db_host = os.getenv('DB_HOST')
+db_port = os.getenv('DB_PORT')
+db_name = os.getenv('DB_NAME')
+comparison = os.getenv('SCHEDULER_COMPARISON', '')
+sample_limit = int(os.getenv('SAMPLE_LIMIT', '100000'))
+password_score_threshold = int(os.getenv('PASSWORD_SCORE_THRESHOLD', '0'))
+sample_pool_scan_rows = int(os.getenv('SAMPLE_POOL_SCAN_ROWS', '2000000'))
+# passwords each configuration hashes per turn of a round
+batch_size = int(os.getenv('SCHEDULER_BATCH_SIZE', '10'))
+measure_cpus = os.getenv('SCHEDULER_CPUS', '')
+control_cpus = os.getenv('SCHEDULER_CONTROL_CPUS', '')
+lease_seconds = int(os.getenv('LEASE_SECONDS', '300'))
+sink_batch_size = int(os.getenv('SINK_BATCH_SIZE', '1000'))
+sink_method = os.getenv('SINK_METHOD', 'copy')
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    handlers=[logging.StreamHandler(sys.stdout)])
+
+
+def parse_cpu_list(cpu_list):
+    """Parses a cpuset-style list such as '0-3,6' into a set of CPU numbers."""
+    cpus = set()
+    for part in cpu_list.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-')
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+def pin_current_thread(cpus, purpose):
+    """Pins the calling thread, and every thread or process it starts, to `cpus`."""
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+        logging.info(f"Pinned {purpose} to CPUs {sorted(cpus)}")
+
+
+def resolve_comparison(conn, comparison):
+    row = conn.execute(text("""
+        SELECT id, name FROM comparisons
+        WHERE CAST(id AS TEXT) = :comparison OR name = :comparison
+        ORDER BY id
+        LIMIT 1
+        """), {"comparison": comparison}).fetchone()
+    conn.commit()
+    return row
+
+
+def round_orders(runs, rounds):
+    """Yields the run order of every round, reversed on every other round."""
+    for index in range(rounds):
+        yield index, (runs if index % 2 == 0 else list(reversed(runs)))
+
+
+if __name__ == "__main__":
+
+    # Turn SIGTERM into SystemExit so the buffered results are flushed and the leases released.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+    if not comparison:
+        logging.error("Set SCHEDULER_COMPARISON to the id or name of the comparison to run.")
+        sys.exit(1)
+
+    measure_cpu_set = parse_cpu_list(measure_cpus)
+    control_cpu_set = parse_cpu_list(control_cpus)
+
+    db_password = get_db_password()
+    engine = create_db_engine(db_user, db_password, db_host, db_port, db_name)
+    connection_factory = engine.connect
+    conn = connection_factory()
+    ensure_hasher_schema(conn)
+
+    comp = resolve_comparison(conn, comparison)
+    if comp is None:
+        logging.error(f"No comparison '{comparison}' found.")
+        sys.exit(1)
+
+    owner = worker_id()
+    runs = claim_comparison_runs(conn, owner, lease_seconds, comp.id)
+    if not runs:
+        logging.warning(f"Comparison '{comp.name}' has no registered hash runs to schedule.")
+        sys.exit(0)
+
+    host_id, hardware_info = register_host(conn)
+    hardware_info = dict(hardware_info)
+    hardware_info['cpu_affinity'] = sorted(measure_cpu_set or os.sched_getaffinity(0))
+    hardware_info = json.dumps(hardware_info)
+
+    sample_seed = comp.id
+    ensure_sample_pool(conn, sample_seed, sample_limit, sample_pool_scan_rows)
+    rounds = -(-sample_limit // batch_size)
+    logging.info(f"Interleaving {len(runs)} runs of comparison '{comp.name}' "
+                 f"({', '.join(str(run['exp_id']) for run in runs)}) over {rounds} rounds of {batch_size} passwords")
+
+    # Zygotes forked while pinned to the measurement CPUs keep them; the main
+    # thread then moves to the control CPUs, which the database threads inherit.
+    pin_current_thread(measure_cpu_set, "hashing zygotes")
+    zygotes = {run['exp_id']: HashZygote(run['algorithm'], run['parameters_json']).start() for run in runs}
+
+    pin_current_thread(control_cpu_set, "scheduler and database threads")
+    leases = {run['exp_id']: LeaseKeeper(connection_factory, 'experiment_runs', run['exp_id'], owner, lease_seconds)
+              for run in runs}
+    for lease in leases.values():
+        lease.start()
+    writer = ResultWriter(connection_factory, batch_size=sink_batch_size, method=sink_method)
+    writer.start()
+
+    try:
+        for round_index, ordered_runs in round_orders(runs, rounds):
+            offset = round_index * batch_size
+            for run in ordered_runs:
+                leases[run['exp_id']].check()
+                # Passwords a previous attempt already committed are skipped.
+                jobs = [{"experiment_run_id": run['exp_id'], **row._asdict()}
+                        for row in conn.execute(remaining_password_query(sample_seed, password_score_threshold,
+                                                                         batch_size, offset, run['exp_id']))]
+                conn.commit()
+                for results_json in zygotes[run['exp_id']].imap_unordered(jobs):
+                    results_json['host_id'] = host_id
+                    writer.put(results_json)
+            logging.info(f"Round {round_index + 1} of {rounds} done "
+                         f"(order: {', '.join(run['algorithm'] for run in ordered_runs)})")
+    except BaseException:
+        for zygote in zygotes.values():
+            zygote.close()
+        writer.close()
+        for run in runs:
+            leases[run['exp_id']].stop()
+            release_lease(conn, 'experiment_runs', run['exp_id'], owner)
+        raise
+
+    for zygote in zygotes.values():
+        zygote.close()
+    writer.close()
+
+    for run in runs:
+        leases[run['exp_id']].stop()
+        try:
+            complete_leased_run(conn, run['exp_id'], owner, host_id, hardware_info, 'hash_generations')
+            logging.info(f"Experiment run status updated to 'completed' for id: {run['exp_id']}")
+        except LeaseLostError as e:
+            logging.warning(f"{e}. Another scheduler has taken over the run.")
+
+    conn.close()
+    engine.dispose()
@@ -0,0 +1,252 @@
+import textwrap
+from sqlalchemy import text
+
+
+# Idempotent additions to startup_sql/setup_db.sql. The SQL file only runs when
+# the database volume is first initialised, so existing deployments pick these
+# up when a hasher starts.
+HASHER_SCHEMA_STATEMENTS = [
+    """
+    ALTER TABLE hash_generations
+    ADD COLUMN IF NOT EXISTS memory_peak_delta_mb DOUBLE PRECISION;
+    """,
+    """
+    ALTER TABLE hash_generations
+    ADD COLUMN IF NOT EXISTS duration_ms_min DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS duration_ms_median DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS duration_ms_p95 DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS duration_ms_stddev DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS thread_cpu_time_ms DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS timing_warmup INT,
+    ADD COLUMN IF NOT EXISTS timing_repetitions INT;
+    """,
+    """
+    ALTER TABLE experiment_runs
+    ADD COLUMN IF NOT EXISTS experiment_type TEXT NOT NULL DEFAULT 'hash',
+    ADD COLUMN IF NOT EXISTS source_run_id BIGINT;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS hash_verifications (
+        id BIGSERIAL PRIMARY KEY,
+        experiment_run_id BIGINT NOT NULL REFERENCES experiment_runs(id),
+        hash_generation_id BIGINT NOT NULL REFERENCES hash_generations(id),
+        password_correct BOOLEAN NOT NULL,
+        verified BOOLEAN NOT NULL,
+        start_time_utc TIMESTAMPTZ NOT NULL,
+        end_time_utc TIMESTAMPTZ NOT NULL,
+        duration_ms DOUBLE PRECISION NOT NULL,
+        cpu_user_time_ms DOUBLE PRECISION NOT NULL,
+        cpu_system_time_ms DOUBLE PRECISION NOT NULL,
+        duration_ms_min DOUBLE PRECISION,
+        duration_ms_median DOUBLE PRECISION,
+        duration_ms_p95 DOUBLE PRECISION,
+        duration_ms_stddev DOUBLE PRECISION,
+        thread_cpu_time_ms DOUBLE PRECISION,
+        timing_warmup INT,
+        timing_repetitions INT
+    );
+    """,
+    """
+    ALTER TABLE experiment_runs
+    ADD COLUMN IF NOT EXISTS sample_seed INT;
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS passwords_score_idx ON passwords (score);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS password_sample_pools (
+        seed INT NOT NULL,
+        password_id BIGINT NOT NULL REFERENCES passwords(id),
+        score DOUBLE PRECISION,
+        password_len INT NOT NULL,
+        source TEXT,
+        stratum_rank INT NOT NULL,
+        sample_key BIGINT NOT NULL,
+        PRIMARY KEY (seed, password_id)
+    );
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS password_sample_pools_order_idx
+    ON password_sample_pools (seed, stratum_rank, sample_key);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS password_sample_pool_builds (
+        seed INT PRIMARY KEY,
+        per_stratum INT NOT NULL,
+        built_at TIMESTAMPTZ NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS concurrency_stress_runs (
+        id BIGSERIAL PRIMARY KEY,
+        alg_config_id BIGINT NOT NULL REFERENCES algorithm_configurations(id),
+        cpu_count INT NOT NULL,
+        memory_total_mb DOUBLE PRECISION NOT NULL,
+        max_inflation DOUBLE PRECISION NOT NULL,
+        hashes_per_worker INT NOT NULL,
+        max_safe_concurrency INT,
+        concurrency_per_gb DOUBLE PRECISION,
+        start_time_utc TIMESTAMPTZ NOT NULL,
+        end_time_utc TIMESTAMPTZ NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS concurrency_stress_levels (
+        id BIGSERIAL PRIMARY KEY,
+        stress_run_id BIGINT NOT NULL REFERENCES concurrency_stress_runs(id),
+        concurrency INT NOT NULL,
+        hashes INT NOT NULL,
+        wall_time_ms DOUBLE PRECISION NOT NULL,
+        throughput_hps DOUBLE PRECISION NOT NULL,
+        latency_p50_ms DOUBLE PRECISION NOT NULL,
+        latency_p95_ms DOUBLE PRECISION NOT NULL,
+        latency_inflation_p50 DOUBLE PRECISION NOT NULL,
+        latency_inflation_p95 DOUBLE PRECISION NOT NULL,
+        aggregate_rss_peak_mb DOUBLE PRECISION NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS verify_load_runs (
+        id BIGSERIAL PRIMARY KEY,
+        alg_config_id BIGINT NOT NULL REFERENCES algorithm_configurations(id),
+        arrival_process TEXT NOT NULL,
+        burst_size INT NOT NULL,
+        offered_rps DOUBLE PRECISION NOT NULL,
+        duration_s DOUBLE PRECISION NOT NULL,
+        service_workers INT NOT NULL,
+        service_max_pending INT NOT NULL,
+        requests INT NOT NULL,
+        completed INT NOT NULL,
+        rejected INT NOT NULL,
+        errors INT NOT NULL,
+        throughput_rps DOUBLE PRECISION NOT NULL,
+        latency_p50_ms DOUBLE PRECISION,
+        latency_p95_ms DOUBLE PRECISION,
+        latency_p99_ms DOUBLE PRECISION,
+        latency_max_ms DOUBLE PRECISION,
+        start_time_utc TIMESTAMPTZ NOT NULL,
+        end_time_utc TIMESTAMPTZ NOT NULL
+    );
+    """,
+    """
+    ALTER TABLE experiment_runs
+    ADD COLUMN IF NOT EXISTS lease_owner TEXT,
+    ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS experiment_run_chunks (
+        id BIGSERIAL PRIMARY KEY,
+        experiment_run_id BIGINT NOT NULL REFERENCES experiment_runs(id),
+        chunk_index INT NOT NULL,
+        start_position INT NOT NULL,
+        end_position INT NOT NULL,
+        score_threshold INT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        lease_owner TEXT,
+        lease_expires_at TIMESTAMPTZ,
+        attempts INT NOT NULL DEFAULT 0,
+        completed_at TIMESTAMPTZ,
+        UNIQUE (experiment_run_id, chunk_index)
+    );
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS experiment_run_chunks_open_idx
+    ON experiment_run_chunks (experiment_run_id, chunk_index) WHERE status <> 'completed';
+    """,
+    """
+    ALTER TABLE experiment_run_chunks
+    ADD COLUMN IF NOT EXISTS checkpoint_position INT,
+    ADD COLUMN IF NOT EXISTS checkpoint_at TIMESTAMPTZ;
+    """,
+    """
+    UPDATE experiment_run_chunks SET checkpoint_position = start_position WHERE checkpoint_position IS NULL;
+    """,
+    # Older runs may hold duplicate rows; the sink still works without the key, it just cannot skip them.
+    """
+    DO $$
+    BEGIN
+        CREATE UNIQUE INDEX IF NOT EXISTS hash_generations_run_password_key
+        ON hash_generations (experiment_run_id, password_id);
+    EXCEPTION WHEN unique_violation THEN
+        RAISE WARNING 'hash_generations holds duplicate (experiment_run_id, password_id) rows; '
+                      'remove them so resumed runs can skip already hashed passwords';
+    END
+    $$;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS hosts (
+        id BIGSERIAL PRIMARY KEY,
+        fingerprint TEXT UNIQUE NOT NULL,
+        hostname TEXT,
+        hardware_info JSONB NOT NULL,
+        sha256_mb_per_s DOUBLE PRECISION NOT NULL,
+        memory_bandwidth_gb_per_s DOUBLE PRECISION NOT NULL,
+        registered_at TIMESTAMPTZ NOT NULL,
+        last_seen_at TIMESTAMPTZ NOT NULL
+    );
+    """,
+    """
+    ALTER TABLE experiment_runs
+    ADD COLUMN IF NOT EXISTS host_id BIGINT REFERENCES hosts(id);
+    """,
+    # Chunks of one run may be hashed on different hosts, so each hash records its own.
+    """
+    ALTER TABLE hash_generations
+    ADD COLUMN IF NOT EXISTS host_id BIGINT REFERENCES hosts(id);
+    """,
+    # Idle hashers LISTEN on runs_registered; the payload is the algorithm name.
+    """
+    CREATE OR REPLACE FUNCTION notify_runs_registered() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM pg_notify('runs_registered', algorithm_name)
+        FROM (SELECT DISTINCT a.name AS algorithm_name
+              FROM new_rows n
+              JOIN algorithm_configurations ac ON ac.id = n.alg_config_id
+              JOIN algorithms a ON a.id = ac.algorithm_id
+              WHERE n.status = 'registered') registered;
+        RETURN NULL;
+    END
+    $$;
+    """,
+    """
+    CREATE OR REPLACE TRIGGER experiment_runs_notify_registered
+      AFTER INSERT ON experiment_runs
+      REFERENCING NEW TABLE AS new_rows
+      FOR EACH STATEMENT EXECUTE FUNCTION notify_runs_registered();
+    """,
+    """
+    CREATE OR REPLACE FUNCTION notify_chunks_registered() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM pg_notify('runs_registered', algorithm_name)
+        FROM (SELECT DISTINCT a.name AS algorithm_name
+              FROM new_rows n
+              JOIN experiment_runs er ON er.id = n.experiment_run_id
+              JOIN algorithm_configurations ac ON ac.id = er.alg_config_id
+              JOIN algorithms a ON a.id = ac.algorithm_id) chunked;
+        RETURN NULL;
+    END
+    $$;
+    """,
+    """
+    CREATE OR REPLACE TRIGGER experiment_run_chunks_notify_registered
+      AFTER INSERT ON experiment_run_chunks
+      REFERENCING NEW TABLE AS new_rows
+      FOR EACH STATEMENT EXECUTE FUNCTION notify_chunks_registered();
+    """,
+]
+
+
+def ensure_hasher_schema(conn):
+    """
+    Applies the hasher's schema additions to an existing database.
+
+    Args:
+        conn: A SQLAlchemy connection object.
+    """
+    # Several hasher containers start together; serialise the DDL between them.
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('hasher_schema'))"))
+    for statement in HASHER_SCHEMA_STATEMENTS:
+        conn.execute(text(textwrap.dedent(statement)))
+    conn.commit()
@@ -0,0 +1,233 @@
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+
+import dotenv
+import psutil
+from sqlalchemy import text
+
+from schema import ensure_hasher_schema
+from utils import create_db_connection, get_db_password, percentile
+from worker_pool import HashWorkerPool
+
+# Sweeps the number of concurrent hashes C for each algorithm configuration and
+# records throughput, per-hash latency inflation against C=1 and the aggregate
+# RSS of the hashing processes, then derives the highest concurrency this host
+# sustains. Run inside a hasher container, e.g.
+#   docker compose run --rm -e STRESS_ALGORITHMS=argon2 hasher_argon2 python stress.py
+
+dotenv.load_dotenv(dotenv_path='./data/.env')
+
+db_user = os.getenv('DB_USER')
+db_host = os.getenv('DB_HOST')
+db_port = os.getenv('DB_PORT')
+db_name = os.getenv('DB_NAME')
+stress_algorithms = os.getenv('STRESS_ALGORITHMS', 'argon2,scrypt').split(',')
+# explicit algorithm_configurations ids take precedence over STRESS_ALGORITHMS
+stress_config_ids = [int(i) for i in os.getenv('STRESS_ALG_CONFIG_IDS', '').split(',') if i.strip()]
+cpu_count = len(os.sched_getaffinity(0))
+# defaults to 1, 2, 4, ... up to twice the CPUs this process may run on
+stress_concurrency_levels = [int(c) for c in os.getenv('STRESS_CONCURRENCY_LEVELS', '').split(',') if c.strip()]
+hashes_per_worker = int(os.getenv('STRESS_HASHES_PER_WORKER', '8'))
+# a level is safe while its p95 latency stays within this factor of the C=1 p95
+max_inflation = float(os.getenv('STRESS_MAX_INFLATION', '1.5'))
+rss_sample_interval = float(os.getenv('STRESS_RSS_SAMPLE_INTERVAL', '0.05'))
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    handlers=[logging.StreamHandler(sys.stdout)])
+
+
+def concurrency_levels():
+    if stress_concurrency_levels:
+        return sorted(set(stress_concurrency_levels))
+    levels = []
+    c = 1
+    while c < cpu_count * 2:
+        levels.append(c)
+        c *= 2
+    levels.append(cpu_count * 2)
+    return levels
+
+
+class RssSampler(threading.Thread):
+    """
+    Polls the summed RSS of a set of processes and keeps the peak.
+
+    Pages shared between workers (the interpreter, libraries) are counted once
+    per worker, so the figure slightly overstates what the hashes themselves use.
+    """
+
+    def __init__(self, pids, interval):
+        super().__init__(name='rss-sampler', daemon=True)
+        self.processes = [psutil.Process(pid) for pid in pids]
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            total = 0
+            for process in self.processes:
+                try:
+                    total += process.memory_info().rss
+                except psutil.NoSuchProcess:
+                    pass
+            self.peak_mb = max(self.peak_mb, total / (1024 * 1024))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak_mb
+
+
+def measure_concurrency(algorithm, parameters, concurrency):
+    """
+    Keeps `concurrency` hashes in flight on as many worker processes.
+
+    One untimed round per worker loads the backends before the measured
+    hashes, so the levels compare steady-state behaviour.
+
+    Returns:
+        dict: Throughput, latency percentiles and peak aggregate RSS of the level.
+    """
+    hashes = concurrency * hashes_per_worker
+    with HashWorkerPool(algorithm, parameters, workers=concurrency) as pool:
+        list(pool.imap_unordered({'password_plaintext': f'stress-warmup-{i}'} for i in range(concurrency)))
+
+        sampler = RssSampler(pool.pids(), rss_sample_interval)
+        sampler.start()
+        start = time.perf_counter()
+        results = list(pool.imap_unordered({'password_plaintext': f'stress-{i}'} for i in range(hashes)))
+        wall_time_s = time.perf_counter() - start
+        aggregate_rss_peak_mb = sampler.stop()
+
+    durations_ms = [r['duration_ms'] for r in results]
+    return {
+        "concurrency": concurrency,
+        "hashes": hashes,
+        "wall_time_ms": wall_time_s * 1000,
+        "throughput_hps": hashes / wall_time_s,
+        "latency_p50_ms": statistics.median(durations_ms),
+        "latency_p95_ms": percentile(durations_ms, 95),
+        "aggregate_rss_peak_mb": aggregate_rss_peak_mb,
+    }
+
+
+def stress(algorithm, parameters):
+    """
+    Measures every concurrency level of one configuration.
+
+    The sweep stops early once a level would not fit in the host's memory.
+
+    Returns:
+        tuple: (levels, max_safe_concurrency, concurrency_per_gb) where the
+               capacity figures are None when not even C=1 is safe.
+    """
+    memory_total_mb = psutil.virtual_memory().total / (1024 * 1024)
+    levels = []
+    for concurrency in concurrency_levels():
+        if levels:
+            # Extrapolate from the last level before committing that much memory.
+            last = levels[-1]
+            projected_mb = last['aggregate_rss_peak_mb'] / last['concurrency'] * concurrency
+            if projected_mb > memory_total_mb * 0.9:
+                logging.warning(f"{algorithm} {parameters}: C={concurrency} would need ~{projected_mb:.0f} MB "
+                                f"of {memory_total_mb:.0f} MB. Stopping the sweep.")
+                break
+
+        level = measure_concurrency(algorithm, parameters, concurrency)
+        baseline = levels[0] if levels else level
+        level['latency_inflation_p50'] = level['latency_p50_ms'] / baseline['latency_p50_ms']
+        level['latency_inflation_p95'] = level['latency_p95_ms'] / baseline['latency_p95_ms']
+        levels.append(level)
+        logging.info(f"{algorithm} {parameters} C={concurrency}: {level['throughput_hps']:.1f} hashes/s, "
+                     f"p50 {level['latency_p50_ms']:.2f} ms, p95 {level['latency_p95_ms']:.2f} ms "
+                     f"(x{level['latency_inflation_p95']:.2f}), {level['aggregate_rss_peak_mb']:.0f} MB RSS")
+
+    safe = [l for l in levels if l['latency_inflation_p95'] <= max_inflation]
+    if not safe:
+        return levels, None, None
+    best = max(safe, key=lambda l: l['concurrency'])
+    concurrency_per_gb = best['concurrency'] / (best['aggregate_rss_peak_mb'] / 1024)
+    return levels, best['concurrency'], concurrency_per_gb
+
+
+def record_stress_run(conn, alg_config_id, levels, max_safe_concurrency, concurrency_per_gb,
+                      started_at, completed_at):
+    stress_run_id = conn.execute(text("""
+        INSERT INTO concurrency_stress_runs(alg_config_id, cpu_count, memory_total_mb, max_inflation,
+                                            hashes_per_worker, max_safe_concurrency, concurrency_per_gb,
+                                            start_time_utc, end_time_utc)
+        VALUES (:alg_config_id, :cpu_count, :memory_total_mb, :max_inflation, :hashes_per_worker,
+                :max_safe_concurrency, :concurrency_per_gb, to_timestamp(:started_at), to_timestamp(:completed_at))
+        RETURNING id
+        """), {"alg_config_id": alg_config_id, "cpu_count": cpu_count,
+               "memory_total_mb": psutil.virtual_memory().total / (1024 * 1024),
+               "max_inflation": max_inflation, "hashes_per_worker": hashes_per_worker,
+               "max_safe_concurrency": max_safe_concurrency, "concurrency_per_gb": concurrency_per_gb,
+               "started_at": started_at, "completed_at": completed_at}).scalar()
+
+    if levels:
+        conn.execute(text("""
+            INSERT INTO concurrency_stress_levels(stress_run_id, concurrency, hashes, wall_time_ms, throughput_hps,
+                                                  latency_p50_ms, latency_p95_ms, latency_inflation_p50,
+                                                  latency_inflation_p95, aggregate_rss_peak_mb)
+            VALUES (:stress_run_id, :concurrency, :hashes, :wall_time_ms, :throughput_hps, :latency_p50_ms,
+                    :latency_p95_ms, :latency_inflation_p50, :latency_inflation_p95, :aggregate_rss_peak_mb)
+            """), [dict(level, stress_run_id=stress_run_id) for level in levels])
+    conn.commit()
+    return stress_run_id
+
+
+if __name__ == "__main__":
+
+    db_password = get_db_password()
+    conn = create_db_connection(db_user, db_password, db_host, db_port, db_name)
+    ensure_hasher_schema(conn)
+
+    if stress_config_ids:
+        configs = conn.execute(text("""
+            SELECT ac.id, a.name, ac.parameters_json
+            FROM algorithm_configurations ac
+            INNER JOIN algorithms a ON a.id = ac.algorithm_id
+            WHERE ac.id = ANY(:ids)
+            ORDER BY ac.id
+            """), {"ids": stress_config_ids}).fetchall()
+    else:
+        configs = conn.execute(text("""
+            SELECT ac.id, a.name, ac.parameters_json
+            FROM algorithm_configurations ac
+            INNER JOIN algorithms a ON a.id = ac.algorithm_id
+            WHERE a.name = ANY(:names)
+            ORDER BY ac.id
+            """), {"names": [a.strip() for a in stress_algorithms]}).fetchall()
+    conn.commit()
+
+    if not configs:
+        logging.warning("No algorithm configurations matched. Nothing to stress.")
+        sys.exit(1)
+
+    logging.info(f"Stressing {len(configs)} configurations at C={concurrency_levels()} on {cpu_count} CPUs")
+
+    for alg_config_id, algorithm, parameters in configs:
+        started_at = time.time()
+        try:
+            levels, max_safe_concurrency, concurrency_per_gb = stress(algorithm, parameters)
+        except RuntimeError as e:
+            logging.warning(f"Configuration {alg_config_id} ({algorithm} {parameters}) could not be stressed: {e}")
+            continue
+        stress_run_id = record_stress_run(conn, alg_config_id, levels, max_safe_concurrency, concurrency_per_gb,
+                                          started_at, time.time())
+        if max_safe_concurrency is None:
+            logging.info(f"Configuration {alg_config_id}: no level stayed within x{max_inflation:g} "
+                         f"(stress run id: {stress_run_id})")
+        else:
+            logging.info(f"Configuration {alg_config_id}: max safe concurrency {max_safe_concurrency}, "
+                         f"{concurrency_per_gb:.2f} concurrent hashes per GB (stress run id: {stress_run_id})")
+
+    conn.close()
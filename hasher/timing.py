@@ -0,0 +1,83 @@
+import math
+import statistics
+import time
+
+from utils import percentile
+
+
+def summarize_durations(durations_ms):
+    """
+    Summarizes repeated timings of the same hash.
+
+    Args:
+        durations_ms (list): Wall-clock durations in milliseconds.
+
+    Returns:
+        dict: min, median, p95 and sample standard deviation in milliseconds.
+    """
+    return {
+        "duration_ms_min": min(durations_ms),
+        "duration_ms_median": statistics.median(durations_ms),
+        "duration_ms_p95": percentile(durations_ms, 95),
+        "duration_ms_stddev": statistics.stdev(durations_ms) if len(durations_ms) > 1 else 0.0,
+    }
+
+
+def median_confidence_interval(durations_ms, confidence=0.95):
+    """
+    Distribution-free confidence interval for the median of `durations_ms`.
+
+    The bounds are order statistics whose ranks come from the normal
+    approximation to the Binomial(n, 1/2) count of samples below the median,
+    so no assumption is made about the shape of the timing distribution.
+
+    Returns:
+        tuple: (lower, upper) in milliseconds, or None while the sample is too
+               small for the requested confidence.
+    """
+    n = len(durations_ms)
+    half_width = statistics.NormalDist().inv_cdf(0.5 + confidence / 2) * math.sqrt(n) / 2
+    lower_rank = math.floor(n / 2 - half_width)
+    upper_rank = math.ceil(n / 2 + half_width) + 1
+    if lower_rank < 1 or upper_rank > n:
+        return None
+    ordered = sorted(durations_ms)
+    return ordered[lower_rank - 1], ordered[upper_rank - 1]
+
+
+def timed_repetitions(operation, warmup=0, repetitions=1):
+    """
+    Calls `operation` `warmup` untimed times, then `repetitions` timed times.
+
+    Wall-clock time comes from perf_counter_ns and CPU time from
+    thread_time_ns, both taken immediately around each call. Thread CPU time
+    only covers the calling thread, so it undercounts argon2 with p > 1,
+    which hashes on its own threads.
+
+    Args:
+        operation (callable): A zero-argument callable, e.g. a bound
+            generate_hash for one password.
+
+    Returns:
+        tuple: (result, durations_ms, thread_cpu_ms) where result is the
+               return value of the first timed call.
+    """
+    for _ in range(warmup):
+        operation()
+
+    result = None
+    durations_ms = []
+    thread_cpu_ms = []
+    for i in range(max(repetitions, 1)):
+        cpu_start_ns = time.thread_time_ns()
+        start_ns = time.perf_counter_ns()
+        value = operation()
+        end_ns = time.perf_counter_ns()
+        cpu_end_ns = time.thread_time_ns()
+
+        if i == 0:
+            result = value
+        durations_ms.append((end_ns - start_ns) / 1e6)
+        thread_cpu_ms.append((cpu_end_ns - cpu_start_ns) / 1e6)
+
+    return result, durations_ms, thread_cpu_ms
@@ -1,3 +1,5 @@
+import cpuinfo
+import psutil
 from sqlalchemy import create_engine
 
 
@@ -17,6 +19,27 @@ def read_file(file_path):
     return words
 
         
+def create_db_engine(user, password, host, port, database, pool_size=5):
+    """
+    Creates a SQLAlchemy engine whose connection pool is shared by a
+    long-lived process, so its threads and runs reuse open connections.
+
+    Args:
+        user (str): Database username.
+        password (str): Database password.
+        host (str): Database host address.
+        port (int): Database port number.
+        database (str): Database name.
+        pool_size (int): Connections kept open in the pool.
+
+    Returns:
+        sqlalchemy.engine.Engine: A SQLAlchemy engine.
+    """
+    # pre-ping replaces connections the database dropped while the pool held them
+    return create_engine(f'postgresql://{user}:{password}@{host}:{port}/{database}',
+                         pool_size=pool_size, max_overflow=pool_size, pool_pre_ping=True)
+
+
 def create_db_connection(user, password, host, port, database):
     """
     Creates a SQLAlchemy database connection.
@@ -89,4 +112,43 @@ def pickle_object(obj, file_path, mode='save'):
         with open(file_path, 'rb') as f:
             return pickle.load(f)
     else:
-        raise ValueError("Mode should be either 'save' or 'load'.")
\ No newline at end of file
+        raise ValueError("Mode should be either 'save' or 'load'.")
+
+def percentile(values, pct):
+    """
+    Computes a percentile with linear interpolation between closest ranks.
+
+    Args:
+        values (list): The samples.
+        pct (float): The percentile to compute, between 0 and 100.
+
+    Returns:
+        float: The interpolated percentile, or None for an empty sample.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def collect_hardware_info():
+    cpu_info = cpuinfo.get_cpu_info()
+    memory = psutil.virtual_memory()
+
+    return {
+        "cpu" : {
+            "cpu_brand": cpu_info['brand_raw'],
+            "cpu_vendor_id": cpu_info['vendor_id_raw'],
+            "cpu_architecture": cpu_info['arch'],
+            "cpu_cores": cpu_info['count'],
+            "cpu_l2_cache_size": cpu_info['l2_cache_size'],
+            "cpu_l3_cache_size": cpu_info['l3_cache_size'],
+            "cpu_model": cpu_info['model'],
+            "cpu_base_frequency": cpu_info['hz_advertised_friendly']
+                },
+        "memory" : {
+            "total_ram_gb": f"{memory.total / (1024**3):.2f} GB",}
+        }
@@ -0,0 +1,126 @@
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import sys
+import time
+
+from PasswordHasher import PasswordHasher
+
+# A local login endpoint for load testing. Clients send one JSON request per
+# line and may pipeline them on one connection; responses carry the request
+# id and can arrive out of order:
+#   {"id": 1, "algorithm": "argon2", "password": "...", "hash": "..."}
+#   -> {"id": 1, "verified": true, "queue_ms": 0.1, "service_ms": 52.3}
+#   -> {"id": 1, "error": "overloaded"}
+#   {"op": "info"} -> {"workers": 8, "max_pending": 64}
+# Run inside a hasher container, e.g.
+#   docker compose --profile loadtest up verify_service
+
+verify_host = os.getenv('VERIFY_HOST', '0.0.0.0')
+verify_port = int(os.getenv('VERIFY_PORT', '7000'))
+verify_workers = int(os.getenv('VERIFY_WORKERS', '0')) or len(os.sched_getaffinity(0))
+# requests beyond this many queued or running verifications are rejected at once
+verify_max_pending = int(os.getenv('VERIFY_MAX_PENDING', '0')) or verify_workers * 4
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    handlers=[logging.StreamHandler(sys.stdout)])
+
+
+def _verify(algorithm, password_plaintext, stored_hash, enqueued_ns):
+    started_ns = time.perf_counter_ns()
+    verified = PasswordHasher.cached(algorithm).verify(password_plaintext, stored_hash)
+    finished_ns = time.perf_counter_ns()
+    return verified, (started_ns - enqueued_ns) / 1e6, (finished_ns - started_ns) / 1e6
+
+
+class VerifyService:
+    """
+    Verifies passwords on a bounded thread pool behind an admission limit.
+
+    The hashing backends release the GIL, so threads run verifications in
+    parallel. Once `max_pending` requests are queued or running, new ones are
+    answered with an 'overloaded' error instead of joining an unbounded queue,
+    the way a login server sheds load to protect its latency.
+    """
+
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+                                                              thread_name_prefix='verify')
+
+    async def handle_request(self, request):
+        if request.get('op') == 'info':
+            return {"workers": self.workers, "max_pending": self.max_pending,
+                    "pending": self.pending, "rejected": self.rejected}
+
+        response = {"id": request.get('id')}
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            response['error'] = 'overloaded'
+            return response
+
+        self.pending += 1
+        try:
+            verified, queue_ms, service_ms = await asyncio.get_running_loop().run_in_executor(
+                self.executor, _verify, request['algorithm'], request['password'], request['hash'],
+                time.perf_counter_ns())
+            response.update({"verified": verified, "queue_ms": queue_ms, "service_ms": service_ms})
+        except Exception as e:
+            # Every request gets an answer; a client may be waiting on this id.
+            response['error'] = repr(e)
+        finally:
+            self.pending -= 1
+        return response
+
+    async def handle_connection(self, reader, writer):
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(request):
+            response = await self.handle_request(request)
+            async with write_lock:
+                writer.write((json.dumps(response) + '\n').encode('utf-8'))
+                await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as e:
+                    request = None
+                    async with write_lock:
+                        writer.write((json.dumps({"error": repr(e)}) + '\n').encode('utf-8'))
+                if request is not None:
+                    task = asyncio.create_task(respond(request))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        logging.info(f"Verify service listening on {host}:{port} with {self.workers} workers, "
+                     f"admitting at most {self.max_pending} pending requests")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+
+    service = VerifyService(verify_workers, verify_max_pending)
+    try:
+        asyncio.run(service.serve(verify_host, verify_port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.executor.shutdown(cancel_futures=True)
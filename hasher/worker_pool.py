@@ -0,0 +1,136 @@
+import multiprocessing
+import queue
+import resource
+import threading
+
+from PasswordHasher import PasswordHasher
+from hasher import measure_hash
+
+
+def _worker_loop(algorithm, parameters, task_queue, result_queue, rusage_who):
+    """
+    Runs inside a long-lived worker. The PasswordHasher and its backends are
+    loaded once, then jobs are hashed until a None sentinel is received.
+    """
+    hasher = PasswordHasher.cached(algorithm, **parameters)
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+
+        password_plaintext = task.pop('password_plaintext')
+        try:
+            task.update(measure_hash(hasher, password_plaintext, rusage_who=rusage_who))
+        except Exception as e:
+            task['error'] = repr(e)
+        result_queue.put(task)
+
+
+class HashWorkerPool:
+    """
+    A pool of persistent hashing workers fed through a job queue.
+
+    Process workers (the default) give each hash a dedicated interpreter, so
+    RUSAGE_SELF deltas are per-task. They are started from a forkserver rather
+    than forked, since the caller usually has database and lease threads
+    running. Thread workers suit backends that release the GIL (hashlib,
+    bcrypt, argon2-cffi) and are measured with RUSAGE_THREAD.
+    """
+
+    def __init__(self, algorithm, parameters, workers=None, backend='process'):
+        if backend not in ('process', 'thread'):
+            raise ValueError(f"Unsupported worker backend: {backend}")
+
+        self.algorithm = algorithm
+        self.parameters = parameters
+        self.workers = workers or multiprocessing.cpu_count()
+        self.backend = backend
+        self._workers = []
+
+    def start(self):
+        if self.backend == 'process':
+            context = multiprocessing.get_context('forkserver')
+            self.task_queue = context.Queue()
+            self.result_queue = context.Queue()
+            worker_cls = context.Process
+            rusage_who = resource.RUSAGE_SELF
+        else:
+            self.task_queue = queue.Queue()
+            self.result_queue = queue.Queue()
+            worker_cls = threading.Thread
+            rusage_who = resource.RUSAGE_THREAD
+
+        for _ in range(self.workers):
+            worker = worker_cls(target=_worker_loop,
+                                args=(self.algorithm, self.parameters, self.task_queue,
+                                      self.result_queue, rusage_who),
+                                daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        return self
+
+    def imap_unordered(self, jobs):
+        """
+        Hashes every job and yields results in completion order.
+
+        Each job is a dict carrying 'password_plaintext'; every other key is
+        passed through to the result alongside the measurement fields. At most
+        two jobs per worker are in flight so large generators are not drained
+        into the queue up front.
+        """
+        max_in_flight = self.workers * 2
+        in_flight = 0
+
+        for job in jobs:
+            if in_flight >= max_in_flight:
+                yield self._next_result()
+                in_flight -= 1
+            self.task_queue.put(dict(job))
+            in_flight += 1
+
+        while in_flight:
+            yield self._next_result()
+            in_flight -= 1
+
+    def _next_result(self):
+        while True:
+            try:
+                result = self.result_queue.get(timeout=1)
+                break
+            except queue.Empty:
+                # A killed worker (e.g. by the OOM killer) never returns its job.
+                self._check_workers()
+        if 'error' in result:
+            raise RuntimeError(f"Hashing failed for password id {result.get('password_id')}: {result['error']}")
+        return result
+
+    def _check_workers(self):
+        if self.backend != 'process':
+            return
+        for worker in self._workers:
+            if not worker.is_alive():
+                raise RuntimeError(f"Hashing worker pid {worker.pid} died with exit code {worker.exitcode}")
+
+    def pids(self):
+        """Returns the PIDs of the live process workers (empty for thread workers)."""
+        if self.backend != 'process':
+            return []
+        return [worker.pid for worker in self._workers if worker.is_alive()]
+
+    def close(self, timeout=5):
+        """Stops the workers; process workers still busy `timeout` seconds after the sentinel are terminated."""
+        for _ in self._workers:
+            self.task_queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout if self.backend == 'process' else None)
+            if self.backend == 'process' and worker.is_alive():
+                worker.terminate()
+                worker.join()
+        self._workers = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,130 @@
+import json
+import multiprocessing
+import os
+
+from PasswordHasher import PasswordHasher
+from hasher import measure_hash
+
+
+PAGE_SIZE_MB = os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+def current_rss_mb():
+    """Returns the current resident set size of this process in MB."""
+    with open('/proc/self/statm', 'r') as f:
+        return int(f.read().split()[1]) * PAGE_SIZE_MB
+
+
+def _measure_in_child(hasher, password_plaintext):
+    """
+    Forks one child for a single hash and collects its exact rusage via wait4.
+
+    The child records its RSS just before hashing; subtracting it from the
+    child's ru_maxrss leaves the memory the hash itself touched. CPU times are
+    the child's own getrusage delta around the timed repetitions, averaged per
+    repetition like in measure_operation, since the wait4 totals also include
+    the warmup calls and every repetition.
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+
+    if pid == 0:
+        os.close(read_fd)
+        exit_code = 0
+        try:
+            baseline_rss_mb = current_rss_mb()
+            measurement = measure_hash(hasher, password_plaintext)
+            measurement['memory_rss_mb_start'] = baseline_rss_mb
+        except Exception as e:
+            measurement = {'error': repr(e)}
+            exit_code = 1
+        with os.fdopen(write_fd, 'w') as f:
+            json.dump(measurement, f)
+        os._exit(exit_code)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd, 'r') as f:
+        payload = f.read()
+    _, status, rusage = os.wait4(pid, 0)
+
+    measurement = json.loads(payload) if payload else {'error': f"child exited with status {status}"}
+    if 'error' in measurement:
+        return measurement
+
+    memory_peak_mb = rusage.ru_maxrss / 1024
+    measurement.update({
+        "memory_peak_mb_during_hash": memory_peak_mb,
+        "memory_peak_delta_mb": max(memory_peak_mb - measurement['memory_rss_mb_start'], 0.0),
+    })
+    return measurement
+
+
+def _zygote_loop(algorithm, parameters, conn):
+    """
+    Runs inside the zygote. Backends are imported and exercised once, then
+    every request is served by a freshly forked child.
+    """
+    hasher = PasswordHasher.cached(algorithm, **parameters)
+    hasher.generate_hash('zygote-warmup')
+    conn.send('ready')
+
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        password_plaintext = task.pop('password_plaintext')
+        task.update(_measure_in_child(hasher, password_plaintext))
+        conn.send(task)
+
+    conn.close()
+
+
+class HashZygote:
+    """
+    A pre-warmed process that forks one isolated child per hash.
+
+    Gives per-hash CPU and memory numbers free of interpreter and import
+    overhead without paying for a cold python3 start on every password.
+    Hashes run one at a time so children never compete with each other.
+    """
+
+    def __init__(self, algorithm, parameters):
+        self.algorithm = algorithm
+        self.parameters = parameters
+        self.workers = 1
+        self._process = None
+
+    def start(self):
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.get_context('fork').Process(
+            target=_zygote_loop,
+            args=(self.algorithm, self.parameters, child_conn),
+            daemon=True)
+        self._process.start()
+        child_conn.close()
+        self._conn.recv()
+        return self
+
+    def measure(self, job):
+        self._conn.send(dict(job))
+        result = self._conn.recv()
+        if 'error' in result:
+            raise RuntimeError(f"Hashing failed for password id {result.get('password_id')}: {result['error']}")
+        return result
+
+    def imap_unordered(self, jobs):
+        for job in jobs:
+            yield self.measure(job)
+
+    def close(self):
+        if self._process is not None:
+            self._conn.send(None)
+            self._process.join()
+            self._conn.close()
+            self._process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -19,6 +19,30 @@ CREATE TABLE IF NOT EXISTS "passwords" (
   "size_byte" INT
 );
 
+CREATE INDEX IF NOT EXISTS "passwords_score_idx" ON "passwords" ("score");
+
+-- Ensure the 'password_sample_pools' table is created only if it doesn't already exist.
+-- Seeded, stratified (score, length bucket, source) password samples materialized by the hashers.
+CREATE TABLE IF NOT EXISTS "password_sample_pools" (
+  "seed" INT NOT NULL,
+  "password_id" BIGINT NOT NULL REFERENCES "passwords" ("id"),
+  "score" DOUBLE PRECISION,
+  "password_len" INT NOT NULL,
+  "source" TEXT,
+  "stratum_rank" INT NOT NULL,
+  "sample_key" BIGINT NOT NULL,
+  PRIMARY KEY ("seed", "password_id")
+);
+
+CREATE INDEX IF NOT EXISTS "password_sample_pools_order_idx"
+  ON "password_sample_pools" ("seed", "stratum_rank", "sample_key");
+
+CREATE TABLE IF NOT EXISTS "password_sample_pool_builds" (
+  "seed" INT PRIMARY KEY,
+  "per_stratum" INT NOT NULL,
+  "built_at" TIMESTAMPTZ NOT NULL
+);
+
 -- Ensure the 'sequences' table is created only if it doesn't already exist.
 CREATE TABLE IF NOT EXISTS "sequences" (
   "id" BIGSERIAL PRIMARY KEY,
@@ -35,6 +59,19 @@ CREATE TABLE IF NOT EXISTS "algorithms" (
   "parameters" JSONB
 );
 
+-- Ensure the 'hosts' table is created only if it doesn't already exist.
+-- One row per machine that ran experiments, with reference scores for normalizing timings across machines.
+CREATE TABLE IF NOT EXISTS "hosts" (
+  "id" BIGSERIAL PRIMARY KEY,
+  "fingerprint" TEXT UNIQUE NOT NULL,  -- SHA-256 of CPU model/count, RAM, architecture and machine id
+  "hostname" TEXT,
+  "hardware_info" JSONB NOT NULL,
+  "sha256_mb_per_s" DOUBLE PRECISION NOT NULL,  -- single-thread SHA-256 throughput
+  "memory_bandwidth_gb_per_s" DOUBLE PRECISION NOT NULL,  -- single-thread memcpy bandwidth
+  "registered_at" TIMESTAMPTZ NOT NULL,
+  "last_seen_at" TIMESTAMPTZ NOT NULL
+);
+
 -- Ensure the 'experiment_runs' table is created only if it doesn't already exist.
 CREATE TABLE IF NOT EXISTS "experiment_runs" (
   "id" BIGSERIAL PRIMARY KEY,
@@ -44,9 +81,37 @@ CREATE TABLE IF NOT EXISTS "experiment_runs" (
   "status" TEXT,  --'registered' OR 'running' OR 'completed' OR 'failed'
   "description" TEXT,
   "hardware_info" JSONB,
-  "remark" TEXT
+  "remark" TEXT,
+  "experiment_type" TEXT NOT NULL DEFAULT 'hash',  --'hash' OR 'verify'
+  "source_run_id" BIGINT,  -- for 'verify' runs, the 'hash' run whose hashes are replayed
+  "sample_seed" INT,  -- runs sharing a seed hash the same password sample
+  "lease_owner" TEXT,  -- 'host:pid' of the hasher holding the run
+  "lease_expires_at" TIMESTAMPTZ,  -- the run may be reclaimed once this passes
+  "host_id" BIGINT  -- the host that completed the run; hash_generations.host_id has each hash's host
+);
+
+-- Ensure the 'experiment_run_chunks' table is created only if it doesn't already exist.
+-- Position ranges of a 'hash' run's password sample, claimed and leased by hashers one at a time.
+CREATE TABLE IF NOT EXISTS "experiment_run_chunks" (
+  "id" BIGSERIAL PRIMARY KEY,
+  "experiment_run_id" BIGINT NOT NULL REFERENCES "experiment_runs" ("id"),
+  "chunk_index" INT NOT NULL,
+  "start_position" INT NOT NULL,
+  "end_position" INT NOT NULL,
+  "score_threshold" INT NOT NULL,
+  "status" TEXT NOT NULL DEFAULT 'pending',  --'pending' OR 'running' OR 'completed'
+  "lease_owner" TEXT,
+  "lease_expires_at" TIMESTAMPTZ,
+  "attempts" INT NOT NULL DEFAULT 0,
+  "checkpoint_position" INT,  -- start_position plus the passwords of the chunk committed so far
+  "checkpoint_at" TIMESTAMPTZ,
+  "completed_at" TIMESTAMPTZ,
+  UNIQUE ("experiment_run_id", "chunk_index")
 );
 
+CREATE INDEX IF NOT EXISTS "experiment_run_chunks_open_idx"
+  ON "experiment_run_chunks" ("experiment_run_id", "chunk_index") WHERE "status" <> 'completed';
+
 -- Ensure the 'algorithm_configurations' table is created only if it doesn't already exist.
 CREATE TABLE IF NOT EXISTS "algorithm_configurations" (
   "id" BIGSERIAL PRIMARY KEY,
@@ -82,7 +147,98 @@ CREATE TABLE IF NOT EXISTS "hash_generations" (
   "cpu_user_time_ms" DOUBLE PRECISION NOT NULL,
   "cpu_system_time_ms" DOUBLE PRECISION NOT NULL,
   "memory_rss_mb_start" DOUBLE PRECISION NOT NULL,
-  "memory_peak_mb_during_hash" DOUBLE PRECISION NOT NULL
+  "memory_peak_mb_during_hash" DOUBLE PRECISION NOT NULL,
+  "memory_peak_delta_mb" DOUBLE PRECISION,  -- peak RSS minus the pre-hash baseline, zygote mode only
+  -- duration_ms is the median of timing_repetitions timed hashes after timing_warmup untimed ones
+  "duration_ms_min" DOUBLE PRECISION,
+  "duration_ms_median" DOUBLE PRECISION,
+  "duration_ms_p95" DOUBLE PRECISION,
+  "duration_ms_stddev" DOUBLE PRECISION,
+  "thread_cpu_time_ms" DOUBLE PRECISION,
+  "timing_warmup" INT,
+  "timing_repetitions" INT,
+  "host_id" BIGINT  -- the host that generated the hash; chunks of one run may run on different hosts
+);
+
+-- One hash per password and run; lets resumed runs skip passwords they already hashed.
+CREATE UNIQUE INDEX IF NOT EXISTS "hash_generations_run_password_key"
+  ON "hash_generations" ("experiment_run_id", "password_id");
+
+-- Ensure the 'hash_verifications' table is created only if it doesn't already exist.
+-- One row per verify() call of a 'verify' experiment run, with the correct or a wrong password.
+CREATE TABLE IF NOT EXISTS "hash_verifications" (
+  "id" BIGSERIAL PRIMARY KEY,
+  "experiment_run_id" BIGINT NOT NULL,
+  "hash_generation_id" BIGINT NOT NULL,
+  "password_correct" BOOLEAN NOT NULL,
+  "verified" BOOLEAN NOT NULL,
+  "start_time_utc" TIMESTAMPTZ NOT NULL,
+  "end_time_utc" TIMESTAMPTZ NOT NULL,
+  "duration_ms" DOUBLE PRECISION NOT NULL,
+  "cpu_user_time_ms" DOUBLE PRECISION NOT NULL,
+  "cpu_system_time_ms" DOUBLE PRECISION NOT NULL,
+  "duration_ms_min" DOUBLE PRECISION,
+  "duration_ms_median" DOUBLE PRECISION,
+  "duration_ms_p95" DOUBLE PRECISION,
+  "duration_ms_stddev" DOUBLE PRECISION,
+  "thread_cpu_time_ms" DOUBLE PRECISION,
+  "timing_warmup" INT,
+  "timing_repetitions" INT
+);
+
+-- Ensure the 'concurrency_stress_runs' table is created only if it doesn't already exist.
+-- One concurrency sweep of a configuration (hasher/stress.py) with the capacity it supports.
+CREATE TABLE IF NOT EXISTS "concurrency_stress_runs" (
+  "id" BIGSERIAL PRIMARY KEY,
+  "alg_config_id" BIGINT NOT NULL,
+  "cpu_count" INT NOT NULL,
+  "memory_total_mb" DOUBLE PRECISION NOT NULL,
+  "max_inflation" DOUBLE PRECISION NOT NULL,
+  "hashes_per_worker" INT NOT NULL,
+  "max_safe_concurrency" INT,
+  "concurrency_per_gb" DOUBLE PRECISION,
+  "start_time_utc" TIMESTAMPTZ NOT NULL,
+  "end_time_utc" TIMESTAMPTZ NOT NULL
+);
+
+-- Ensure the 'concurrency_stress_levels' table is created only if it doesn't already exist.
+-- One row per concurrency level C of a stress run.
+CREATE TABLE IF NOT EXISTS "concurrency_stress_levels" (
+  "id" BIGSERIAL PRIMARY KEY,
+  "stress_run_id" BIGINT NOT NULL,
+  "concurrency" INT NOT NULL,
+  "hashes" INT NOT NULL,
+  "wall_time_ms" DOUBLE PRECISION NOT NULL,
+  "throughput_hps" DOUBLE PRECISION NOT NULL,
+  "latency_p50_ms" DOUBLE PRECISION NOT NULL,
+  "latency_p95_ms" DOUBLE PRECISION NOT NULL,
+  "latency_inflation_p50" DOUBLE PRECISION NOT NULL,
+  "latency_inflation_p95" DOUBLE PRECISION NOT NULL,
+  "aggregate_rss_peak_mb" DOUBLE PRECISION NOT NULL
+);
+
+-- Ensure the 'verify_load_runs' table is created only if it doesn't already exist.
+-- One offered load level of an open-loop run against the verify service (hasher/loadgen.py).
+CREATE TABLE IF NOT EXISTS "verify_load_runs" (
+  "id" BIGSERIAL PRIMARY KEY,
+  "alg_config_id" BIGINT NOT NULL,
+  "arrival_process" TEXT NOT NULL,
+  "burst_size" INT NOT NULL,
+  "offered_rps" DOUBLE PRECISION NOT NULL,
+  "duration_s" DOUBLE PRECISION NOT NULL,
+  "service_workers" INT NOT NULL,
+  "service_max_pending" INT NOT NULL,
+  "requests" INT NOT NULL,
+  "completed" INT NOT NULL,
+  "rejected" INT NOT NULL,
+  "errors" INT NOT NULL,
+  "throughput_rps" DOUBLE PRECISION NOT NULL,
+  "latency_p50_ms" DOUBLE PRECISION,
+  "latency_p95_ms" DOUBLE PRECISION,
+  "latency_p99_ms" DOUBLE PRECISION,
+  "latency_max_ms" DOUBLE PRECISION,
+  "start_time_utc" TIMESTAMPTZ NOT NULL,
+  "end_time_utc" TIMESTAMPTZ NOT NULL
 );
 
 -- Ensure the 'cracking_attack_types' table is created only if it doesn't already exist.
@@ -90,7 +246,8 @@ CREATE TABLE IF NOT EXISTS "cracking_attack_types" (
   "id" SERIAL PRIMARY KEY,
   "name" TEXT UNIQUE NOT NULL,
   "description" TEXT,
-  "parameters_json" JSONB
+  "parameters_json" JSONB,
+  "sample_limit" INT DEFAULT 100  -- hashes per experiment run queued for this attack; NULL queues all
 );
 
 -- Ensure the 'hash_cracking_results' table is created only if it doesn't already exist.
@@ -100,7 +257,7 @@ CREATE TABLE IF NOT EXISTS "hash_cracking_results" (
   "cracking_attack_type_id" INT NOT NULL,
   "duration_seconds" DOUBLE PRECISION NOT NULL,
   "hashes_per_second" DOUBLE PRECISION NOT NULL,
-  "cracked_status" TEXT NOT NULL,
+  "cracked_status" TEXT NOT NULL,  --'CRACKED' OR 'FAILED' OR 'TIMEOUT' OR 'UNSUPPORTED_ALGO' OR 'SKIPPED_EMPTY_WORDLIST'
   "cracked_password" TEXT,
   "cpu_usage_percent_avg" DOUBLE PRECISION,
   "cpu_usage_percent_max" DOUBLE PRECISION,
@@ -109,9 +266,162 @@ CREATE TABLE IF NOT EXISTS "hash_cracking_results" (
   "gpu_memory_mb_avg" DOUBLE PRECISION,
   "gpu_memory_mb_max" DOUBLE PRECISION,
   "ram_usage_mb_avg" DOUBLE PRECISION,
-  "ram_usage_mb_max" DOUBLE PRECISION
+  "ram_usage_mb_max" DOUBLE PRECISION,
+  "batch_size" INT,  -- hashes attacked together by the hashcat session that produced the row
+  "keyspace_progress" BIGINT,  -- candidates tried when the session ended (hashcat PROGRESS)
+  "keyspace_total" BIGINT,  -- the attack's total keyspace
+  "censored" BOOLEAN  -- TRUE for TIMEOUT rows: the hash resisted at least duration_seconds
 );
 
+-- Ensure the 'crack_jobs' table is created only if it doesn't already exist.
+-- The cracking queue: one row per hash and attack type, enqueued by a trigger on hash_generations
+-- and claimed by cracker nodes under leases.
+CREATE TABLE IF NOT EXISTS "crack_jobs" (
+  "id" BIGSERIAL PRIMARY KEY,
+  "hash_generation_id" BIGINT NOT NULL REFERENCES "hash_generations" ("id"),
+  "cracking_attack_type_id" INT NOT NULL REFERENCES "cracking_attack_types" ("id"),
+  "experiment_run_id" BIGINT NOT NULL,
+  "status" TEXT NOT NULL DEFAULT 'pending',  --'pending' OR 'running' OR 'sharded' OR 'done'
+  "lease_owner" TEXT,  -- 'host:pid' of the cracker node holding the job
+  "lease_expires_at" TIMESTAMPTZ,  -- the job may be reclaimed once this passes
+  "attempts" INT NOT NULL DEFAULT 0,
+  "enqueued_at" TIMESTAMPTZ NOT NULL DEFAULT now(),
+  "keyspace" BIGINT,  -- hashcat --keyspace of the attack, for sharded jobs
+  "shard_wordlist" TEXT,  -- the cached wordlist the keyspace was computed on, shared by the slices
+  "sharded_at" TIMESTAMPTZ,  -- when the job was split into crack_job_slices
+  UNIQUE ("hash_generation_id", "cracking_attack_type_id")
+);
+
+CREATE INDEX IF NOT EXISTS "crack_jobs_open_idx"
+  ON "crack_jobs" ("cracking_attack_type_id", "id") WHERE "status" <> 'done';
+CREATE INDEX IF NOT EXISTS "crack_jobs_open_run_idx"
+  ON "crack_jobs" ("cracking_attack_type_id", "experiment_run_id", "id") WHERE "status" <> 'done';
+
+-- Ensure the 'crack_job_quotas' table is created only if it doesn't already exist.
+-- Jobs enqueued so far per experiment run and attack type, checked against cracking_attack_types.sample_limit.
+CREATE TABLE IF NOT EXISTS "crack_job_quotas" (
+  "experiment_run_id" BIGINT NOT NULL,
+  "cracking_attack_type_id" INT NOT NULL REFERENCES "cracking_attack_types" ("id"),
+  "enqueued" INT NOT NULL DEFAULT 0,
+  PRIMARY KEY ("experiment_run_id", "cracking_attack_type_id")
+);
+
+-- Ensure the 'crack_job_slices' table is created only if it doesn't already exist.
+-- --skip/--limit ranges of a sharded mask or combinator job, claimed by any cracker node under leases.
+-- The first slice to crack the hash cancels the others; the last one to finish records the job's result.
+CREATE TABLE IF NOT EXISTS "crack_job_slices" (
+  "id" BIGSERIAL PRIMARY KEY,
+  "crack_job_id" BIGINT NOT NULL REFERENCES "crack_jobs" ("id"),
+  "slice_index" INT NOT NULL,
+  "skip_candidates" BIGINT NOT NULL,  -- hashcat --skip, in units of crack_jobs.keyspace
+  "limit_candidates" BIGINT NOT NULL,  -- hashcat --limit, in units of crack_jobs.keyspace
+  "status" TEXT NOT NULL DEFAULT 'pending',  --'pending' OR 'running' OR 'done' OR 'cancelled'
+  "lease_owner" TEXT,  -- 'host:pid' of the cracker node running the slice
+  "lease_expires_at" TIMESTAMPTZ,  -- the slice may be reclaimed once this passes
+  "attempts" INT NOT NULL DEFAULT 0,
+  "started_at" TIMESTAMPTZ,
+  "finished_at" TIMESTAMPTZ,
+  "cracked_password" TEXT,
+  "cracked_at" TIMESTAMPTZ,
+  "hashes_per_second" DOUBLE PRECISION,
+  "keyspace_progress" BIGINT,  -- candidates the slice tried (hashcat PROGRESS)
+  "keyspace_total" BIGINT,  -- candidates in the slice
+  "timed_out" BOOLEAN,
+  UNIQUE ("crack_job_id", "slice_index")
+);
+
+CREATE INDEX IF NOT EXISTS "crack_job_slices_open_idx"
+  ON "crack_job_slices" ("id") WHERE "status" IN ('pending', 'running');
+
+-- Enqueue crack jobs for newly committed hashes, up to each attack type's sample limit per run.
+CREATE OR REPLACE FUNCTION enqueue_crack_jobs() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    quota RECORD;
+    added INT;
+BEGIN
+    INSERT INTO crack_job_quotas (experiment_run_id, cracking_attack_type_id)
+    SELECT DISTINCT n.experiment_run_id, cat.id
+    FROM new_rows n CROSS JOIN cracking_attack_types cat
+    ON CONFLICT DO NOTHING;
+
+    -- The counter rows serialise concurrent inserts into the same run.
+    FOR quota IN
+        SELECT q.experiment_run_id, q.cracking_attack_type_id, cat.sample_limit - q.enqueued AS remaining
+        FROM crack_job_quotas q
+        JOIN cracking_attack_types cat ON cat.id = q.cracking_attack_type_id
+        WHERE q.experiment_run_id IN (SELECT DISTINCT experiment_run_id FROM new_rows)
+        ORDER BY q.experiment_run_id, q.cracking_attack_type_id
+        FOR UPDATE OF q
+    LOOP
+        CONTINUE WHEN quota.remaining <= 0;
+
+        INSERT INTO crack_jobs (hash_generation_id, cracking_attack_type_id, experiment_run_id)
+        SELECT n.id, quota.cracking_attack_type_id, n.experiment_run_id
+        FROM new_rows n
+        WHERE n.experiment_run_id = quota.experiment_run_id
+        ORDER BY n.id
+        LIMIT quota.remaining
+        ON CONFLICT DO NOTHING;
+        GET DIAGNOSTICS added = ROW_COUNT;
+
+        UPDATE crack_job_quotas SET enqueued = enqueued + added
+        WHERE experiment_run_id = quota.experiment_run_id
+          AND cracking_attack_type_id = quota.cracking_attack_type_id;
+
+        -- Wakes idle cracker nodes of the attack type once the inserting transaction commits.
+        IF added > 0 THEN
+            PERFORM pg_notify('hashes_ready', quota.cracking_attack_type_id::TEXT);
+        END IF;
+    END LOOP;
+
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE TRIGGER "hash_generations_enqueue_crack_jobs"
+  AFTER INSERT ON "hash_generations"
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION enqueue_crack_jobs();
+
+-- Notify idle hashers on 'runs_registered' when runs are registered or split into chunks.
+-- The payload is the algorithm name, so hashers can ignore algorithms they do not claim.
+CREATE OR REPLACE FUNCTION notify_runs_registered() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('runs_registered', algorithm_name)
+    FROM (SELECT DISTINCT a.name AS algorithm_name
+          FROM new_rows n
+          JOIN algorithm_configurations ac ON ac.id = n.alg_config_id
+          JOIN algorithms a ON a.id = ac.algorithm_id
+          WHERE n.status = 'registered') registered;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE TRIGGER "experiment_runs_notify_registered"
+  AFTER INSERT ON "experiment_runs"
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_runs_registered();
+
+CREATE OR REPLACE FUNCTION notify_chunks_registered() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('runs_registered', algorithm_name)
+    FROM (SELECT DISTINCT a.name AS algorithm_name
+          FROM new_rows n
+          JOIN experiment_runs er ON er.id = n.experiment_run_id
+          JOIN algorithm_configurations ac ON ac.id = er.alg_config_id
+          JOIN algorithms a ON a.id = ac.algorithm_id) chunked;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE TRIGGER "experiment_run_chunks_notify_registered"
+  AFTER INSERT ON "experiment_run_chunks"
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_chunks_registered();
+
 -- The `ALTER TABLE` statements for adding foreign keys also need to be conditional.
 -- We can't use `ALTER TABLE IF NOT EXISTS` directly for foreign keys, so we
 -- have to use a `DO` block with a PL/pgSQL function to check for the constraint's existence.
@@ -232,3 +542,79 @@ BEGIN
     END IF;
 END
 $$;
+
+-- Check and add foreign keys for hash_verifications table
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM   pg_constraint
+        WHERE  conname = 'hash_verifications_experiment_run_id_fkey'
+    ) THEN
+        ALTER TABLE "hash_verifications" ADD FOREIGN KEY ("experiment_run_id") REFERENCES "experiment_runs" ("id");
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1
+        FROM   pg_constraint
+        WHERE  conname = 'hash_verifications_hash_generation_id_fkey'
+    ) THEN
+        ALTER TABLE "hash_verifications" ADD FOREIGN KEY ("hash_generation_id") REFERENCES "hash_generations" ("id");
+    END IF;
+END
+$$;
+
+-- Check and add foreign keys for the concurrency stress and load test tables
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM   pg_constraint
+        WHERE  conname = 'concurrency_stress_runs_alg_config_id_fkey'
+    ) THEN
+        ALTER TABLE "concurrency_stress_runs" ADD FOREIGN KEY ("alg_config_id") REFERENCES "algorithm_configurations" ("id");
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1
+        FROM   pg_constraint
+        WHERE  conname = 'concurrency_stress_levels_stress_run_id_fkey'
+    ) THEN
+        ALTER TABLE "concurrency_stress_levels" ADD FOREIGN KEY ("stress_run_id") REFERENCES "concurrency_stress_runs" ("id");
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1
+        FROM   pg_constraint
+        WHERE  conname = 'verify_load_runs_alg_config_id_fkey'
+    ) THEN
+        ALTER TABLE "verify_load_runs" ADD FOREIGN KEY ("alg_config_id") REFERENCES "algorithm_configurations" ("id");
+    END IF;
+END
+$$;
+
+-- Check and add foreign keys for experiment_runs hosts
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM   pg_constraint
+        WHERE  conname = 'experiment_runs_host_id_fkey'
+    ) THEN
+        ALTER TABLE "experiment_runs" ADD FOREIGN KEY ("host_id") REFERENCES "hosts" ("id");
+    END IF;
+END
+$$;
+
+-- Check and add foreign keys for hash_generations hosts
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM   pg_constraint
+        WHERE  conname = 'hash_generations_host_id_fkey'
+    ) THEN
+        ALTER TABLE "hash_generations" ADD FOREIGN KEY ("host_id") REFERENCES "hosts" ("id");
+    END IF;
+END
+$$;
@@ -88,6 +88,15 @@ def ensure_schema_constraints():
             $$;
             """
         )))
+        # Experiment type columns used to register 'verify' (login-latency) runs
+        conn.execute(text(textwrap.dedent(
+            """
+            ALTER TABLE experiment_runs
+            ADD COLUMN IF NOT EXISTS experiment_type TEXT NOT NULL DEFAULT 'hash',
+            ADD COLUMN IF NOT EXISTS source_run_id BIGINT,
+            ADD COLUMN IF NOT EXISTS sample_seed INT;
+            """
+        )))
 
 
 _schema_checked = False
@@ -186,13 +195,14 @@ def comparisons():
                     """
                 ), {"comp_id": comp_id, "alg_config_id": alg_config_id})
 
-                # Register an experiment run for this configuration
+                # Register an experiment run for this configuration; seeding by comparison
+                # makes every algorithm in it hash the same password sample
                 conn.execute(text(
                     """
-                    INSERT INTO experiment_runs(alg_config_id, status, description)
-                    VALUES (:alg_config_id, 'registered', :desc)
+                    INSERT INTO experiment_runs(alg_config_id, status, description, sample_seed)
+                    VALUES (:alg_config_id, 'registered', :desc, :sample_seed)
                     """
-                ), {"alg_config_id": alg_config_id, "desc": f"Registered for comparison {name}"})
+                ), {"alg_config_id": alg_config_id, "desc": f"Registered for comparison {name}", "sample_seed": comp_id})
 
         flash("Comparison saved with algorithm parameters.", "success")
         return redirect(url_for("comparisons"))
@@ -225,6 +235,38 @@ def comparisons():
     return render_template("comparisons.html", comparisons=comp_details, algorithms=algorithms)
 
 
+@app.route("/comparisons/<int:comp_id>/verify", methods=["POST"])
+def register_verify_runs(comp_id):
+    # Register a 'verify' run replaying the latest completed 'hash' run of each configuration
+    with db.engine.begin() as conn:
+        source_runs = conn.execute(text(textwrap.dedent(
+            """
+            SELECT DISTINCT ON (er.alg_config_id) er.id, er.alg_config_id
+            FROM comparison_algo_configs cac
+            JOIN experiment_runs er ON er.alg_config_id = cac.algo_config_id
+            WHERE cac.comp_id = :comp_id
+              AND er.status = 'completed'
+              AND er.experiment_type = 'hash'
+            ORDER BY er.alg_config_id, er.end_time DESC NULLS LAST, er.id DESC
+            """
+        )), {"comp_id": comp_id}).mappings().all()
+
+        for run in source_runs:
+            conn.execute(text(
+                """
+                INSERT INTO experiment_runs(alg_config_id, status, description, experiment_type, source_run_id)
+                VALUES (:alg_config_id, 'registered', :desc, 'verify', :source_run_id)
+                """
+            ), {"alg_config_id": run["alg_config_id"], "source_run_id": run["id"],
+                "desc": f"Verify replay of experiment run {run['id']}"})
+
+    if source_runs:
+        flash(f"Registered {len(source_runs)} verify run(s).", "success")
+    else:
+        flash("No completed hash runs to replay for this comparison yet.", "warning")
+    return redirect(url_for("comparisons"))
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8080, debug=True)
 